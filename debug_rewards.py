@@ -22,7 +22,7 @@ from env.red_gym_env import RedGymEnv
 import numpy as np
 
 
-def load_task_config(task_name: str, rom_path: Path, state_path: Path):
+def load_task_config(task_name: str, rom_path: Path, state_path: Path, reward_trace_dir: Path = None):
     """Load task configuration from JSON file."""
     config_path = REPO_ROOT / "configs" / f"{task_name}.json"
 
@@ -47,6 +47,9 @@ def load_task_config(task_name: str, rom_path: Path, state_path: Path):
     env_config["headless"] = True
     env_config["save_video"] = False
     env_config["print_rewards"] = False  # We'll print our own
+    if reward_trace_dir is not None:
+        # Record RAM shards for tools/reward_sweep.py
+        env_config["reward_trace_dir"] = str(reward_trace_dir)
 
     return env_config, task_config
 
@@ -87,14 +90,14 @@ def print_reward_breakdown(step: int, reward: float, env: RedGymEnv, episode_num
         print(f"    Battles Lost: {env.episode_battle_stats['battles_lost']}")
 
 
-def debug_steps(task_name: str, rom_path: Path, state_path: Path, num_steps: int):
+def debug_steps(task_name: str, rom_path: Path, state_path: Path, num_steps: int, reward_trace_dir: Path = None):
     """Debug rewards by running random actions for N steps."""
     print(f"="*80)
     print(f"DEBUGGING REWARDS: {task_name}")
     print(f"Running {num_steps} random steps")
     print(f"="*80)
 
-    env_config, task_config = load_task_config(task_name, rom_path, state_path)
+    env_config, task_config = load_task_config(task_name, rom_path, state_path, reward_trace_dir)
 
     print(f"\nTask Config:")
     print(f"  Max Steps:    {env_config.get('max_steps', 'N/A')}")
@@ -146,16 +149,17 @@ def debug_steps(task_name: str, rom_path: Path, state_path: Path, num_steps: int
     print(f"Tiles Explored:      {len(env.episode_visited_tiles)}")
     print(f"Battles Won:         {env.episode_battle_stats['battles_won']}")
     print(f"Battles Lost:        {env.episode_battle_stats['battles_lost']}")
+    env.close()
 
 
-def debug_episodes(task_name: str, rom_path: Path, state_path: Path, num_episodes: int):
+def debug_episodes(task_name: str, rom_path: Path, state_path: Path, num_episodes: int, reward_trace_dir: Path = None):
     """Debug rewards by running N complete episodes with random actions."""
     print(f"="*80)
     print(f"DEBUGGING REWARDS: {task_name}")
     print(f"Running {num_episodes} random episodes")
     print(f"="*80)
 
-    env_config, task_config = load_task_config(task_name, rom_path, state_path)
+    env_config, task_config = load_task_config(task_name, rom_path, state_path, reward_trace_dir)
 
     env = RedGymEnv(env_config)
 
@@ -209,6 +213,7 @@ def debug_episodes(task_name: str, rom_path: Path, state_path: Path, num_episode
     print(f"Mean Length:         {np.mean(episode_lengths):.1f} ± {np.std(episode_lengths):.1f}")
     print(f"Max Return:          {np.max(episode_returns):.4f}")
     print(f"Min Return:          {np.min(episode_returns):.4f}")
+    env.close()
 
 
 def main():
@@ -223,6 +228,8 @@ def main():
                         help="Number of steps to run (mutually exclusive with --episodes)")
     parser.add_argument("--episodes", type=int, default=None,
                         help="Number of episodes to run (mutually exclusive with --steps)")
+    parser.add_argument("--reward-trace", type=Path, default=None,
+                        help="Directory to record reward RAM traces into (for tools/reward_sweep.py)")
 
     args = parser.parse_args()
 
@@ -240,9 +247,9 @@ def main():
 
     # Run debugging
     if args.steps is not None:
-        debug_steps(args.task, args.rom, args.state, args.steps)
+        debug_steps(args.task, args.rom, args.state, args.steps, args.reward_trace)
     else:
-        debug_episodes(args.task, args.rom, args.state, args.episodes)
+        debug_episodes(args.task, args.rom, args.state, args.episodes, args.reward_trace)
 
 
 if __name__ == "__main__":
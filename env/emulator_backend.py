@@ -0,0 +1,412 @@
+"""
+Emulator backends for RedGymEnv.
+
+RedGymEnv only touches a small surface of the emulator:
+- ``memory[addr]`` / ``memory[start:end]`` for RAM reads
+- ``tick(count, render)`` to advance frames
+- ``send_input(event)`` for button presses
+- ``load_state(f)`` / ``save_state(f)`` for savestates
+- ``screen.ndarray`` for the current frame
+
+PyBoy already exposes exactly this surface, so the real backend is a plain
+``PyBoy`` instance (no wrapper on the hot path). ``FakeEmulator`` implements the
+same surface without a ROM by playing back a scripted or recorded
+``EmulatorTrace``, which lets the reward, observation and bookkeeping code be
+profiled and benchmarked at full speed without PyBoy.
+
+Select the backend with the env config:
+    config["emulator_backend"] = "pyboy"  # default, needs gb_path
+    config["emulator_backend"] = "fake"   # optional config["emulator_trace"] (.npz path)
+"""
+
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from pyboy import PyBoy
+    from pyboy.utils import WindowEvent
+except ImportError:  # PyBoy is only required for the real emulator backend
+    PyBoy = None
+
+    class WindowEvent(IntEnum):
+        """Stand-in for ``pyboy.utils.WindowEvent`` (same values) when PyBoy is not installed."""
+
+        PRESS_ARROW_UP = 1
+        PRESS_ARROW_DOWN = 2
+        PRESS_ARROW_RIGHT = 3
+        PRESS_ARROW_LEFT = 4
+        PRESS_BUTTON_A = 5
+        PRESS_BUTTON_B = 6
+        PRESS_BUTTON_SELECT = 7
+        PRESS_BUTTON_START = 8
+        RELEASE_ARROW_UP = 9
+        RELEASE_ARROW_DOWN = 10
+        RELEASE_ARROW_RIGHT = 11
+        RELEASE_ARROW_LEFT = 12
+        RELEASE_BUTTON_A = 13
+        RELEASE_BUTTON_B = 14
+        RELEASE_BUTTON_SELECT = 15
+        RELEASE_BUTTON_START = 16
+
+
+SCREEN_SHAPE = (144, 160)
+MEMORY_SIZE = 0x10000
+
+# RAM the env reads every step (see RedGymEnv); recorded by default
+DEFAULT_TRACE_ADDRESSES = sorted(set(
+    [0xD362, 0xD361, 0xD35E]  # x, y, map
+    + [0xD057, 0xD163, 0xD356]  # battle flag, party size, badges
+    + list(range(0xD164, 0xD16A))  # party species
+    + [a + i for a in [0xD16C, 0xD198, 0xD1C4, 0xD1F0, 0xD21C, 0xD248] for i in (0, 1)]  # party hp
+    + [a + i for a in [0xD18D, 0xD1B9, 0xD1E5, 0xD211, 0xD23D, 0xD269] for i in (0, 1)]  # party max hp
+    + [0xD18C, 0xD1B8, 0xD1E4, 0xD210, 0xD23C, 0xD268]  # party levels
+    + [0xCFE6, 0xCFE7, 0xCFF4, 0xCFF5]  # opponent hp / max hp
+    + [0xD8C5, 0xD8F1, 0xD91D, 0xD949, 0xD975, 0xD9A1]  # opponent levels
+    + list(range(0xD747, 0xD87E))  # event flags
+))
+
+_FAKE_STATE_MAGIC = b"FAKEEMU1"
+
+
+@dataclass
+class EmulatorTrace:
+    """
+    A RAM/screen trace for ``FakeEmulator``.
+
+    ``base_memory`` is the RAM right after loading the start state; record ``i``
+    is the state after action step ``i`` and only stores ``addresses``.
+    """
+
+    base_memory: np.ndarray  # (0x10000,) uint8
+    addresses: np.ndarray  # (K,) uint16
+    values: np.ndarray  # (T, K) uint8
+    screens: Optional[np.ndarray] = None  # (T, 144, 160) uint8
+    base_screen: Optional[np.ndarray] = None  # (144, 160) uint8
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def save(self, path: Path):
+        """Save trace as a compressed .npz file."""
+        arrays = {
+            "base_memory": self.base_memory,
+            "addresses": self.addresses,
+            "values": self.values,
+        }
+        if self.screens is not None:
+            arrays["screens"] = self.screens
+        if self.base_screen is not None:
+            arrays["base_screen"] = self.base_screen
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> 'EmulatorTrace':
+        """Load trace from a .npz file written by ``save``."""
+        with np.load(path) as data:
+            return cls(
+                base_memory=data["base_memory"],
+                addresses=data["addresses"],
+                values=data["values"],
+                screens=data["screens"] if "screens" in data else None,
+                base_screen=data["base_screen"] if "base_screen" in data else None,
+            )
+
+    @classmethod
+    def from_records(
+        cls,
+        records: List[Dict[int, int]],
+        base_memory: Optional[np.ndarray] = None,
+        screens: Optional[np.ndarray] = None,
+    ) -> 'EmulatorTrace':
+        """
+        Build a scripted trace from per-step ``{address: value}`` writes.
+
+        Addresses not written by a record keep their previous value.
+        """
+        base = np.zeros(MEMORY_SIZE, dtype=np.uint8) if base_memory is None else base_memory.astype(np.uint8)
+        addresses = np.array(sorted({a for rec in records for a in rec}), dtype=np.uint16)
+        column = {int(a): i for i, a in enumerate(addresses)}
+        values = np.empty((len(records), len(addresses)), dtype=np.uint8)
+        current = base[addresses].copy()
+        for t, rec in enumerate(records):
+            for addr, val in rec.items():
+                current[column[addr]] = val
+            values[t] = current
+        return cls(base_memory=base, addresses=addresses, values=values, screens=screens)
+
+
+class TraceRecorder:
+    """
+    Records an ``EmulatorTrace`` from any backend (usually a real PyBoy).
+
+    Call ``start`` right after the start state is loaded, then ``capture`` after
+    every env step.
+    """
+
+    def __init__(self, addresses: Iterable[int] = DEFAULT_TRACE_ADDRESSES, record_screens: bool = True):
+        self.addresses = np.array(sorted(set(addresses)), dtype=np.uint16)
+        self.record_screens = record_screens
+        self.base_memory: Optional[np.ndarray] = None
+        self.base_screen: Optional[np.ndarray] = None
+        self.values: List[np.ndarray] = []
+        self.screens: List[np.ndarray] = []
+
+    def start(self, emulator):
+        self.base_memory = np.array(emulator.memory[0:MEMORY_SIZE], dtype=np.uint8)
+        if self.record_screens:
+            self.base_screen = np.array(emulator.screen.ndarray[:, :, 0], dtype=np.uint8)
+        self.values = []
+        self.screens = []
+
+    def capture(self, emulator):
+        mem = emulator.memory
+        self.values.append(np.array([mem[int(a)] for a in self.addresses], dtype=np.uint8))
+        if self.record_screens:
+            self.screens.append(np.array(emulator.screen.ndarray[:, :, 0], dtype=np.uint8))
+
+    def to_trace(self) -> EmulatorTrace:
+        if self.base_memory is None:
+            raise RuntimeError("TraceRecorder.start() must be called before to_trace()")
+        return EmulatorTrace(
+            base_memory=self.base_memory,
+            addresses=self.addresses,
+            values=np.stack(self.values) if self.values else np.zeros((0, len(self.addresses)), dtype=np.uint8),
+            screens=np.stack(self.screens) if self.screens else None,
+            base_screen=self.base_screen,
+        )
+
+
+def synthetic_trace(n_steps: int = 4096, seed: int = 0) -> EmulatorTrace:
+    """
+    Generate a plausible scripted trace for benchmarking: a random walk across a
+    few overworld maps with periodic battles, HP changes, level ups and events.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.zeros(MEMORY_SIZE, dtype=np.uint8)
+    # one level 6 starter with 20/20 hp
+    base[0xD163] = 1
+    base[0xD164] = 0xB0
+    base[0xD16D] = 20
+    base[0xD18E] = 20
+    base[0xD18C] = 6
+    base[0xD35E] = 0
+    base[0xD362], base[0xD361] = 5, 6
+
+    maps = [0, 12, 1, 13, 51, 2]
+    records: List[Dict[int, int]] = []
+    x, y, map_idx = 5, 6, 0
+    hp, level, events, badges = 20, 6, 0, 0
+    battle_left = 0
+    opp_hp = 0
+    for t in range(n_steps):
+        rec: Dict[int, int] = {}
+        if battle_left > 0:
+            battle_left -= 1
+            opp_hp = max(opp_hp - int(rng.integers(0, 4)), 0)
+            hp = max(hp - int(rng.integers(0, 2)), 1)
+            if battle_left == 0 or opp_hp == 0:
+                battle_left = 0
+                rec[0xD057] = 0
+                if opp_hp == 0 and level < 100:
+                    level += 1
+            rec.update({0xCFE6: 0, 0xCFE7: opp_hp, 0xCFF4: 0, 0xCFF5: 15})
+        else:
+            move = int(rng.integers(0, 5))
+            if move == 0:
+                y = min(y + 1, 40)
+            elif move == 1:
+                x = max(x - 1, 0)
+            elif move == 2:
+                x = min(x + 1, 40)
+            elif move == 3:
+                y = max(y - 1, 0)
+            if rng.random() < 0.002:
+                map_idx = maps[(maps.index(map_idx) + 1) % len(maps)]
+            if rng.random() < 0.01:
+                battle_left = int(rng.integers(5, 30))
+                opp_hp = 15
+                rec.update({0xD057: 1, 0xCFE6: 0, 0xCFE7: opp_hp, 0xCFF4: 0, 0xCFF5: 15})
+            if rng.random() < 0.02:
+                hp = min(hp + 1, 20)
+        if rng.random() < 0.003 and events < 8 * (0xD87E - 0xD747):
+            rec[0xD747 + events // 8] = (1 << (events % 8 + 1)) - 1
+            events += 1
+        if rng.random() < 0.0005 and badges < 8:
+            badges += 1
+            rec[0xD356] = (1 << badges) - 1
+        rec.update({0xD362: x, 0xD361: y, 0xD35E: map_idx, 0xD16D: hp, 0xD18C: level})
+        records.append(rec)
+
+    screens = rng.integers(0, 256, size=(min(n_steps, 64),) + SCREEN_SHAPE, dtype=np.uint8)
+    trace = EmulatorTrace.from_records(records, base_memory=base)
+    # tile a short screen loop over the trace to keep it small in memory
+    trace.screens = screens[np.arange(n_steps) % len(screens)]
+    return trace
+
+
+class EmulatorBackend(ABC):
+    """Interface RedGymEnv expects from an emulator (``PyBoy`` satisfies it natively)."""
+
+    memory: Any
+    screen: Any
+
+    @abstractmethod
+    def tick(self, count: int = 1, render: bool = True) -> bool:
+        ...
+
+    @abstractmethod
+    def send_input(self, event) -> None:
+        ...
+
+    @abstractmethod
+    def load_state(self, file_like) -> None:
+        ...
+
+    @abstractmethod
+    def save_state(self, file_like) -> None:
+        ...
+
+    def set_emulation_speed(self, speed: int) -> None:
+        pass
+
+    def stop(self, save: bool = True) -> None:
+        pass
+
+
+class _FakeScreen:
+    def __init__(self):
+        # PyBoy exposes RGBA; the env only reads channel 0
+        self.ndarray = np.zeros(SCREEN_SHAPE + (4,), dtype=np.uint8)
+
+
+class FakeEmulator(EmulatorBackend):
+    """
+    Deterministic ROM-free emulator that plays back an ``EmulatorTrace``.
+
+    Every ``frames_per_record`` ticked frames (one env step with the default
+    ``action_freq``) the next trace record is written into RAM and the screen.
+    ``on_input`` is an optional script hook called as ``on_input(emulator, event)``
+    on every ``send_input``, e.g. to move the player in response to arrow keys.
+    """
+
+    def __init__(
+        self,
+        trace: Optional[EmulatorTrace] = None,
+        frames_per_record: int = 24,
+        loop: bool = True,
+        on_input: Optional[Callable[['FakeEmulator', Any], None]] = None,
+    ):
+        self.trace = trace if trace is not None else synthetic_trace()
+        self.frames_per_record = max(int(frames_per_record), 1)
+        self.loop = loop
+        self.on_input = on_input
+        # bytearray returns plain ints like PyBoy's memory; the numpy view allows bulk writes
+        self.memory = bytearray(MEMORY_SIZE)
+        self._memory_view = np.frombuffer(self.memory, dtype=np.uint8)
+        self._addresses = self.trace.addresses.astype(np.intp)
+        self.screen = _FakeScreen()
+        self.frame_count = 0
+        self.record_index = -1
+        self.last_input = None
+        self._rewind()
+
+    def _rewind(self):
+        self._memory_view[:] = self.trace.base_memory
+        self.frame_count = 0
+        self.record_index = -1
+        if self.trace.base_screen is not None:
+            self._set_screen(self.trace.base_screen)
+        else:
+            self.screen.ndarray[:] = 0
+
+    def _set_screen(self, frame: np.ndarray):
+        self.screen.ndarray[:, :, :3] = frame[:, :, None]
+        self.screen.ndarray[:, :, 3] = 255
+
+    def _apply_record(self, index: int):
+        n_records = len(self.trace)
+        if n_records == 0:
+            return
+        if self.loop:
+            index %= n_records
+        else:
+            index = min(index, n_records - 1)
+        self._memory_view[self._addresses] = self.trace.values[index]
+        if self.trace.screens is not None:
+            self._set_screen(self.trace.screens[index])
+
+    def tick(self, count: int = 1, render: bool = True, sound: bool = True) -> bool:
+        self.frame_count += count
+        target = self.frame_count // self.frames_per_record - 1
+        if target != self.record_index and target >= 0:
+            self.record_index = target
+            self._apply_record(target)
+        return True
+
+    def send_input(self, event) -> None:
+        self.last_input = event
+        if self.on_input is not None:
+            self.on_input(self, event)
+
+    def save_state(self, file_like) -> None:
+        header = json.dumps({"frame_count": self.frame_count, "record_index": self.record_index}).encode()
+        file_like.write(_FAKE_STATE_MAGIC)
+        file_like.write(len(header).to_bytes(4, "little"))
+        file_like.write(header)
+        file_like.write(bytes(self.memory))
+        if self.screen is not None:
+            file_like.write(self.screen.ndarray.tobytes())
+
+    def load_state(self, file_like) -> None:
+        # Real PyBoy savestates (e.g. init.state) rewind to the start of the trace
+        if file_like.read(len(_FAKE_STATE_MAGIC)) != _FAKE_STATE_MAGIC:
+            self._rewind()
+            return
+        header_len = int.from_bytes(file_like.read(4), "little")
+        header = json.loads(file_like.read(header_len))
+        self.memory[:] = file_like.read(MEMORY_SIZE)
+        screen_bytes = file_like.read(self.screen.ndarray.nbytes)
+        if len(screen_bytes) == self.screen.ndarray.nbytes:
+            self.screen.ndarray[:] = np.frombuffer(screen_bytes, dtype=np.uint8).reshape(self.screen.ndarray.shape)
+        self.frame_count = header["frame_count"]
+        self.record_index = header["record_index"]
+
+
+def make_backend(config: Dict[str, Any]):
+    """
+    Build the emulator for an env config.
+
+    ``config["emulator_backend"]`` may be "pyboy" (default), "fake", or an
+    already constructed backend instance.
+    """
+    backend = config.get("emulator_backend", "pyboy")
+    if not isinstance(backend, str):
+        return backend
+
+    if backend == "fake":
+        trace = config.get("emulator_trace")
+        if trace is None:
+            trace = synthetic_trace(seed=config.get("emulator_trace_seed", 0))
+        elif not isinstance(trace, EmulatorTrace):
+            trace = EmulatorTrace.load(Path(trace))
+        return FakeEmulator(trace, frames_per_record=config.get("action_freq", 24))
+
+    if backend != "pyboy":
+        raise ValueError(f"Unknown emulator backend: {backend}. Available: ['pyboy', 'fake']")
+    if PyBoy is None:
+        raise ImportError("PyBoy is required for the 'pyboy' emulator backend (pip install pyboy)")
+
+    head = "null" if config["headless"] else "SDL2"
+    pyboy = PyBoy(
+        config["gb_path"],
+        window=head,
+    )
+    if not config["headless"]:
+        pyboy.set_emulation_speed(6)
+    return pyboy
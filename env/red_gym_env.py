@@ -1,3 +1,6 @@
+import copy
+import io
+import random
 import uuid
 import json
 from pathlib import Path
@@ -5,16 +8,18 @@ from pathlib import Path
 import numpy as np
 from skimage.transform import downscale_local_mean
 import matplotlib.pyplot as plt
-from pyboy import PyBoy
 #from pyboy.logger import log_level
-import mediapy as media
 from einops import repeat
 
 from gymnasium import Env, spaces
-from pyboy.utils import WindowEvent
 
+from .emulator_backend import WindowEvent, make_backend
 from .global_map import local_to_global, GLOBAL_MAP_SHAPE
 from .reward_config import RewardConfig, get_reward_config
+from .reward_engine import RewardEngine
+from .reward_trace import RewardTraceRecorder
+from .trajectory import REPLAY_CONFIG_KEYS, TRAJ_SUFFIX, TrajectoryWriter, state_sha256
+from .video_sink import VideoSink
 
 RESOURCE_DIR = Path(__file__).parent
 
@@ -22,6 +27,22 @@ event_flags_start = 0xD747
 event_flags_end = 0xD87E # expand for SS Anne # old - 0xD7F6 
 museum_ticket = (0xD754, 0)
 
+# Per-episode attributes (set in reset, mutated by step) that a mid-episode
+# resume has to carry over alongside the emulator savestate. agent_stats (one
+# dict per step) and explore_map are stored separately, in compact form.
+RESUME_STATE_ATTRS = (
+    "seed", "step_count", "reset_count", "seen_coords",
+    "explore_map_dim", "recent_screens", "recent_actions",
+    "levels_satisfied", "base_explore", "max_opponent_level", "max_event_rew",
+    "max_level_rew", "last_health", "total_healing_rew", "died_count",
+    "party_size", "base_event_flags", "current_event_flags_set",
+    "episode_visited_tiles", "recent_tile_queue", "prev_position", "in_battle",
+    "prev_player_hp", "prev_opponent_hp", "prev_levels", "prev_badges",
+    "start_badges", "prev_events", "episode_reward_components",
+    "episode_battle_stats", "episode_milestones", "max_map_progress",
+    "progress_reward", "total_reward",
+)
+
 class RedGymEnv(Env):
     def __init__(self, config=None):
         self.s_path = config["session_path"]
@@ -33,6 +54,10 @@ class RedGymEnv(Env):
         self.max_steps = config["max_steps"]
         self.save_video = config["save_video"]
         self.fast_video = config["fast_video"]
+        # Frames are encoded off the step path; when the buffer ring is full
+        # "drop" skips frames and "block" waits for the encoder (env/video_sink.py)
+        self.video_buffer_frames = config.get("video_buffer_frames", 64)
+        self.video_drop_policy = config.get("video_drop_policy", "drop")
         self.frame_stacks = 3
         self.explore_weight = (
             1 if "explore_weight" not in config else config["explore_weight"]
@@ -68,14 +93,15 @@ class RedGymEnv(Env):
                 legacy_heal=10.0,
             )
 
+        # Compile the reward config into a minimal per-step evaluation plan
+        self.reward_engine = RewardEngine(self.reward_config)
+
         # Task-specific termination condition (optional)
         # Can be: 'badge_earned', 'pokecenter_reached', or None
         self.termination_condition = config.get("termination_condition", None)
 
         self.s_path.mkdir(exist_ok=True)
-        self.full_frame_writer = None
-        self.model_frame_writer = None
-        self.map_frame_writer = None
+        self.video_sink = None
         self.reset_count = 0
         self.all_runs = []
 
@@ -85,6 +111,24 @@ class RedGymEnv(Env):
             ])
         }
 
+        # Optional RAM trace for offline reward replay (see env/reward_trace.py)
+        self.reward_trace = None
+        if config.get("reward_trace_dir"):
+            self.reward_trace = RewardTraceRecorder(
+                Path(config["reward_trace_dir"]), self.instance_id, self.essential_map_locations
+            )
+
+        # Optional per-episode action-log trajectories (see env/trajectory.py);
+        # True records under <session_path>/trajectories
+        self.record_trajectory = config.get("record_trajectory", None)
+        if self.record_trajectory is True:
+            self.record_trajectory = self.s_path / "trajectories"
+        self.trajectory_writer = None
+        self.trajectory_config = {
+            k: config[k] for k in REPLAY_CONFIG_KEYS
+            if k in config and isinstance(config[k], (str, int, float, type(None)))
+        }
+
         # Set this in SOME subclasses
         self.metadata = {"render.modes": []}
         self.reward_range = (0, 15000)
@@ -135,23 +179,14 @@ class RedGymEnv(Env):
             }
         )
 
-        head = "null" if config["headless"] else "SDL2"
-
         #log_level("ERROR")
-        self.pyboy = PyBoy(
-            config["gb_path"],
-            #debugging=False,
-            #disable_input=False,
-            window=head,
-        )
-
-        #self.screen = self.pyboy.botsupport_manager().screen()
-
-        if not config["headless"]:
-            self.pyboy.set_emulation_speed(6)
+        # PyBoy by default; config["emulator_backend"] = "fake" plays back a
+        # RAM/screen trace instead (see env/emulator_backend.py)
+        self.pyboy = make_backend(config)
 
     def reset(self, seed=None, options={}):
         self.seed = seed
+        self.close_video()
         # restart game, skipping credits
         with open(self.init_state, "rb") as f:
             self.pyboy.load_state(f)
@@ -178,10 +213,7 @@ class RedGymEnv(Env):
         self.party_size = 0
         self.step_count = 0
 
-        self.base_event_flags = sum([
-                self.bit_count(self.read_m(i))
-                for i in range(event_flags_start, event_flags_end)
-        ])
+        self.base_event_flags = sum(map(self.bit_count, self.read_event_flags()))
 
         self.current_event_flags_set = {}
 
@@ -194,12 +226,14 @@ class RedGymEnv(Env):
         self.prev_position = self.get_game_coords()
         # Battle tracking
         self.in_battle = False
-        self.prev_player_hp = self.read_hp_fraction()
-        self.prev_opponent_hp = self.get_opponent_hp_fraction()
-        # Milestone tracking
-        self.prev_levels = self.get_party_levels()
+        self.prev_player_hp = 1.0
+        self.prev_opponent_hp = 0.0
+        # Milestone tracking (prev_badges is also used by the badge_earned termination)
+        self.prev_levels = []
         self.prev_badges = self.get_badges()
-        self.prev_events = self.get_all_events_reward()
+        # badges held at reset; success means earning one more (mid-game savestates)
+        self.start_badges = self.prev_badges
+        self.prev_events = 0
         # Reward component accumulators for this episode
         self.episode_reward_components = {
             'exploration': 0.0,
@@ -229,14 +263,84 @@ class RedGymEnv(Env):
         # self.max_steps += 128
 
         self.max_map_progress = 0
-        self.progress_reward = self.get_game_state_reward()
-        self.total_reward = sum([val for _, val in self.progress_reward.items()])
+        self.progress_reward = {"event": 0.0, "heal": 0.0, "badge": 0.0, "explore": 0.0, "stuck": 0.0}
+        self.total_reward = 0.0
+        # Per-episode baselines of the enabled reward components
+        self.reward_engine.reset(self)
+        if self.reward_trace is not None:
+            self.reward_trace.record(self.pyboy.memory, is_reset=True)
+        if self.record_trajectory:
+            self.start_trajectory()
         self.reset_count += 1
         return self._get_obs(), {}
 
     def init_map_mem(self):
         self.seen_coords = {}
 
+    def start_trajectory(self):
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.close()
+        path = Path(self.record_trajectory) / f"traj_{self.instance_id}_{self.reset_count}{TRAJ_SUFFIX}"
+        self.trajectory_writer = TrajectoryWriter(
+            path,
+            self.pyboy.memory,
+            {
+                "start_state": str(self.init_state),
+                "start_state_sha256": state_sha256(self.init_state),
+                "instance_id": self.instance_id,
+                "reset_count": self.reset_count,
+                "seed": self.seed,
+                "env_config": self.trajectory_config,
+            },
+        )
+
+    def get_resume_state(self):
+        """
+        Emulator savestate, episode tracking and RNG state, for an exact mid-episode resume.
+
+        Attributes are returned as is, not copied: pickle the state (as
+        SubprocVecEnv.env_method does) before stepping the env again.
+        """
+        buf = io.BytesIO()
+        self.pyboy.save_state(buf)
+        return {
+            "emulator": buf.getvalue(),
+            "attrs": {name: getattr(self, name) for name in RESUME_STATE_ATTRS},
+            # only what TensorboardCallback reads from agent_stats: the last entry and the length
+            "agent_stats_last": self.agent_stats[-1] if self.agent_stats else None,
+            "agent_stats_len": len(self.agent_stats),
+            # tiles are 0 or 255
+            "explore_map": np.packbits(self.explore_map > 0),
+            "python_rng": random.getstate(),
+            "numpy_rng": np.random.get_state(),
+        }
+
+    def set_resume_state(self, state):
+        """Continue the episode captured by ``get_resume_state``."""
+        self.close_video()
+        self.pyboy.load_state(io.BytesIO(state["emulator"]))
+        for name, value in state["attrs"].items():
+            setattr(self, name, copy.deepcopy(value))
+        if "explore_map" in state:  # (older resume states keep both in attrs)
+            size = int(np.prod(self.explore_map_dim))
+            self.explore_map = np.unpackbits(state["explore_map"], count=size).reshape(self.explore_map_dim) * np.uint8(255)
+            # earlier steps' stats are not kept; placeholders preserve the episode length
+            self.agent_stats = [state["agent_stats_last"]] * state["agent_stats_len"]
+        random.setstate(state["python_rng"])
+        np.random.set_state(state["numpy_rng"])
+        # a trajectory must start at a reset to be replayable; recording resumes
+        # with the next episode (videos restart there too)
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.close()
+            self.trajectory_writer = None
+
+    def close(self):
+        if self.reward_trace is not None:
+            self.reward_trace.flush()
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.close()
+        self.close_video()
+
     def render(self, reduce_res=True):
         game_pixels_render = self.pyboy.screen.ndarray[:,:,0:1]  # (144, 160, 3)
         if reduce_res:
@@ -274,6 +378,8 @@ class RedGymEnv(Env):
             self.start_video()
 
         self.run_action_on_emulator(action)
+        if self.trajectory_writer is not None:
+            self.trajectory_writer.write_step(action, self.pyboy.memory)
         self.append_agent_stats(action)
 
         self.update_recent_actions(action)
@@ -287,6 +393,8 @@ class RedGymEnv(Env):
         self.party_size = self.read_m(0xD163)
 
         new_reward = self.update_reward()
+        if self.reward_trace is not None:
+            self.reward_trace.record(self.pyboy.memory)
 
         self.last_health = self.read_hp_fraction()
 
@@ -320,7 +428,7 @@ class RedGymEnv(Env):
             # Determine if episode was successful
             success = False
             if self.termination_condition == 'badge_earned':
-                success = self.get_badges() > 0
+                success = self.get_badges() > self.start_badges
             elif self.termination_condition == 'pokecenter_reached':
                 current_map = self.read_m(0xD35E)
                 success = current_map == 40
@@ -366,7 +474,8 @@ class RedGymEnv(Env):
         self.pyboy.send_input(self.release_actions[action])
         self.pyboy.tick(self.act_freq - press_step - 1, render_screen)
         self.pyboy.tick(1, True)
-        if self.save_video and self.fast_video:
+        # no sink for the rest of an episode continued by set_resume_state
+        if self.video_sink is not None and self.fast_video:
             self.add_video_frame()
         
     def append_agent_stats(self, action):
@@ -396,13 +505,7 @@ class RedGymEnv(Env):
         )
 
     def start_video(self):
-
-        if self.full_frame_writer is not None:
-            self.full_frame_writer.close()
-        if self.model_frame_writer is not None:
-            self.model_frame_writer.close()
-        if self.map_frame_writer is not None:
-            self.map_frame_writer.close()
+        self.close_video()
 
         base_dir = self.s_path / Path("rollouts")
         base_dir.mkdir(exist_ok=True)
@@ -412,33 +515,33 @@ class RedGymEnv(Env):
         model_name = Path(
             f"model_reset_{self.reset_count}_id{self.instance_id}"
         ).with_suffix(".mp4")
-        self.full_frame_writer = media.VideoWriter(
-            base_dir / full_name, (144, 160), fps=60, input_format="gray"
-        )
-        self.full_frame_writer.__enter__()
-        self.model_frame_writer = media.VideoWriter(
-            base_dir / model_name, self.output_shape[:2], fps=60, input_format="gray"
-        )
-        self.model_frame_writer.__enter__()
         map_name = Path(
             f"map_reset_{self.reset_count}_id{self.instance_id}"
         ).with_suffix(".mp4")
-        self.map_frame_writer = media.VideoWriter(
-            base_dir / map_name,
-            (self.coords_pad*4, self.coords_pad*4), 
-            fps=60, input_format="gray"
+        # writers are opened by the sink's encoder thread on the first frame
+        self.video_sink = VideoSink(
+            {
+                "full": (base_dir / full_name, (144, 160)),
+                "model": (base_dir / model_name, self.output_shape[:2]),
+                "map": (base_dir / map_name, (self.coords_pad*4, self.coords_pad*4)),
+            },
+            fps=60,
+            capacity=self.video_buffer_frames,
+            policy=self.video_drop_policy,
         )
-        self.map_frame_writer.__enter__()
+
+    def close_video(self):
+        if self.video_sink is not None:
+            self.video_sink.close()
+            self.video_sink = None
 
     def add_video_frame(self):
-        self.full_frame_writer.add_image(
-            self.render(reduce_res=False)[:,:,0]
-        )
-        self.model_frame_writer.add_image(
-            self.render(reduce_res=True)[:,:,0]
-        )
-        self.map_frame_writer.add_image(
-            self.get_explore_map()
+        # render once; the model frame is the same downscale render() applies
+        full = self.pyboy.screen.ndarray[:,:,0]
+        self.video_sink.add(
+            full=full,
+            model=downscale_local_mean(full, (2,2)).astype(np.uint8),
+            map=self.get_explore_map(),
         )
 
     def get_game_coords(self):
@@ -500,11 +603,10 @@ class RedGymEnv(Env):
         Compute total reward for this step using shaped reward components.
         Tracks both new shaped rewards and legacy rewards for comparison.
         """
-        # Compute shaped reward components
-        exploration_rew = self.compute_exploration_reward()
-        battle_rew = self.compute_battle_reward()
-        milestone_rew = self.compute_milestone_reward()
-        penalty_rew = self.compute_penalty_reward()
+        # Evaluate all enabled components in one pass (see env/reward_engine.py)
+        exploration_rew, battle_rew, milestone_rew, penalty_rew, legacy_step_reward = (
+            self.reward_engine.step(self)
+        )
 
         # Accumulate episode component totals for logging
         self.episode_reward_components['exploration'] += exploration_rew
@@ -515,11 +617,7 @@ class RedGymEnv(Env):
         # Total step reward from shaped components
         step_reward = exploration_rew + battle_rew + milestone_rew + penalty_rew
 
-        # Also compute legacy reward for backward compatibility and logging
-        self.progress_reward = self.get_game_state_reward()
-        new_total = sum([val for _, val in self.progress_reward.items()])
-        legacy_step_reward = new_total - self.total_reward
-        self.total_reward = new_total
+        # Legacy reward is only tracked for logging (enable_legacy_tracking)
         self.episode_reward_components['legacy'] += legacy_step_reward
 
         # Return the shaped reward (this is what the agent actually receives)
@@ -598,9 +696,7 @@ class RedGymEnv(Env):
                 )
 
         if self.save_video and done:
-            self.full_frame_writer.close()
-            self.model_frame_writer.close()
-            self.map_frame_writer.close()
+            self.close_video()
 
     def read_m(self, addr):
         #return self.pyboy.get_memory_value(addr)
@@ -610,6 +706,10 @@ class RedGymEnv(Env):
         # add padding so zero will read '0b100000000' instead of '0b0'
         return bin(256 + self.read_m(addr))[-bit - 1] == "1"
 
+    def read_event_flags(self):
+        # one bulk read of the whole event flag range
+        return self.pyboy.memory[event_flags_start:event_flags_end]
+
     def read_event_bits(self):
         return [
             int(bit) for i in range(event_flags_start, event_flags_end) 
@@ -666,26 +766,28 @@ class RedGymEnv(Env):
     def get_all_events_reward(self):
         # adds up all event flags, exclude museum ticket
         return max(
-            sum([
-                self.bit_count(self.read_m(i))
-                for i in range(event_flags_start, event_flags_end)
-            ])
+            sum(map(self.bit_count, self.read_event_flags()))
             - self.base_event_flags
             - int(self.read_bit(museum_ticket[0], museum_ticket[1])),
             0,
         )
 
-    def compute_exploration_reward(self):
+    def read_reward_state(self):
+        """Read the game-state fields used by the enabled reward components."""
+        return self.reward_engine.read_state(self)
+
+    def compute_exploration_reward(self, state=None):
         """
         Compute exploration reward based on visiting new tiles.
         Returns reward for this step.
         """
         if not self.reward_config.enable_exploration:
             return 0.0
+        if state is None:
+            state = self.read_reward_state()
 
         reward = 0.0
-        x_pos, y_pos, map_n = self.get_game_coords()
-        coord_string = f"x:{x_pos} y:{y_pos} m:{map_n}"
+        coord_string = state["coord_key"]
 
         # Check if this is a new tile for this episode
         if coord_string not in self.episode_visited_tiles:
@@ -702,20 +804,26 @@ class RedGymEnv(Env):
 
         return reward * self.reward_config.reward_scale
 
-    def compute_battle_reward(self):
+    def reset_battle_reward(self, state):
+        self.prev_player_hp = state["player_hp"]
+        self.prev_opponent_hp = state["opponent_hp"]
+
+    def compute_battle_reward(self, state=None):
         """
         Compute battle reward based on HP changes and battle outcomes.
         Returns reward for this step.
         """
         if not self.reward_config.enable_battle:
             return 0.0
+        if state is None:
+            state = self.read_reward_state()
 
         reward = 0.0
-        current_in_battle = self.read_m(0xD057) != 0
+        current_in_battle = state["in_battle"]
 
         # Get current HP fractions
-        current_player_hp = self.read_hp_fraction()
-        current_opponent_hp = self.get_opponent_hp_fraction()
+        current_player_hp = state["player_hp"]
+        current_opponent_hp = state["opponent_hp"]
 
         # Detect battle transitions
         if current_in_battle and not self.in_battle:
@@ -757,18 +865,26 @@ class RedGymEnv(Env):
 
         return reward * self.reward_config.reward_scale
 
-    def compute_milestone_reward(self):
+    def reset_milestone_reward(self, state):
+        self.prev_position = state["coords"]
+        self.prev_levels = state["party_levels"]
+        self.prev_badges = state["badges"]
+        self.prev_events = state["event_count"]
+
+    def compute_milestone_reward(self, state=None):
         """
         Compute milestone reward for achievements (badges, levels, events).
         Returns reward for this step.
         """
         if not self.reward_config.enable_milestone:
             return 0.0
+        if state is None:
+            state = self.read_reward_state()
 
         reward = 0.0
 
         # Badge milestone
-        current_badges = self.get_badges()
+        current_badges = state["badges"]
         if current_badges > self.prev_badges:
             badge_gain = current_badges - self.prev_badges
             reward += badge_gain * self.reward_config.milestone_badge
@@ -777,7 +893,7 @@ class RedGymEnv(Env):
             self.prev_badges = current_badges
 
         # Level up milestone
-        current_levels = self.get_party_levels()
+        current_levels = state["party_levels"]
         total_level_gain = sum(current_levels) - sum(self.prev_levels)
         if total_level_gain > 0:
             reward += total_level_gain * self.reward_config.milestone_level_up
@@ -786,27 +902,32 @@ class RedGymEnv(Env):
             self.prev_levels = current_levels
 
         # Event flag milestone
-        current_events = self.get_all_events_reward()
+        current_events = state["event_count"]
         if current_events > self.prev_events:
             event_gain = current_events - self.prev_events
             reward += event_gain * self.reward_config.milestone_event
             self.prev_events = current_events
 
         # Key location milestone
-        map_idx = self.read_m(0xD35E)
+        map_idx = state["coords"][2]
         prev_map = self.prev_position[2]
         if map_idx != prev_map and map_idx in self.essential_map_locations:
             reward += self.reward_config.milestone_key_location
 
         return reward * self.reward_config.reward_scale
 
-    def compute_penalty_reward(self):
+    def reset_penalty_reward(self, state):
+        self.prev_position = state["coords"]
+
+    def compute_penalty_reward(self, state=None):
         """
         Compute penalty rewards (step penalty, wall collision, stuck).
         Returns reward for this step (typically negative).
         """
         if not self.reward_config.enable_penalty:
             return 0.0
+        if state is None:
+            state = self.read_reward_state()
 
         reward = 0.0
 
@@ -814,15 +935,14 @@ class RedGymEnv(Env):
         reward += self.reward_config.penalty_step
 
         # Wall collision penalty (no movement despite action)
-        current_pos = self.get_game_coords()
+        current_pos = state["coords"]
         if current_pos == self.prev_position:
             # Check if we're not in a menu or battle (where staying still is expected)
-            if self.read_m(0xD057) == 0:  # Not in battle
+            if not state["in_battle"]:
                 reward += self.reward_config.penalty_wall
 
         # Stuck penalty (staying in same location too long)
-        coord_string = f"x:{current_pos[0]} y:{current_pos[1]} m:{current_pos[2]}"
-        if coord_string in self.seen_coords and self.seen_coords[coord_string] > 600:
+        if state["coord_visits"] > 600:
             reward += self.reward_config.penalty_stuck
 
         # Update previous position
@@ -843,18 +963,43 @@ class RedGymEnv(Env):
         # For compatibility, we return 0 here and let the legacy code handle it
         return 0.0
 
-    def get_game_state_reward(self, print_stats=False):
+    def reset_game_state_reward(self, state):
+        self.progress_reward = self.get_game_state_reward(state=state)
+        self.total_reward = sum([val for _, val in self.progress_reward.items()])
+
+    def compute_game_state_reward(self, state=None):
+        """
+        Update the legacy progress reward and return its change this step.
+        Only logged (as the 'legacy' component), never given to the agent.
+        """
+        self.progress_reward = self.get_game_state_reward(state=state)
+        new_total = sum([val for _, val in self.progress_reward.items()])
+        legacy_step_reward = new_total - self.total_reward
+        self.total_reward = new_total
+        return legacy_step_reward
+
+    def get_game_state_reward(self, print_stats=False, state=None):
         # addresses from https://datacrystal.romhacking.net/wiki/Pok%C3%A9mon_Red/Blue:RAM_map
         # https://github.com/pret/pokered/blob/91dc3c9f9c8fd529bb6e8307b58b96efa0bec67e/constants/event_constants.asm
+        if state is None:
+            self.max_event_rew = max(self.get_all_events_reward(), self.max_event_rew)
+            badges = self.get_badges()
+            seen_count = len(self.seen_coords)
+            coord_count_reward = self.get_current_coord_count_reward()
+        else:
+            self.max_event_rew = max(state["event_count"], self.max_event_rew)
+            badges = state["badges"]
+            seen_count = state["seen_count"]
+            coord_count_reward = 0 if state["coord_visits"] < 600 else 1
         state_scores = {
-            "event": self.reward_scale * self.update_max_event_rew() * 4,
+            "event": self.reward_scale * self.max_event_rew * 4,
             #"level": self.reward_scale * self.get_levels_reward(),
             "heal": self.reward_scale * self.total_healing_rew * 10,
             #"op_lvl": self.reward_scale * self.update_max_op_level() * 0.2,
             #"dead": self.reward_scale * self.died_count * -0.1,
-            "badge": self.reward_scale * self.get_badges() * 10,
-            "explore": self.reward_scale * self.explore_weight * len(self.seen_coords) * 0.1,
-            "stuck": self.reward_scale * self.get_current_coord_count_reward() * -0.05
+            "badge": self.reward_scale * badges * 10,
+            "explore": self.reward_scale * self.explore_weight * seen_count * 0.1,
+            "stuck": self.reward_scale * coord_count_reward * -0.05
         }
 
         return state_scores
@@ -905,7 +1050,7 @@ class RedGymEnv(Env):
 
     # built-in since python 3.10
     def bit_count(self, bits):
-        return bin(bits).count("1")
+        return int(bits).bit_count()
     
     def fourier_encode(self, val):
         return np.sin(val * 2 ** np.arange(self.enc_freqs))
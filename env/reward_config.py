@@ -67,6 +67,8 @@ class RewardConfig:
     enable_milestone: bool = True
     enable_penalty: bool = True
     enable_legacy_heal: bool = True
+    # Track the legacy progress reward (logged as the 'legacy' component only)
+    enable_legacy_tracking: bool = True
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert config to dictionary."""
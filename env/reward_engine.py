@@ -0,0 +1,180 @@
+"""
+Compiled reward evaluation for RedGymEnv.
+
+Each reward component declares the game-state fields it reads, the
+RewardConfig coefficients it is weighted by, and its enable toggle. At env
+construction a RewardConfig is compiled into a RewardEngine holding a minimal
+evaluation plan:
+- only the fields needed by enabled components are read, once per step
+- disabled components (and the legacy progress reward unless
+  ``enable_legacy_tracking``) are skipped entirely
+- one call returns the whole component vector
+
+The per-component logic lives in the RedGymEnv ``compute_*`` methods, which take
+the shared state dict.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .reward_config import RewardConfig
+
+COMPONENT_NAMES = ('exploration', 'battle', 'milestone', 'penalty', 'legacy')
+
+
+def _coord_key(env, state):
+    x_pos, y_pos, map_n = state["coords"]
+    return f"x:{x_pos} y:{y_pos} m:{map_n}"
+
+
+def _opponent_hp(env, state):
+    # same as RedGymEnv.get_opponent_hp_fraction, reusing the battle flag read
+    if not state["in_battle"]:
+        return 0.0
+    max_hp = env.read_hp(0xCFF4)
+    if max_hp == 0:
+        return 0.0
+    return env.read_hp(0xCFE6) / max_hp
+
+
+# field name -> (reader(env, state), fields the reader depends on)
+STATE_FIELDS: Dict[str, Tuple[Callable[[Any, Dict[str, Any]], Any], Tuple[str, ...]]] = {
+    "coords": (lambda env, state: env.get_game_coords(), ()),
+    "coord_key": (_coord_key, ("coords",)),
+    "in_battle": (lambda env, state: env.read_m(0xD057) != 0, ()),
+    "player_hp": (lambda env, state: env.read_hp_fraction(), ()),
+    "opponent_hp": (_opponent_hp, ("in_battle",)),
+    "party_levels": (lambda env, state: env.get_party_levels(), ()),
+    "badges": (lambda env, state: env.get_badges(), ()),
+    "event_count": (lambda env, state: env.get_all_events_reward(), ()),
+    "coord_visits": (lambda env, state: env.seen_coords.get(state["coord_key"], 0), ("coord_key",)),
+    "seen_count": (lambda env, state: len(env.seen_coords), ()),
+}
+
+
+@dataclass(frozen=True)
+class RewardComponent:
+    """Declaration of one reward channel."""
+
+    name: str
+    # RedGymEnv methods: step reward from a state dict / episode baseline setup
+    # (None when the component keeps no per-episode baseline)
+    method: str
+    reset_method: Optional[str]
+    # game-state fields read by the component (keys of STATE_FIELDS)
+    fields: Tuple[str, ...]
+    # RewardConfig coefficients the component is weighted by
+    weights: Tuple[str, ...]
+    # RewardConfig toggle
+    toggle: str
+
+    def is_enabled(self, config: RewardConfig) -> bool:
+        return bool(getattr(config, self.toggle))
+
+
+# Evaluation order matters: the milestone key-location check compares against
+# prev_position, which the penalty component updates afterwards.
+REWARD_COMPONENTS: Tuple[RewardComponent, ...] = (
+    RewardComponent(
+        name='exploration',
+        method='compute_exploration_reward',
+        reset_method=None,  # visited tiles and the recent tile queue are reset with the episode
+        fields=("coord_key",),
+        weights=("exploration_new_tile", "exploration_recent_tile", "exploration_recent_window"),
+        toggle='enable_exploration',
+    ),
+    RewardComponent(
+        name='battle',
+        method='compute_battle_reward',
+        reset_method='reset_battle_reward',
+        fields=("in_battle", "player_hp", "opponent_hp"),
+        weights=("battle_start_bonus", "battle_hp_delta", "battle_win", "battle_loss"),
+        toggle='enable_battle',
+    ),
+    RewardComponent(
+        name='milestone',
+        method='compute_milestone_reward',
+        reset_method='reset_milestone_reward',
+        fields=("coords", "badges", "party_levels", "event_count"),
+        weights=("milestone_badge", "milestone_level_up", "milestone_event", "milestone_key_location"),
+        toggle='enable_milestone',
+    ),
+    RewardComponent(
+        name='penalty',
+        method='compute_penalty_reward',
+        reset_method='reset_penalty_reward',
+        fields=("coords", "coord_key", "in_battle", "coord_visits"),
+        weights=("penalty_step", "penalty_wall", "penalty_stuck"),
+        toggle='enable_penalty',
+    ),
+    RewardComponent(
+        name='legacy',
+        method='compute_game_state_reward',
+        reset_method='reset_game_state_reward',
+        fields=("badges", "event_count", "seen_count", "coord_visits"),
+        weights=(),
+        toggle='enable_legacy_tracking',
+    ),
+)
+
+
+def _resolve_fields(components) -> Tuple[str, ...]:
+    """Union of fields needed by components, ordered so dependencies come first."""
+    ordered: List[str] = []
+
+    def visit(name: str):
+        if name in ordered:
+            return
+        if name not in STATE_FIELDS:
+            raise ValueError(f"Unknown reward state field: {name}")
+        for dep in STATE_FIELDS[name][1]:
+            visit(dep)
+        ordered.append(name)
+
+    for component in components:
+        for name in component.fields:
+            visit(name)
+    return tuple(ordered)
+
+
+class RewardEngine:
+    """A RewardConfig compiled into a minimal per-step evaluation plan."""
+
+    def __init__(self, config: RewardConfig):
+        self.config = config
+        self.components = tuple(c for c in REWARD_COMPONENTS if c.is_enabled(config))
+        self.fields = _resolve_fields(self.components)
+        self._readers = tuple((name, STATE_FIELDS[name][0]) for name in self.fields)
+        self._plan = tuple((COMPONENT_NAMES.index(c.name), c.method) for c in self.components)
+        self._resets = tuple(c.reset_method for c in self.components if c.reset_method)
+
+    def describe(self) -> Dict[str, Any]:
+        """Human-readable plan: enabled components, their weights and the fields read."""
+        return {
+            "components": {
+                c.name: {w: getattr(self.config, w) for w in c.weights} for c in self.components
+            },
+            "skipped": [c.name for c in REWARD_COMPONENTS if c not in self.components],
+            "fields": list(self.fields),
+        }
+
+    def read_state(self, env) -> Dict[str, Any]:
+        state: Dict[str, Any] = {}
+        for name, reader in self._readers:
+            state[name] = reader(env, state)
+        return state
+
+    def reset(self, env) -> Dict[str, Any]:
+        """Set per-episode baselines of every enabled component."""
+        state = self.read_state(env)
+        for reset_method in self._resets:
+            getattr(env, reset_method)(state)
+        return state
+
+    def step(self, env) -> List[float]:
+        """Evaluate all enabled components in one pass, ordered as COMPONENT_NAMES."""
+        state = self.read_state(env)
+        values = [0.0] * len(COMPONENT_NAMES)
+        for idx, method in self._plan:
+            values[idx] = getattr(env, method)(state)
+        return values
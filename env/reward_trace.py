@@ -0,0 +1,313 @@
+"""
+Offline reward replay from recorded RAM traces.
+
+``RewardTraceRecorder`` saves, per env step, only the RAM bytes the shaped
+reward components read (coords, battle flag, party/opponent HP, levels,
+badges, event flags) as compact NumPy shards. Enable it with
+``config["reward_trace_dir"]`` on any RedGymEnv rollout.
+
+``RewardFeatures`` turns a trace into config-independent per-step features
+once. Every shaped component is linear in its RewardConfig coefficients given
+those features, so ``evaluate_reward_configs`` recomputes the exploration,
+battle, milestone and penalty rewards for many configs at once, vectorized over
+time steps, instead of re-running the emulator per variant. The arithmetic
+follows RedGymEnv's evaluation order, so totals match the env exactly.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from .reward_config import RewardConfig
+
+SHAPED_COMPONENTS = ('exploration', 'battle', 'milestone', 'penalty')
+
+# Bulk-read RAM windows; only REWARD_TRACE_ADDRESSES are stored
+_READ_WINDOWS = ((0xCFE6, 0xCFF6), (0xD057, 0xD058), (0xD16C, 0xD26B), (0xD356, 0xD363), (0xD747, 0xD87E))
+
+_PARTY_HP = [0xD16C, 0xD198, 0xD1C4, 0xD1F0, 0xD21C, 0xD248]
+_PARTY_MAX_HP = [0xD18D, 0xD1B9, 0xD1E5, 0xD211, 0xD23D, 0xD269]
+_PARTY_LEVELS = [0xD18C, 0xD1B8, 0xD1E4, 0xD210, 0xD23C, 0xD268]
+_EVENT_FLAGS = list(range(0xD747, 0xD87E))
+_MUSEUM_TICKET = (0xD754, 0)
+
+REWARD_TRACE_ADDRESSES = tuple(sorted(set(
+    [0xD362, 0xD361, 0xD35E, 0xD057, 0xD356]
+    + [0xCFE6, 0xCFE7, 0xCFF4, 0xCFF5]
+    + [a + i for a in _PARTY_HP + _PARTY_MAX_HP for i in (0, 1)]
+    + _PARTY_LEVELS
+    + _EVENT_FLAGS
+)))
+
+
+def _window_offsets(addresses: Sequence[int]) -> np.ndarray:
+    """Positions of ``addresses`` inside the concatenated read windows."""
+    positions = {}
+    offset = 0
+    for start, end in _READ_WINDOWS:
+        for addr in range(start, end):
+            positions[addr] = offset + addr - start
+        offset += end - start
+    return np.array([positions[a] for a in addresses], dtype=np.intp)
+
+
+class RewardTraceRecorder:
+    """
+    Streams reward-relevant RAM rows to ``rewardtrace_<instance>_<shard>.npz``.
+
+    One row is written when an episode resets (baselines) and one after every step.
+    """
+
+    def __init__(self, out_dir: Path, instance_id: str, essential_maps: Iterable[int], shard_rows: int = 8192):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.instance_id = instance_id
+        self.essential_maps = sorted(int(m) for m in essential_maps)
+        self.shard_rows = shard_rows
+        self.addresses = np.array(REWARD_TRACE_ADDRESSES, dtype=np.uint16)
+        self._offsets = _window_offsets(REWARD_TRACE_ADDRESSES)
+        self._rows = np.zeros((shard_rows, len(self.addresses)), dtype=np.uint8)
+        self._is_reset = np.zeros(shard_rows, dtype=bool)
+        self._n = 0
+        self._shard = 0
+
+    def record(self, memory, is_reset: bool = False):
+        window = b"".join(bytes(memory[start:end]) for start, end in _READ_WINDOWS)
+        self._rows[self._n] = np.frombuffer(window, dtype=np.uint8)[self._offsets]
+        self._is_reset[self._n] = is_reset
+        self._n += 1
+        if self._n == self.shard_rows:
+            self.flush()
+
+    def flush(self):
+        if self._n == 0:
+            return
+        path = self.out_dir / f"rewardtrace_{self.instance_id}_{self._shard:05d}.npz"
+        np.savez_compressed(
+            path,
+            ram=self._rows[: self._n],
+            is_reset=self._is_reset[: self._n],
+            addresses=self.addresses,
+            essential_maps=np.array(self.essential_maps, dtype=np.int64),
+        )
+        self._shard += 1
+        self._n = 0
+
+
+@dataclass
+class RewardTrace:
+    ram: np.ndarray  # (N, K) uint8, columns ordered as addresses
+    is_reset: np.ndarray  # (N,) bool
+    addresses: np.ndarray  # (K,) uint16
+    essential_maps: np.ndarray
+
+    def column(self, addr: int) -> np.ndarray:
+        return self.ram[:, int(np.searchsorted(self.addresses, addr))]
+
+    def word(self, addr: int) -> np.ndarray:
+        return 256 * self.column(addr).astype(np.int64) + self.column(addr + 1)
+
+
+def load_reward_trace(paths: Iterable[Path]) -> List[RewardTrace]:
+    """
+    Load shards; shards of the same env instance are concatenated in order.
+    Returns one RewardTrace per instance.
+    """
+    by_instance: Dict[str, List[Path]] = {}
+    for path in sorted(Path(p) for p in paths):
+        instance = path.stem.rsplit("_", 1)[0]
+        by_instance.setdefault(instance, []).append(path)
+
+    traces = []
+    for instance, shard_paths in sorted(by_instance.items()):
+        rams, resets = [], []
+        addresses = essential = None
+        for path in shard_paths:
+            with np.load(path) as data:
+                rams.append(data["ram"])
+                resets.append(data["is_reset"])
+                addresses = data["addresses"]
+                essential = data["essential_maps"]
+        ram = np.concatenate(rams)
+        is_reset = np.concatenate(resets)
+        if len(is_reset) == 0 or not is_reset[0]:
+            # drop a partial episode recorded before the first reset
+            first = np.flatnonzero(is_reset)
+            if len(first) == 0:
+                continue
+            ram, is_reset = ram[first[0]:], is_reset[first[0]:]
+        traces.append(RewardTrace(ram=ram, is_reset=is_reset, addresses=addresses, essential_maps=essential))
+    return traces
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    return np.unpackbits(values[..., None], axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def _segment_running_max(values: np.ndarray, segment_start: np.ndarray) -> np.ndarray:
+    """np.maximum.accumulate restarted at every segment start."""
+    out = np.empty_like(values)
+    starts = np.flatnonzero(segment_start)
+    bounds = list(starts) + [len(values)]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        out[lo:hi] = np.maximum.accumulate(values[lo:hi])
+    return out
+
+
+class RewardFeatures:
+    """Config-independent per-step reward features of one RewardTrace."""
+
+    def __init__(self, trace: RewardTrace):
+        is_reset = trace.is_reset
+        n = len(is_reset)
+        episode = np.cumsum(is_reset) - 1
+        # row of the reset each row belongs to
+        reset_row = np.flatnonzero(is_reset)[episode]
+
+        x = trace.column(0xD362).astype(np.int64)
+        y = trace.column(0xD361).astype(np.int64)
+        map_n = trace.column(0xD35E).astype(np.int64)
+        in_battle = trace.column(0xD057) != 0
+
+        hp = sum(trace.word(a) for a in _PARTY_HP)
+        max_hp = np.maximum(sum(trace.word(a) for a in _PARTY_MAX_HP), 1)
+        player_hp = hp / max_hp
+        opp_max = trace.word(0xCFF4)
+        opp_hp = np.where(in_battle & (opp_max > 0), trace.word(0xCFE6) / np.maximum(opp_max, 1), 0.0)
+
+        levels = sum(trace.column(a).astype(np.int64) for a in _PARTY_LEVELS)
+        badges = _popcount(trace.column(0xD356))
+        flag_cols = np.searchsorted(trace.addresses, _EVENT_FLAGS)
+        flag_bits = _popcount(trace.ram[:, flag_cols]).sum(axis=1)
+        museum = (trace.column(_MUSEUM_TICKET[0]) >> _MUSEUM_TICKET[1]) & 1
+        events = np.maximum(flag_bits - flag_bits[reset_row] - museum, 0)
+
+        # previous row (the reset row for the first step of an episode)
+        prev = np.arange(n) - 1
+        prev[is_reset] = np.arange(n)[is_reset]
+
+        step = ~is_reset
+        self.n_steps = int(step.sum())
+        self.episode = episode[step]
+        self.n_episodes = int(is_reset.sum())
+
+        # --- exploration: first visit this episode / steps since last visit
+        key = x | (y << 8) | (map_n << 16) | (episode << 24)
+        step_idx = np.flatnonzero(step)
+        order = step_idx[np.argsort(key[step_idx], kind="stable")]
+        sorted_key = key[order]
+        same_as_prev = np.zeros(len(order), dtype=bool)
+        same_as_prev[1:] = sorted_key[1:] == sorted_key[:-1]
+        last_visit = np.full(n, -1, dtype=np.int64)
+        last_visit[order[1:][same_as_prev[1:]]] = order[:-1][same_as_prev[1:]]
+        # step number within the episode (0 = first step after reset)
+        ep_step = np.arange(n) - reset_row - 1
+        self.new_tile = (last_visit == -1)[step]
+        self.steps_since_visit = np.where(last_visit >= 0, ep_step - (last_visit - reset_row - 1), 0)[step]
+
+        # --- battle: state machine over the battle flag
+        was_in_battle = in_battle[prev] & ~is_reset[prev]
+        started = in_battle & ~was_in_battle
+        ended = ~in_battle & was_in_battle
+        lost = ended & (player_hp[prev] > 0) & (player_hp == 0)
+        won = ended & ~lost & (opp_hp[prev] > 0) & (opp_hp == 0)
+        ongoing = in_battle & was_in_battle
+        hp_term = (opp_hp[prev] - opp_hp) - (player_hp[prev] - player_hp)
+        self.battle_start = started[step]
+        self.battle_loss = lost[step]
+        self.battle_win = won[step]
+        self.battle_hp = np.where(ongoing, hp_term, 0.0)[step]
+        self.battle_ongoing = ongoing[step]
+
+        # --- milestones: gains over the running max since reset
+        def gain(values):
+            running = _segment_running_max(values, is_reset)
+            return np.maximum(values - running[prev], 0)
+
+        self.badge_gain = gain(badges)[step]
+        self.level_gain = gain(levels)[step]
+        self.event_gain = gain(events)[step]
+        essential = np.isin(map_n, trace.essential_maps)
+        # prev_position is advanced by the penalty component only
+        self.key_location_moving = (essential & (map_n != map_n[prev]))[step]
+        self.key_location_static = (essential & (map_n != map_n[reset_row]))[step]
+
+        # --- penalties
+        self.wall = ((x == x[prev]) & (y == y[prev]) & (map_n == map_n[prev]) & ~in_battle)[step]
+        # seen_coords visit count after this step's update (battle steps are not counted)
+        counted = (step & ~in_battle).astype(np.int64)
+        visits = np.zeros(n, dtype=np.int64)
+        if len(order):
+            cum = np.cumsum(counted[order])
+            group_start = np.flatnonzero(~same_as_prev)
+            group_id = np.cumsum(~same_as_prev) - 1
+            base = np.concatenate([[0], cum])[group_start][group_id]
+            visits[order] = cum - base
+        self.stuck = (visits > 600)[step]
+
+
+def evaluate_reward_configs(features: RewardFeatures, configs: Sequence[RewardConfig]) -> Dict[str, np.ndarray]:
+    """
+    Recompute shaped reward components for many configs at once.
+
+    Returns ``{component: (n_configs, n_steps) array}`` plus ``'total'``.
+    """
+    def col(name, dtype=np.float64):
+        return np.array([getattr(c, name) for c in configs], dtype=dtype)[:, None]
+
+    scale = col("reward_scale")
+    zeros = np.zeros((len(configs), features.n_steps))
+    out: Dict[str, np.ndarray] = {}
+
+    # exploration: new tile, else tile outside the recent window
+    windows = col("exploration_recent_window", np.int64)
+    recent = ~features.new_tile & (features.steps_since_visit > windows)
+    exploration = np.where(
+        features.new_tile, col("exploration_new_tile"), np.where(recent, col("exploration_recent_tile"), 0.0)
+    )
+    out['exploration'] = np.where(col("enable_exploration", bool), (0.0 + exploration) * scale, zeros)
+
+    battle = np.where(
+        features.battle_start, col("battle_start_bonus"),
+        np.where(
+            features.battle_loss, col("battle_loss"),
+            np.where(
+                features.battle_win, col("battle_win"),
+                np.where(features.battle_ongoing, features.battle_hp * col("battle_hp_delta"), 0.0),
+            ),
+        ),
+    )
+    out['battle'] = np.where(col("enable_battle", bool), (0.0 + battle) * scale, zeros)
+
+    key_location = np.where(col("enable_penalty", bool), features.key_location_moving, features.key_location_static)
+    milestone = (
+        0.0
+        + np.where(features.badge_gain > 0, features.badge_gain * col("milestone_badge"), 0.0)
+        + np.where(features.level_gain > 0, features.level_gain * col("milestone_level_up"), 0.0)
+        + np.where(features.event_gain > 0, features.event_gain * col("milestone_event"), 0.0)
+        + np.where(key_location, col("milestone_key_location"), 0.0)
+    )
+    out['milestone'] = np.where(col("enable_milestone", bool), milestone * scale, zeros)
+
+    penalty = (
+        0.0
+        + col("penalty_step")
+        + np.where(features.wall, col("penalty_wall"), 0.0)
+        + np.where(features.stuck, col("penalty_stuck"), 0.0)
+    )
+    out['penalty'] = np.where(col("enable_penalty", bool), penalty * scale, zeros)
+
+    out['total'] = out['exploration'] + out['battle'] + out['milestone'] + out['penalty']
+    return out
+
+
+def episode_totals(features: RewardFeatures, per_step: np.ndarray) -> np.ndarray:
+    """Sum per-step values (n_configs, n_steps) into (n_configs, n_episodes), accumulating in step order."""
+    totals = np.zeros(per_step.shape[:1] + (features.n_episodes,))
+    bounds = np.flatnonzero(np.diff(features.episode, prepend=-1, append=features.n_episodes + 1))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if hi > lo:
+            totals[:, features.episode[lo]] = np.cumsum(per_step[:, lo:hi], axis=1)[:, -1]
+    return totals
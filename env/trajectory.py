@@ -0,0 +1,188 @@
+"""
+Compact binary trajectory format with deterministic re-emulation.
+
+A ``.traj`` file is written as the episode runs:
+- header: magic, JSON metadata (start savestate path + sha256, action timing,
+  emulator backend) and a WRAM snapshot taken right after the savestate loads
+- one record per step: uint8 action, uint16 delta count, then sparse WRAM
+  deltas as (uint16 address, uint8 value) pairs against the previous step
+
+Recording costs one WRAM read and compare per step, so it can stay on during
+training. ``TrajectoryReader`` gives the action array and reconstructs RAM at
+any step without an emulator. ``replay_trajectory`` re-emulates the actions
+from the start savestate to regenerate frames, maps or stats on demand, and
+checks the emulator's RAM against the recorded deltas.
+"""
+
+import hashlib
+import json
+import struct
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+TRAJ_MAGIC = b"PKTRAJ01"
+TRAJ_VERSION = 1
+TRAJ_SUFFIX = ".traj"
+
+# Work RAM; every address the env reads lives here
+WRAM_START = 0xC000
+WRAM_END = 0xE000
+
+_DELTA_DTYPE = np.dtype([("addr", "<u2"), ("value", "u1")])
+_STEP_HEADER = struct.Struct("<BH")
+
+# env config keys needed to rebuild the emulator for replay
+REPLAY_CONFIG_KEYS = ("gb_path", "init_state", "action_freq", "emulator_backend", "emulator_trace", "emulator_trace_seed")
+
+
+@lru_cache(maxsize=32)
+def _file_sha256(path: str, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def state_sha256(path) -> Optional[str]:
+    """sha256 of a savestate file, cached per path and mtime."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return _file_sha256(str(path), path.stat().st_mtime_ns)
+
+
+def read_wram(memory) -> np.ndarray:
+    return np.frombuffer(bytes(memory[WRAM_START:WRAM_END]), dtype=np.uint8)
+
+
+class TrajectoryWriter:
+    """Streams one episode to a .traj file."""
+
+    def __init__(self, path: Path, memory, metadata: Dict[str, Any]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.n_steps = 0
+        self._prev = read_wram(memory).copy()
+        header = json.dumps(
+            {
+                "version": TRAJ_VERSION,
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "wram_start": WRAM_START,
+                "wram_end": WRAM_END,
+                **metadata,
+            }
+        ).encode()
+        self._file = open(self.path, "wb")
+        self._file.write(TRAJ_MAGIC)
+        self._file.write(struct.pack("<I", len(header)))
+        self._file.write(header)
+        self._file.write(self._prev.tobytes())
+
+    def write_step(self, action: int, memory):
+        wram = read_wram(memory)
+        changed = np.flatnonzero(wram != self._prev)
+        deltas = np.empty(len(changed), dtype=_DELTA_DTYPE)
+        deltas["addr"] = changed + WRAM_START
+        deltas["value"] = wram[changed]
+        self._file.write(_STEP_HEADER.pack(int(action), len(changed)))
+        self._file.write(deltas.tobytes())
+        self._prev = wram.copy()
+        self.n_steps += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class TrajectoryReader:
+    """Parses a .traj file: metadata, actions and per-step WRAM."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        data = self.path.read_bytes()
+        if data[: len(TRAJ_MAGIC)] != TRAJ_MAGIC:
+            raise ValueError(f"Not a trajectory file: {self.path}")
+        offset = len(TRAJ_MAGIC)
+        (header_len,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        self.metadata: Dict[str, Any] = json.loads(data[offset: offset + header_len])
+        offset += header_len
+        wram_size = self.metadata["wram_end"] - self.metadata["wram_start"]
+        self.start_wram = np.frombuffer(data, dtype=np.uint8, count=wram_size, offset=offset).copy()
+        offset += wram_size
+
+        actions: List[int] = []
+        self._deltas: List[np.ndarray] = []
+        while offset + _STEP_HEADER.size <= len(data):
+            action, count = _STEP_HEADER.unpack_from(data, offset)
+            end = offset + _STEP_HEADER.size + count * _DELTA_DTYPE.itemsize
+            if end > len(data):
+                break  # truncated final record (writer interrupted)
+            actions.append(action)
+            self._deltas.append(np.frombuffer(data, dtype=_DELTA_DTYPE, count=count, offset=offset + _STEP_HEADER.size))
+            offset = end
+        self.actions = np.array(actions, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def iter_wram(self) -> Iterator[Tuple[int, int, np.ndarray]]:
+        """Yield (step, action, WRAM after the step) for every step."""
+        wram = self.start_wram.copy()
+        start = self.metadata["wram_start"]
+        for step, (action, deltas) in enumerate(zip(self.actions, self._deltas)):
+            wram[deltas["addr"].astype(np.intp) - start] = deltas["value"]
+            yield step, int(action), wram
+
+
+def replay_trajectory(
+    path: Path,
+    env_overrides: Optional[Dict[str, Any]] = None,
+    check: bool = True,
+) -> Iterator[Tuple[int, int, Any]]:
+    """
+    Re-emulate a trajectory from its start savestate.
+
+    Yields (step, action, env) after each emulated step; the env's emulator is
+    in the exact state of the recorded run, so callers can render frames, read
+    RAM or update maps. Only emulation runs (no rewards or observations).
+    With ``check`` the emulator's WRAM is compared to the recorded deltas and a
+    RuntimeError names the first step that diverges.
+    """
+    from .red_gym_env import RedGymEnv
+
+    reader = TrajectoryReader(path)
+    meta = reader.metadata
+    env_config = dict(meta.get("env_config", {}))
+    env_config.update(env_overrides or {})
+    state_path = Path(env_config["init_state"])
+    if meta.get("start_state_sha256") and state_sha256(state_path) != meta["start_state_sha256"]:
+        raise ValueError(f"Start state {state_path} does not match the recorded savestate hash")
+
+    env_config.update(
+        {
+            "session_path": Path(env_config.get("session_path", "replay_session")),
+            "headless": True,
+            "save_final_state": False,
+            "print_rewards": False,
+            "save_video": False,
+            "fast_video": True,
+            "max_steps": len(reader) + 1,
+        }
+    )
+    env = RedGymEnv(env_config)
+    env.reset()
+    if check and not np.array_equal(read_wram(env.pyboy.memory), reader.start_wram):
+        raise RuntimeError(f"{path}: start RAM differs from the recording")
+
+    for step, action, wram in reader.iter_wram():
+        env.run_action_on_emulator(action)
+        if check and not np.array_equal(read_wram(env.pyboy.memory), wram):
+            raise RuntimeError(f"{path}: replay diverged from the recording at step {step}")
+        yield step, action, env
+    env.close()
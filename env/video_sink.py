@@ -0,0 +1,103 @@
+"""
+Background video encoding for save_video rollouts.
+
+``VideoSink`` owns a bounded ring of preallocated frame buffers. The env copies
+each step's frames (full screen, model input, explore map) into a free slot and
+returns immediately. A background thread feeds the slots to lazily opened
+``mediapy.VideoWriter``s. When the ring is full, the ``"block"`` policy waits
+for the encoder and the ``"drop"`` policy skips the frame and counts it, so a
+slow encoder never stalls the vector of envs.
+"""
+
+import queue
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+DROP_POLICIES = ("drop", "block")
+
+
+class VideoSink:
+    """Encodes several synchronized grayscale streams on one background thread."""
+
+    def __init__(
+        self,
+        streams: Dict[str, Tuple[Path, Tuple[int, int]]],
+        fps: int = 60,
+        capacity: int = 64,
+        policy: str = "drop",
+    ):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown video drop policy: {policy}. Available: {list(DROP_POLICIES)}")
+        self.streams = streams
+        self.fps = fps
+        self.policy = policy
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self._buffers = {
+            name: np.zeros((capacity,) + tuple(shape), dtype=np.uint8) for name, (_, shape) in streams.items()
+        }
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for slot in range(capacity):
+            self._free.put(slot)
+        self._pending: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._encode_loop, name="video-sink", daemon=True)
+        self._thread.start()
+
+    def add(self, **frames: np.ndarray):
+        """Queue one frame per stream; copies the arrays so callers may reuse them."""
+        if self._error is not None:
+            raise RuntimeError("Video encoder failed") from self._error
+        try:
+            slot = self._free.get(block=self.policy == "block")
+        except queue.Empty:
+            self.frames_dropped += 1
+            return
+        for name, frame in frames.items():
+            np.copyto(self._buffers[name][slot], frame)
+        self._pending.put(slot)
+
+    def close(self):
+        """Flush queued frames, close the writers and stop the encoder thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.put(None)
+        self._thread.join()
+        if self.frames_dropped:
+            print(f"Video sink dropped {self.frames_dropped} frames (encoder too slow, policy 'drop')")
+        if self._error is not None:
+            raise RuntimeError("Video encoder failed") from self._error
+
+    def _encode_loop(self):
+        import mediapy as media
+
+        writers = {}
+        try:
+            while True:
+                slot = self._pending.get()
+                if slot is None:
+                    break
+                if self._error is None:
+                    try:
+                        if not writers:
+                            for name, (path, shape) in self.streams.items():
+                                writer = media.VideoWriter(path, shape, fps=self.fps, input_format="gray")
+                                writer.__enter__()
+                                writers[name] = writer
+                        for name, writer in writers.items():
+                            writer.add_image(self._buffers[name][slot])
+                        self.frames_written += 1
+                    except BaseException as e:
+                        self._error = e
+                self._free.put(slot)
+        finally:
+            for writer in writers.values():
+                try:
+                    writer.close()
+                except BaseException as e:
+                    self._error = self._error or e
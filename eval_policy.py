@@ -5,29 +5,77 @@ This script loads a trained model and runs evaluation episodes to measure:
 - Episode return (total reward)
 - Episode length
 - Success rate (task-specific)
-- Optionally exports trajectories to JSON
+- Optionally records compact .traj trajectories (see env/trajectory.py)
 
 Usage:
     python eval_policy.py --config configs/walk_to_pokecenter.json --checkpoint runs/my_run/poke_500000_steps.zip
     python eval_policy.py --config configs/walk_to_pokecenter.json --checkpoint runs/my_run/poke_500000_steps.zip --n_episodes 20
     python eval_policy.py --config configs/gym_quest.json --checkpoint runs/gym/final.zip --n_episodes 10 --export_trajectory
+    python eval_policy.py --config configs/gym_quest.json --checkpoint runs/gym/final.zip --n_episodes 20 --workers 16
+    python eval_policy.py --config configs/gym_quest.json --checkpoint runs/gym/final.zip --n_episodes 100 --success_threshold 0.5
+    python eval_policy.py --config configs/full_game_shaped.json --checkpoint runs/full/final.zip --state_bank states/early_game.json --n_episodes 8 --workers 8
+    python eval_policy.py --config configs/gym_quest.json --checkpoint runs/gym/final.policy.pt --n_episodes 10
+    python eval_policy.py --config configs/gym_quest.json --checkpoint runs/gym/final.zip --runtime torchscript --threads 4
+    python eval_policy.py --config configs/gym_quest.json --checkpoint runs/gym/final.zip --quantize --workers 8
+    python eval_policy.py --config configs/gym_quest.json --checkpoint runs/gym/final.zip --workers 16 --inference_server
+
+--checkpoint takes an SB3 .zip or a weights-only policy file (tools/export_policy.py,
+or runs/<run>/weights/*.pt); only the inference policy is loaded either way.
+--runtime runs the policy as a traced TorchScript or ONNX graph instead of the
+SB3 policy (training/policy_runtime.py); exported .policy.ts / .policy.onnx
+files are also accepted as --checkpoint. --quantize evaluates an int8 copy of
+the policy (training/quantization.py) and reports its accuracy and speed
+against the float policy. --inference_server runs every env against one
+shared, dynamically batched policy process (training/inference_server.py).
+--obs_cache skips the forward pass for observations seen before
+(training/obs_cache.py) and reports its hit rate.
 """
 
 import argparse
 import json
 import sys
+import tempfile
 import time
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # Add project root to path
 REPO_ROOT = Path(__file__).resolve().parent
 sys.path.insert(0, str(REPO_ROOT))
 
 from env.red_gym_env import RedGymEnv
-from stable_baselines3 import PPO
+from stable_baselines3.common.policies import BasePolicy
 import numpy as np
 
+from training.evaluation import (
+    print_episode,
+    run_batched_episodes,
+    run_episode,
+    run_parallel_episodes,
+    summarize_episodes,
+)
+from training.eval_stopping import StoppingRule
+from training.eval_cache import DEFAULT_CACHE_DIR, EvalCache, eval_cache_key
+from training.inference_server import PolicyClient, start_inference_server, stop_inference_server
+from training.obs_cache import DEFAULT_MAX_ENTRIES, ObservationCache, merge_cache_stats
+from training.policy_io import load_policy
+from training.policy_runtime import RUNTIMES, PolicyRuntime, export_torchscript, get_runtime
+from training.quantization import (
+    QUANTIZE_RUNTIMES,
+    collect_observations,
+    compare_action_distributions,
+    measure_inference,
+    quantize_policy,
+)
+from training.state_bank import (
+    bank_fingerprint,
+    load_state_bank,
+    run_parallel_state_bank,
+    run_state_bank,
+    skill_profile,
+    state_env_config,
+)
+
 
 def load_task_config(config_path: Path, rom_path: Path, state_path: Path):
     """Load task configuration from JSON file."""
@@ -52,156 +100,256 @@ def load_task_config(config_path: Path, rom_path: Path, state_path: Path):
     return env_config, task_config
 
 
-def check_success(env: RedGymEnv, done: bool, truncated: bool) -> bool:
-    """
-    Determine if episode was successful based on task termination condition.
-
-    Args:
-        env: The environment
-        done: Whether episode is done
-        truncated: Whether episode was truncated
-
-    Returns:
-        True if task objective was achieved
-    """
-    if not done and not truncated:
-        return False
-
-    # If episode ended due to success condition (not max steps)
-    if done and not truncated:
-        return True
-
-    # Check task-specific success conditions
-    if env.termination_condition:
-        if env.termination_condition == 'badge_earned':
-            # Success if badge was earned
-            return env.get_badges() > 0
-        elif env.termination_condition == 'pokecenter_reached':
-            # Success if we're at Pokecenter map
-            current_map = env.read_m(0xD35E)
-            return current_map == 40
-
-    # Default: not successful if truncated
-    return done and not truncated
-
-
 def run_evaluation(
-    model: PPO,
+    model: BasePolicy,
     env: RedGymEnv,
     n_episodes: int,
     max_steps_per_episode: int,
     export_trajectory: bool = False,
-    render: bool = False
+    render: bool = False,
+    base_seed: int = 0,
+    extra_envs: List[RedGymEnv] = (),
+    stopping: Optional[StoppingRule] = None,
 ) -> Dict[str, Any]:
     """
     Run evaluation episodes with the trained policy.
 
     Args:
-        model: Trained PPO model
+        model: Trained policy (anything with ``predict``)
         env: Environment to evaluate on
         n_episodes: Number of episodes to run
         max_steps_per_episode: Maximum steps per episode
-        export_trajectory: Whether to export detailed trajectories
+        export_trajectory: Whether to record a .traj trajectory per episode
         render: Whether to render (not implemented for headless)
+        base_seed: Episode i is seeded with base_seed + i
+        extra_envs: More envs to step alongside ``env`` with one batched
+            predict per step (same per-episode results, fewer predict calls)
+        stopping: Stop before ``n_episodes`` once this rule is satisfied
 
     Returns:
         Dictionary with evaluation statistics
     """
-    episode_returns = []
-    episode_lengths = []
-    successes = []
-    trajectories = []
+    envs = [env, *extra_envs]
+    for e in envs:
+        if export_trajectory and not e.record_trajectory:
+            e.record_trajectory = e.s_path / "trajectories"
 
     print(f"Running {n_episodes} evaluation episodes...")
     print(f"Max steps per episode: {max_steps_per_episode}")
 
+    if len(envs) > 1:
+        print(f"Batching {len(envs)} envs per predict call")
+
+        def on_result(record):
+            x, y, map_id = record['start_position']
+            print(f"\nEpisode {record['episode'] + 1}/{n_episodes}:")
+            print(f"  Start position: ({x}, {y}, map={map_id})")
+            print_episode(record)
+
+        records = run_batched_episodes(
+            model,
+            envs,
+            n_episodes,
+            max_steps_per_episode,
+            base_seed=base_seed,
+            on_result=on_result,
+            should_stop=stopping.check if stopping else None,
+        )
+        return summarize_with_stopping(records, n_episodes, stopping)
+
+    records = []
     for ep in range(n_episodes):
-        obs, info = env.reset()
-        episode_reward = 0
-        episode_steps = 0
-        trajectory = [] if export_trajectory else None
-
         print(f"\nEpisode {ep + 1}/{n_episodes}:")
-        x, y, map_id = env.get_game_coords()
+        record = run_episode(
+            model, env, max_steps_per_episode, seed=base_seed + ep, progress_every=100
+        )
+        record['episode'] = ep
+        x, y, map_id = record['start_position']
         print(f"  Start position: ({x}, {y}, map={map_id})")
+        print_episode(record)
+        records.append(record)
+        if stopping and stopping.check(records):
+            break
+
+    return summarize_with_stopping(records, n_episodes, stopping)
+
+
+def run_parallel_evaluation(
+    checkpoint: Path,
+    env_config: Dict[str, Any],
+    n_episodes: int,
+    max_steps_per_episode: int,
+    workers: int,
+    base_seed: int = 0,
+    stopping: Optional[StoppingRule] = None,
+    runtime: str = "sb3",
+    server: Optional[str] = None,
+    obs_cache: int = 0,
+) -> Dict[str, Any]:
+    """
+    Run evaluation episodes on a process pool (see training/evaluation.py).
+    Each worker loads the checkpoint once (or uses the inference server at
+    ``server``); results match run_evaluation.
+    """
+    print(f"Running {n_episodes} evaluation episodes on {workers} workers...")
+    print(f"Max steps per episode: {max_steps_per_episode}")
+
+    def on_result(record):
+        print(f"\nEpisode {record['episode'] + 1}/{n_episodes} (seed {record['seed']}):")
+        print_episode(record)
+
+    records = run_parallel_episodes(
+        checkpoint,
+        env_config,
+        n_episodes,
+        max_steps_per_episode,
+        workers,
+        base_seed=base_seed,
+        on_result=on_result,
+        should_stop=stopping.check if stopping else None,
+        runtime=runtime,
+        server=server,
+        obs_cache=obs_cache,
+    )
+    return summarize_with_stopping(records, n_episodes, stopping)
+
+
+def summarize_with_stopping(
+    records: List[Dict[str, Any]], n_episodes: int, stopping: Optional[StoppingRule]
+) -> Dict[str, Any]:
+    """summarize_episodes plus the early-stopping outcome when a rule is active."""
+    results = summarize_episodes(records)
+    if stopping:
+        results.update(stopping.summary(records, n_episodes))
+        if results['stopped_early']:
+            print(f"\nStopped after {len(records)}/{n_episodes} episodes: {results['stop_reason']}")
+    return results
+
 
-        while episode_steps < max_steps_per_episode:
-            # Get action from policy
-            action, _states = model.predict(obs, deterministic=True)
-
-            # Store trajectory if requested
-            if export_trajectory:
-                x, y, map_id = env.get_game_coords()
-                trajectory.append({
-                    'step': episode_steps,
-                    'position': (int(x), int(y), int(map_id)),
-                    'action': int(action),
-                    'hp': float(env.read_hp_fraction()),
-                    'badges': int(env.get_badges()),
-                })
-
-            # Take action
-            obs, reward, done, truncated, info = env.step(action)
-            episode_reward += reward
-            episode_steps += 1
-
-            # Progress indicator
-            if episode_steps % 100 == 0:
-                tiles = len(env.episode_visited_tiles)
-                print(f"    Step {episode_steps}: reward={episode_reward:.2f}, tiles={tiles}")
-
-            if done or truncated:
-                break
-
-        # Record episode statistics
-        episode_returns.append(episode_reward)
-        episode_lengths.append(episode_steps)
-        success = check_success(env, done, truncated)
-        successes.append(success)
-
-        # Add final trajectory entry
-        if export_trajectory:
-            x, y, map_id = env.get_game_coords()
-            trajectory.append({
-                'step': episode_steps,
-                'position': (int(x), int(y), int(map_id)),
-                'action': None,
-                'hp': float(env.read_hp_fraction()),
-                'badges': int(env.get_badges()),
-                'success': success,
-                'total_reward': float(episode_reward),
-            })
-            trajectories.append(trajectory)
-
-        # Print episode summary
-        print(f"  End position:   ({x}, {y}, map={map_id})")
-        print(f"  Episode length: {episode_steps}")
-        print(f"  Episode return: {episode_reward:.4f}")
-        print(f"  Success:        {'✓' if success else '✗'}")
-        print(f"  Reward breakdown:")
-        for comp, val in env.episode_reward_components.items():
-            if comp != 'legacy':
-                print(f"    {comp:12s}: {val:8.4f}")
-
-    # Compute statistics
+def run_bank_evaluation(
+    checkpoint: Path,
+    env_config: Dict[str, Any],
+    bank_path: Path,
+    episodes_per_state: int,
+    num_envs: int = 1,
+    workers: int = 1,
+    base_seed: int = 0,
+    runtime: str = "sb3",
+    num_threads: Optional[int] = None,
+    model=None,
+    server: Optional[str] = None,
+    obs_cache: int = 0,
+) -> Dict[str, Any]:
+    """
+    Run short fixed-horizon episodes from every savestate in a state bank
+    (see training/state_bank.py) and return per-state summaries.
+    """
+    cache = None
+    bank = load_state_bank(bank_path)
+    print(f"Running {episodes_per_state} episodes from each of {len(bank.states)} states in '{bank.name}'...")
+
+    def on_result(entry, record):
+        print(f"\n[{entry.name}] Episode {record['episode'] + 1}/{episodes_per_state} (seed {record['seed']}):")
+        print_episode(record)
+
+    if workers > 1:
+        states = run_parallel_state_bank(
+            checkpoint, env_config, bank, episodes_per_state, workers, base_seed=base_seed, on_result=on_result,
+            runtime=runtime, server=server, obs_cache=obs_cache,
+        )
+    else:
+        if model is None:
+            print(f"Loading checkpoint: {checkpoint}")
+            model = get_runtime(checkpoint, runtime, num_threads=num_threads)
+        if obs_cache:
+            model = cache = ObservationCache(model, obs_cache)
+        states = run_state_bank(
+            model, env_config, bank, episodes_per_state, num_envs=num_envs, base_seed=base_seed, on_result=on_result
+        )
     results = {
-        'n_episodes': n_episodes,
-        'mean_return': float(np.mean(episode_returns)),
-        'std_return': float(np.std(episode_returns)),
-        'mean_length': float(np.mean(episode_lengths)),
-        'std_length': float(np.std(episode_lengths)),
-        'success_rate': float(np.mean(successes)),
-        'max_return': float(np.max(episode_returns)),
-        'min_return': float(np.min(episode_returns)),
-        'episode_returns': [float(r) for r in episode_returns],
-        'episode_lengths': [int(l) for l in episode_lengths],
-        'successes': [bool(s) for s in successes],
+        'state_bank': str(bank_path),
+        'bank_name': bank.name,
+        'episodes_per_state': episodes_per_state,
+        'states': states,
+        'skill_profile': skill_profile(states),
     }
+    if cache is not None:
+        results['obs_cache'] = cache.stats()
+    elif any('obs_cache' in state for state in states.values()):
+        results['obs_cache'] = merge_cache_stats(
+            [state['obs_cache'] for state in states.values() if 'obs_cache' in state]
+        )
+    return results
 
-    if export_trajectory:
-        results['trajectories'] = trajectories
 
-    return results
+def quantize_for_eval(
+    checkpoint: Path,
+    env_config: Dict[str, Any],
+    runtime: str,
+    calibration_steps: int,
+    num_threads: Optional[int] = None,
+    seed: int = 0,
+):
+    """
+    Int8 copy of the checkpoint's policy, calibrated on observations from the
+    float policy playing ``env_config``. Returns the quantized policy, its
+    runtime and a report comparing it with the float runtime on a second,
+    held-out set of observations (action distributions, latency, throughput).
+    """
+    print(f"Quantizing {checkpoint} to int8 ({calibration_steps} calibration steps)...")
+    policy = load_policy(checkpoint, "cpu")
+    float_runtime = PolicyRuntime.from_policy(policy, runtime, num_threads=num_threads)
+    env = RedGymEnv({**env_config, "record_trajectory": None})
+    try:
+        recorded = collect_observations(float_runtime, env, 2 * calibration_steps, seed=seed)
+    finally:
+        env.close()
+    calibration = {key: value[:calibration_steps] for key, value in recorded.items()}
+    held_out = {key: value[calibration_steps:] for key, value in recorded.items()}
+
+    quantized = quantize_policy(policy, calibration)
+    int8_runtime = PolicyRuntime.from_policy(quantized, runtime, num_threads=num_threads)
+    report = {'runtime': runtime, 'calibration_steps': calibration_steps}
+    report.update(compare_action_distributions(float_runtime, int8_runtime, held_out))
+    report['latency'] = []
+    for batch_size in (1, 16):
+        float_timing = measure_inference(float_runtime.predict, held_out, batch_size)
+        int8_timing = measure_inference(int8_runtime.predict, held_out, batch_size)
+        report['latency'].append({
+            'batch_size': batch_size,
+            'float_ms': float_timing['ms_per_call'],
+            'int8_ms': int8_timing['ms_per_call'],
+            'float_obs_per_sec': float_timing['obs_per_sec'],
+            'int8_obs_per_sec': int8_timing['obs_per_sec'],
+            'speedup': float_timing['ms_per_call'] / int8_timing['ms_per_call'],
+        })
+    return quantized, int8_runtime, report
+
+
+def print_quantization(report: Dict[str, Any]):
+    """Print the int8 accuracy check and latency report."""
+    print(f"\nInt8 vs float ({report['runtime']}, {report['observations']} held-out observations):")
+    print(f"  Mean KL:            {report['mean_kl']:.2e} (max {report['max_kl']:.2e})")
+    print(f"  Mean TV distance:   {report['mean_tv']:.4f} (max {report['max_tv']:.4f})")
+    print(f"  Argmax agreement:   {report['argmax_agreement']*100:.1f}%")
+    for row in report['latency']:
+        print(
+            f"  Batch {row['batch_size']:3d}: {row['float_ms']:.3f} -> {row['int8_ms']:.3f} ms/call "
+            f"({row['float_obs_per_sec']:.0f} -> {row['int8_obs_per_sec']:.0f} obs/s, {row['speedup']:.2f}x)"
+        )
+
+
+def print_bank_results(results: Dict[str, Any]):
+    """Print the per-state skill profile of a state bank evaluation."""
+    print(f"\n{'='*80}")
+    print(f"STATE BANK RESULTS: {results['bank_name']} ({results['episodes_per_state']} episodes per state)")
+    print(f"{'='*80}")
+    print(f"{'State':24s} {'Horizon':>8s} {'Skill':>8s} {'Success':>8s} {'Return':>10s} {'Length':>8s}")
+    for name, state in results['states'].items():
+        print(
+            f"{name:24s} {state['horizon']:8d} {state['skill_score']:8.3f} {state['success_rate']*100:7.1f}% "
+            f"{state['mean_return']:10.3f} {state['mean_length']:8.1f}"
+        )
 
 
 def print_results(results: Dict[str, Any]):
@@ -210,6 +358,11 @@ def print_results(results: Dict[str, Any]):
     print(f"EVALUATION RESULTS")
     print(f"{'='*80}")
     print(f"Episodes:            {results['n_episodes']}")
+    if 'stop_reason' in results:
+        print(f"Stopping:            {results['stop_reason'] or 'not conclusive'} (max {results['max_episodes']})")
+        if results['return_ci']:
+            print(f"Return CI:           [{results['return_ci'][0]:.4f}, {results['return_ci'][1]:.4f}]")
+        print(f"Success CI:          [{results['success_ci'][0]*100:.1f}%, {results['success_ci'][1]*100:.1f}%]")
     print(f"Mean Return:         {results['mean_return']:8.4f} ± {results['std_return']:.4f}")
     print(f"Mean Length:         {results['mean_length']:8.1f} ± {results['std_length']:.1f}")
     print(f"Success Rate:        {results['success_rate']*100:6.2f}%")
@@ -240,19 +393,79 @@ def main():
     parser.add_argument("--max_steps", type=int, default=None,
                         help="Max steps per episode (default: from config)")
     parser.add_argument("--export_trajectory", action="store_true",
-                        help="Export detailed trajectories to JSON")
+                        help="Record a .traj trajectory per episode (replay with tools/replay_trajectory.py)")
     parser.add_argument("--output", type=Path, default=None,
                         help="Output JSON file for results (default: eval_results_<timestamp>.json)")
     parser.add_argument("--seed", type=int, default=42,
-                        help="Random seed for evaluation")
+                        help="Random seed for evaluation (episode i uses seed + i)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Run episodes on N worker processes (each loads the checkpoint once)")
+    parser.add_argument("--num_envs", type=int, default=1,
+                        help="Step N envs together with one batched predict call per step")
+    parser.add_argument("--state_bank", type=Path, default=None,
+                        help="Evaluate from every savestate in this bank JSON (--n_episodes per state)")
+    parser.add_argument("--cache_dir", type=Path, default=DEFAULT_CACHE_DIR,
+                        help="Evaluation result cache (keyed by checkpoint hash, config and settings)")
+    parser.add_argument("--no_cache", action="store_true",
+                        help="Ignore cached results and do not store this run")
+    parser.add_argument("--stop_return_ci", type=float, default=None,
+                        help="Stop early once the CI on mean return is at most this wide (--n_episodes is the cap)")
+    parser.add_argument("--stop_success_ci", type=float, default=None,
+                        help="Stop early once the Wilson CI on success rate is at most this wide")
+    parser.add_argument("--success_threshold", type=float, default=None,
+                        help="Stop early once the Wilson CI on success rate is entirely above or below this")
+    parser.add_argument("--min_episodes", type=int, default=5,
+                        help="Episodes to run before any early-stopping rule applies")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="Confidence level for the early-stopping intervals")
+    parser.add_argument("--runtime", choices=RUNTIMES, default="sb3",
+                        help="Inference backend: the SB3 policy, or a traced torch/TorchScript/ONNX graph on CPU")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Intra-op inference threads for --runtime (workers always use 1)")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Evaluate an int8 copy of the policy (torch/torchscript runtimes; sb3 becomes torchscript)")
+    parser.add_argument("--calibration_steps", type=int, default=256,
+                        help="Observations for --quantize calibration (and as many again for its accuracy check)")
+    parser.add_argument("--inference_server", nargs="?", const="auto", default=None, metavar="ADDRESS",
+                        help="Share one batched policy process between all envs: the address of a running "
+                             "tools/serve_policy.py (socket path or host:port), or no value to start one for this eval")
+    parser.add_argument("--obs_cache", type=int, nargs="?", const=DEFAULT_MAX_ENTRIES, default=0, metavar="ENTRIES",
+                        help=f"Reuse policy outputs for repeated observations (LRU of ENTRIES, default {DEFAULT_MAX_ENTRIES})")
 
     args = parser.parse_args()
 
+    if args.workers > 1 and args.num_envs > 1:
+        parser.error("--workers and --num_envs cannot be combined")
+    stopping = None
+    # --confidence and --min_episodes only matter (and are only validated) once a rule is on
+    if any(v is not None for v in (args.stop_return_ci, args.stop_success_ci, args.success_threshold)):
+        try:
+            stopping = StoppingRule(
+                confidence=args.confidence,
+                min_episodes=args.min_episodes,
+                return_ci_width=args.stop_return_ci,
+                success_ci_width=args.stop_success_ci,
+                success_threshold=args.success_threshold,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    if args.state_bank and stopping:
+        parser.error("--state_bank does not support early stopping")
+    if args.quantize:
+        if args.runtime == "sb3":
+            args.runtime = "torchscript"
+        if args.runtime not in QUANTIZE_RUNTIMES:
+            parser.error(f"--quantize needs --runtime {' or '.join(QUANTIZE_RUNTIMES)}")
+        if args.checkpoint.suffix in (".ts", ".onnx"):
+            parser.error("--quantize needs a checkpoint .zip or weights-only policy file")
+        if args.inference_server:
+            parser.error("--quantize and --inference_server cannot be combined")
+
     # Validate paths
     if not args.rom.exists():
         print(f"Error: ROM not found at {args.rom}")
         sys.exit(1)
-    if not args.state.exists():
+    if not args.state_bank and not args.state.exists():
         print(f"Error: State file not found at {args.state}")
         sys.exit(1)
     if not args.checkpoint.exists():
@@ -272,45 +485,180 @@ def main():
     # Get max steps from config if not specified
     max_steps = args.max_steps or env_config.get('max_steps', 10000)
 
-    # Create environment
-    print(f"Creating environment...")
-    env = RedGymEnv(env_config)
-
-    # Load model
-    print(f"Loading checkpoint: {args.checkpoint}")
-    try:
-        model = PPO.load(str(args.checkpoint), env=env)
-        print(f"Model loaded successfully")
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        sys.exit(1)
+    if args.output:
+        output_path = args.output
+    else:
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        output_path = REPO_ROOT / f"eval_results_{timestamp}.json"
+    if args.export_trajectory:
+        env_config["record_trajectory"] = str(output_path.parent / f"{output_path.stem}_trajectories")
+
+    # Deterministic results are reused for the same checkpoint, config and settings
+    cache = None if (args.no_cache or args.export_trajectory) else EvalCache(args.cache_dir)
+    cached = cache_key = None
+    if cache is not None:
+        key_config = env_config
+        params = {'n_episodes': args.n_episodes, 'max_steps': max_steps, 'seed': args.seed}
+        if args.runtime != "sb3":
+            params['runtime'] = args.runtime
+        if args.quantize:
+            params['quantize'] = {'calibration_steps': args.calibration_steps}
+        if stopping:
+            params['stopping'] = stopping.to_dict()
+        if args.state_bank:
+            # the bank sets the start states, horizons and termination
+            key_config = {k: v for k, v in env_config.items() if k != 'init_state'}
+            try:
+                params['state_bank'] = bank_fingerprint(load_state_bank(args.state_bank))
+            except (FileNotFoundError, ValueError) as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+        cache_key = eval_cache_key(args.checkpoint, key_config, **params)
+        cached = cache.get(cache_key)
+
+    # Workers load the int8 policy from a TorchScript file written here
+    checkpoint, runtime = args.checkpoint, args.runtime
+    model = quantization = quantized_dir = None
+    if args.quantize and cached is None:
+        calibration_config = env_config
+        if args.state_bank:
+            calibration_config = state_env_config(env_config, load_state_bank(args.state_bank).states[0])
+        quantized, model, quantization = quantize_for_eval(
+            args.checkpoint, env_config=calibration_config, runtime=args.runtime,
+            calibration_steps=args.calibration_steps, num_threads=args.threads, seed=args.seed,
+        )
+        if args.workers > 1:
+            quantized_dir = tempfile.TemporaryDirectory()
+            checkpoint = export_torchscript(quantized, Path(quantized_dir.name) / f"{args.checkpoint.stem}.int8.policy.ts")
+            runtime = "torchscript"
+
+    server = server_process = client = None
+    if args.inference_server and cached is None:
+        server = None if args.inference_server == "auto" else args.inference_server
+        try:
+            if server is None:
+                print(f"Starting inference server for {args.checkpoint}...")
+                server_process, server = start_inference_server(
+                    args.checkpoint, runtime=args.runtime, num_threads=args.threads
+                )
+            client = model = PolicyClient(server, timeout=10.0)
+        except (OSError, RuntimeError) as e:
+            print(f"Error: inference server: {e}")
+            sys.exit(1)
+        print(f"Using inference server at {server} ({client.backend}, {client.checkpoint})")
 
-    # Run evaluation
     start_time = time.time()
-    results = run_evaluation(
-        model=model,
-        env=env,
-        n_episodes=args.n_episodes,
-        max_steps_per_episode=max_steps,
-        export_trajectory=args.export_trajectory,
-    )
+    env = None
+    if cached is not None:
+        print(f"Using cached results ({cache.digest(cache_key)[:12]} in {args.cache_dir}; --no_cache to rerun)")
+        results = cached
+    elif args.state_bank:
+        try:
+            results = run_bank_evaluation(
+                checkpoint=checkpoint,
+                env_config=env_config,
+                bank_path=args.state_bank,
+                episodes_per_state=args.n_episodes,
+                num_envs=args.num_envs,
+                workers=args.workers,
+                base_seed=args.seed,
+                runtime=runtime,
+                num_threads=args.threads,
+                model=model,
+                server=server,
+                obs_cache=args.obs_cache,
+            )
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    elif args.workers > 1:
+        # Each worker builds its own env and loads the checkpoint once
+        results = run_parallel_evaluation(
+            checkpoint=checkpoint,
+            env_config=env_config,
+            n_episodes=args.n_episodes,
+            max_steps_per_episode=max_steps,
+            workers=args.workers,
+            base_seed=args.seed,
+            stopping=stopping,
+            runtime=runtime,
+            server=server,
+            obs_cache=args.obs_cache,
+        )
+    else:
+        # Create environment
+        print(f"Creating environment...")
+        env = RedGymEnv(env_config)
+        extra_envs = [RedGymEnv(env_config) for _ in range(min(args.num_envs, args.n_episodes) - 1)]
+
+        # Load model
+        if model is None:
+            print(f"Loading checkpoint: {args.checkpoint}")
+            try:
+                model = get_runtime(args.checkpoint, args.runtime, num_threads=args.threads)
+                print(f"Model loaded successfully")
+            except Exception as e:
+                print(f"Error loading model: {e}")
+                sys.exit(1)
+        obs_cache = ObservationCache(model, args.obs_cache) if args.obs_cache else None
+
+        # Run evaluation
+        start_time = time.time()
+        results = run_evaluation(
+            model=obs_cache or model,
+            env=env,
+            n_episodes=args.n_episodes,
+            max_steps_per_episode=max_steps,
+            export_trajectory=args.export_trajectory,
+            base_seed=args.seed,
+            extra_envs=extra_envs,
+            stopping=stopping,
+        )
+        if obs_cache is not None:
+            results['obs_cache'] = obs_cache.stats()
     elapsed_time = time.time() - start_time
+    if quantized_dir is not None:
+        quantized_dir.cleanup()
+    if quantization is not None:
+        results['quantization'] = quantization
+    if client is not None:
+        server_stats = client.stats()
+        client.close()
+        if server_process is not None:
+            stop_inference_server(server_process, server)
+        print(
+            f"Inference server: {server_stats['observations']} observations in {server_stats['batches']} batches "
+            f"(mean batch {server_stats['mean_batch']:.1f}, mean latency {server_stats['mean_latency_ms']:.2f} ms)"
+        )
+    if env is not None:
+        for e in [env, *extra_envs]:
+            e.close()
+    if cache is not None and cached is None:
+        cache.put(cache_key, results)
 
     # Print results
-    print_results(results)
+    if args.state_bank:
+        print_bank_results(results)
+    else:
+        print_results(results)
+    if 'quantization' in results:
+        print_quantization(results['quantization'])
+    if 'obs_cache' in results:
+        stats = results['obs_cache']
+        print(
+            f"\nObservation cache: {stats['hits']}/{stats['hits'] + stats['misses']} predicts served from cache "
+            f"({stats['hit_rate']*100:.1f}% hit rate)"
+        )
     print(f"\nEvaluation completed in {elapsed_time:.1f} seconds")
 
     # Save results
-    if args.output:
-        output_path = args.output
-    else:
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        output_path = REPO_ROOT / f"eval_results_{timestamp}.json"
-
     results['config'] = args.config.stem
     results['checkpoint'] = str(args.checkpoint)
+    results['runtime'] = args.runtime
+    results['quantized'] = args.quantize
     results['timestamp'] = time.strftime("%Y-%m-%d %H:%M:%S")
     results['elapsed_time'] = elapsed_time
+    results['cached'] = cached is not None
 
     with open(output_path, 'w') as f:
         json.dump(results, f, indent=2)
@@ -0,0 +1,91 @@
+"""
+Benchmark and profile the RedGymEnv Python hot path without a ROM.
+
+Runs the env on the fake emulator backend (env/emulator_backend.py), so the
+numbers only cover reward, observation and bookkeeping code - not emulation.
+
+Usage:
+    python tools/bench_env.py --steps 5000
+    python tools/bench_env.py --config configs/gym_quest.json --profile
+    python tools/bench_env.py --trace recorded_trace.npz --steps 20000
+"""
+
+import argparse
+import cProfile
+import json
+import pstats
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from env.red_gym_env import RedGymEnv
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark RedGymEnv on the ROM-free fake emulator.")
+    parser.add_argument("--config", type=Path, default=None, help="Optional task config JSON (uses its env section).")
+    parser.add_argument("--trace", type=Path, default=None, help="Recorded/scripted trace .npz (default: synthetic).")
+    parser.add_argument("--steps", type=int, default=5000, help="Number of env steps to time.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for actions and the synthetic trace.")
+    parser.add_argument("--profile", action="store_true", help="Run under cProfile and print the top functions.")
+    parser.add_argument("--top", type=int, default=25, help="Number of profile rows to print.")
+    return parser.parse_args()
+
+
+def build_env_config(args) -> dict:
+    env_config = {}
+    if args.config is not None:
+        with open(args.config) as f:
+            env_config = json.load(f).get("env", {})
+    env_config.update(
+        {
+            "headless": True,
+            "save_final_state": False,
+            "early_stop": False,
+            "action_freq": env_config.get("action_freq", 24),
+            "init_state": str(REPO_ROOT / "init.state"),
+            "max_steps": args.steps + 1,
+            "print_rewards": False,
+            "save_video": False,
+            "fast_video": True,
+            "session_path": Path("session_bench"),
+            "emulator_backend": "fake",
+            "emulator_trace": str(args.trace) if args.trace else None,
+            "emulator_trace_seed": args.seed,
+        }
+    )
+    return env_config
+
+
+def run(env: RedGymEnv, steps: int, seed: int) -> int:
+    rng = random.Random(seed)
+    n_actions = env.action_space.n
+    env.reset(seed=seed)
+    for step in range(steps):
+        obs, reward, terminated, truncated, info = env.step(rng.randrange(n_actions))
+        if terminated or truncated:
+            env.reset()
+    return steps
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    env = RedGymEnv(build_env_config(args))
+
+    profiler = cProfile.Profile() if args.profile else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    steps = run(env, args.steps, args.seed)
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+
+    print(f"{steps} steps in {elapsed:.2f}s -> {steps / elapsed:.1f} steps/sec ({1e6 * elapsed / steps:.1f} us/step)")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.top)
@@ -0,0 +1,164 @@
+"""
+Benchmark policy inference on CPU: SB3 ``model.predict`` vs the exported runtimes.
+
+Records observations from RedGymEnv on the fake emulator backend (no ROM
+needed), then times deterministic predicts at batch size 1 and at larger
+batches for ``PPO.load(...).predict`` and each ``training.policy_runtime``
+backend, with a fixed intra-op thread count. Also reports how many actions
+each runtime agrees on with SB3.
+
+``--quantize`` adds an int8 copy of each torch/TorchScript runtime
+(training/quantization.py), calibrated on separately recorded observations,
+and prints how far its action distribution is from the float policy.
+
+Usage:
+    python tools/bench_policy.py --checkpoint runs/my_run/final.zip
+    python tools/bench_policy.py --checkpoint runs/my_run/final.zip --threads 4 --batch-sizes 1 8 64
+    python tools/bench_policy.py --checkpoint runs/my_run/final.zip --runtimes torchscript onnx --config configs/gym_quest.json
+    python tools/bench_policy.py --checkpoint runs/my_run/final.zip --runtimes torchscript --quantize
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch as th
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from stable_baselines3 import PPO
+
+from env.red_gym_env import RedGymEnv
+from training.policy_runtime import RUNTIMES, PolicyRuntime
+from training.quantization import QUANTIZE_RUNTIMES, compare_action_distributions, quantize_policy
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark policy inference backends on CPU.")
+    parser.add_argument("--checkpoint", type=Path, required=True, help="SB3 checkpoint .zip.")
+    parser.add_argument("--config", type=Path, default=None, help="Optional task config JSON (uses its env section).")
+    parser.add_argument("--runtimes", nargs="+", choices=RUNTIMES[1:], default=list(RUNTIMES[1:]),
+                        help="Runtimes to compare against SB3 predict.")
+    parser.add_argument("--observations", type=int, default=256, help="Number of env observations to record.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64], help="Predict batch sizes to time.")
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads for every backend.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the observations (best is reported).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the recording env and its actions.")
+    parser.add_argument("--quantize", action="store_true", help="Also time int8 copies of the torch/torchscript runtimes.")
+    parser.add_argument("--calibration-steps", type=int, default=256,
+                        help="Extra observations recorded to calibrate --quantize.")
+    return parser.parse_args()
+
+
+def record_observations(args, n_actions: int, n_steps: int):
+    env_config = {}
+    if args.config is not None:
+        with open(args.config) as f:
+            env_config = json.load(f).get("env", {})
+    env_config.update(
+        {
+            "headless": True,
+            "save_final_state": False,
+            "early_stop": False,
+            "action_freq": env_config.get("action_freq", 24),
+            "init_state": str(REPO_ROOT / "init.state"),
+            "max_steps": n_steps + 1,
+            "print_rewards": False,
+            "save_video": False,
+            "fast_video": True,
+            "session_path": Path("session_bench"),
+            "emulator_backend": "fake",
+            "emulator_trace": None,
+            "emulator_trace_seed": args.seed,
+        }
+    )
+    env = RedGymEnv(env_config)
+    rng = random.Random(args.seed)
+    obs, _ = env.reset(seed=args.seed)
+    observations = []
+    for _ in range(n_steps):
+        observations.append(obs)
+        obs, _, terminated, truncated, _ = env.step(rng.randrange(n_actions))
+        if terminated or truncated:
+            obs, _ = env.reset()
+    env.close()
+    return {key: np.stack([o[key] for o in observations]) for key in observations[0]}
+
+
+def batches(observations, batch_size: int):
+    n = len(next(iter(observations.values())))
+    for start in range(0, n, batch_size):
+        batch = {key: value[start:start + batch_size] for key, value in observations.items()}
+        if batch_size == 1:
+            batch = {key: value[0] for key, value in batch.items()}
+        yield batch
+
+
+def time_predict(predict, observations, batch_size: int, repeat: int):
+    """Best seconds per pass and the actions of the last pass."""
+    for batch in batches(observations, batch_size):  # warm-up
+        predict(batch, deterministic=True)
+    best = float("inf")
+    for _ in range(repeat):
+        actions = []
+        start = time.perf_counter()
+        for batch in batches(observations, batch_size):
+            actions.append(np.atleast_1d(predict(batch, deterministic=True)[0]))
+        best = min(best, time.perf_counter() - start)
+    return best, np.concatenate(actions)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.checkpoint.exists():
+        print(f"Error: Checkpoint not found at {args.checkpoint}")
+        sys.exit(1)
+
+    th.set_num_threads(args.threads)
+    model = PPO.load(args.checkpoint, device="cpu")
+    calibration_steps = args.calibration_steps if args.quantize else 0
+    print(f"Recording {args.observations + calibration_steps} observations on the fake backend...")
+    recorded = record_observations(args, int(model.action_space.n), args.observations + calibration_steps)
+    observations = {key: value[calibration_steps:] for key, value in recorded.items()}
+
+    runtimes = {}
+    for runtime in args.runtimes:
+        try:
+            runtimes[runtime] = PolicyRuntime.from_policy(model.policy, runtime, num_threads=args.threads)
+        except ImportError as e:
+            print(f"Skipping {runtime}: {e}")
+
+    if args.quantize:
+        calibration = {key: value[:calibration_steps] for key, value in recorded.items()}
+        quantized = quantize_policy(model.policy, calibration)
+        print(f"\nInt8 vs float action distributions on {args.observations} held-out observations:")
+        for runtime in [r for r in list(runtimes) if r in QUANTIZE_RUNTIMES]:
+            candidate = PolicyRuntime.from_policy(quantized, runtime, num_threads=args.threads)
+            check = compare_action_distributions(runtimes[runtime], candidate, observations)
+            print(
+                f"  {runtime:16s} mean KL {check['mean_kl']:.2e}  max KL {check['max_kl']:.2e}  "
+                f"mean TV {check['mean_tv']:.4f}  argmax agreement {check['argmax_agreement'] * 100:.1f}%"
+            )
+            runtimes[f"{runtime}+int8"] = candidate
+
+    backends = {"sb3": model.predict, **{name: runtime.predict for name, runtime in runtimes.items()}}
+
+    print(f"\n{args.checkpoint} | {args.threads} thread(s) | torch {th.__version__}")
+    print(f"{'Runtime':16s} {'Batch':>6s} {'ms/call':>9s} {'obs/s':>10s} {'Speedup':>8s} {'Agree':>7s}")
+    for batch_size in args.batch_sizes:
+        calls = -(-args.observations // batch_size)
+        baseline_time = reference = None
+        for name, predict in backends.items():
+            elapsed, actions = time_predict(predict, observations, batch_size, args.repeat)
+            if name == "sb3":
+                baseline_time, reference = elapsed, actions
+            print(
+                f"{name:16s} {batch_size:6d} {elapsed / calls * 1000:9.3f} {args.observations / elapsed:10.0f} "
+                f"{baseline_time / elapsed:7.2f}x {np.mean(actions == reference) * 100:6.1f}%"
+            )
@@ -0,0 +1,111 @@
+"""
+Cut savestates for an evaluation state bank out of a recorded trajectory.
+
+The trajectory is re-emulated from its start savestate (see
+tools/replay_trajectory.py) and the emulator state is saved at each requested
+step. The states are added to (or replace same-named entries in) a state bank
+JSON for ``eval_policy.py --state_bank``.
+
+Usage:
+    python tools/capture_states.py runs/my_run/trajectories/traj_ab12cd34_3.traj \\
+        --at after_starter:1200 --at viridian:3400 --bank states/early_game.json
+    python tools/capture_states.py traj.traj --at pewter_gym:9100 --bank states/early_game.json \\
+        --horizon 1024 --termination badge_earned
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from env.trajectory import TrajectoryReader, replay_trajectory
+from training.state_bank import TERMINATION_CONDITIONS, BankState, StateBank
+
+
+def parse_capture(value: str):
+    name, _, step = value.rpartition(":")
+    if not name or not step.isdigit():
+        raise argparse.ArgumentTypeError(f"expected NAME:STEP, got {value!r}")
+    return name, int(step)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Save savestates from a trajectory into a state bank.")
+    parser.add_argument("trajectory", type=Path, help="Path to a .traj file.")
+    parser.add_argument(
+        "--at", type=parse_capture, action="append", required=True, help="NAME:STEP to capture (repeatable)."
+    )
+    parser.add_argument("--bank", type=Path, required=True, help="State bank JSON to create or update.")
+    parser.add_argument("--horizon", type=int, default=512, help="Episode horizon for the captured states.")
+    parser.add_argument(
+        "--termination",
+        choices=list(TERMINATION_CONDITIONS),
+        default=None,
+        help="Termination condition (and success criterion) for the captured states.",
+    )
+    parser.add_argument("--rom", type=Path, default=None, help="Override the recorded ROM path.")
+    parser.add_argument("--state", type=Path, default=None, help="Override the recorded start savestate path.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.trajectory.exists():
+        print(f"Error: Trajectory not found at {args.trajectory}")
+        sys.exit(1)
+
+    n_steps = len(TrajectoryReader(args.trajectory))
+    captures = {}
+    for name, step in args.at:
+        if not 1 <= step <= n_steps:
+            print(f"Error: step {step} for '{name}' is outside the trajectory (1-{n_steps})")
+            sys.exit(1)
+        captures.setdefault(step, []).append(name)
+
+    if args.bank.exists():
+        bank = StateBank.from_dict(json.loads(args.bank.read_text()))
+    else:
+        bank = StateBank(name=args.bank.stem)
+    args.bank.parent.mkdir(parents=True, exist_ok=True)
+
+    overrides = {}
+    if args.rom:
+        overrides["gb_path"] = str(args.rom)
+    if args.state:
+        overrides["init_state"] = str(args.state)
+
+    new_entries = []
+    last_step = max(captures)
+    for step, action, env in replay_trajectory(args.trajectory, overrides):
+        # replay steps are 0-based; STEP counts actions taken
+        for name in captures.get(step + 1, []):
+            state_file = f"{name}.state"
+            with open(args.bank.parent / state_file, "wb") as f:
+                env.pyboy.save_state(f)
+            x, y, map_id = env.get_game_coords()
+            print(f"Captured '{name}' at step {step + 1}: position=({x}, {y}, map={map_id})")
+            new_entries.append(
+                BankState(
+                    name=name,
+                    state=state_file,
+                    horizon=args.horizon,
+                    termination_condition=args.termination,
+                    description=f"{args.trajectory.name} step {step + 1}",
+                )
+            )
+        if step + 1 >= last_step:
+            env.close()
+            break
+
+    replaced = {entry.name for entry in new_entries}
+    bank.states = [s for s in bank.states if s.name not in replaced] + new_entries
+    args.bank.write_text(json.dumps(bank.to_dict(), indent=2))
+    print(f"State bank saved to: {args.bank} ({len(bank.states)} states)")
+
+
+if __name__ == "__main__":
+    main()
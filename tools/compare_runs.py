@@ -1,9 +1,29 @@
+"""
+Compare two checkpoints over many seeded rollouts.
+
+Each checkpoint is rolled out from every ``--state`` with ``--seeds`` seeds on a
+process pool. Both checkpoints see the same (state, seed) pairs, so the report
+gives per-checkpoint means with confidence intervals and the paired B - A
+difference for reward, coverage, badges and max_map_progress. The figure shows
+how often each global map tile was visited across all rollouts of A and B, and
+the difference. Rollouts are cached per (checkpoint, state, seed) in the eval
+cache (see training/eval_cache.py).
+
+Usage:
+    python tools/compare_runs.py --checkpoint-a runs/runA/poke_100000_steps.zip \\
+        --checkpoint-b runs/runB/poke_100000_steps.zip --rom PokemonRed.gb --state init.state
+    python tools/compare_runs.py --checkpoint-a a.zip --checkpoint-b b.zip \\
+        --state init.state --state states/viridian.state --seeds 16 --workers 8
+"""
+
 import argparse
 import json
+import multiprocessing as mp
 import time
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -13,22 +33,36 @@ if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
 from env.red_gym_env import RedGymEnv
-from stable_baselines3 import PPO
+from training.eval_cache import DEFAULT_CACHE_DIR, EvalCache, eval_cache_key
+from training.eval_stopping import mean_ci
+from training.evaluation import init_single_thread, run_episode
+from training.policy_io import get_policy
+
+METRICS = ("total_reward", "coverage_pixels", "badges", "max_map_progress")
 
 
 def parse_args():
-    parser = argparse.ArgumentParser(description="Compare two checkpoints side-by-side with quick rollouts.")
+    parser = argparse.ArgumentParser(description="Compare two checkpoints over seeded rollouts from several states.")
     parser.add_argument("--checkpoint-a", type=Path, required=True, help="Path to first checkpoint .zip")
     parser.add_argument("--checkpoint-b", type=Path, required=True, help="Path to second checkpoint .zip")
     parser.add_argument("--rom", type=Path, default=Path("PokemonRed.gb"), help="Path to Pokemon Red ROM.")
-    parser.add_argument("--state", type=Path, default=Path("init.state"), help="Initial save state path.")
+    parser.add_argument("--state", type=Path, action="append", default=None,
+                        help="Start savestate (repeatable; default: init.state).")
     parser.add_argument("--steps", type=int, default=512, help="Steps to roll each checkpoint for comparison.")
+    parser.add_argument("--seeds", type=int, default=8, help="Rollouts per checkpoint and start state.")
+    parser.add_argument("--seed", type=int, default=0, help="Rollout i uses seed + i.")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="Greedy actions (rollouts from the same state then only differ if the env does).")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes for rollouts.")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level for the intervals.")
     parser.add_argument("--output", type=Path, default=None, help="Directory to write comparison outputs.")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Evaluation result cache.")
+    parser.add_argument("--no-cache", action="store_true", help="Always roll out; skip the cache.")
     return parser.parse_args()
 
 
-def run_eval(checkpoint: Path, rom: Path, state: Path, steps: int, out_dir: Path) -> Tuple[Dict, np.ndarray, np.ndarray]:
-    env_config = {
+def rollout_env_config(rom: Path, state: Path, steps: int, session_path: Path) -> Dict[str, Any]:
+    return {
         "headless": True,
         "save_final_state": False,
         "early_stop": False,
@@ -38,52 +72,59 @@ def run_eval(checkpoint: Path, rom: Path, state: Path, steps: int, out_dir: Path
         "print_rewards": False,
         "save_video": False,
         "fast_video": True,
-        "session_path": out_dir / f"session_{checkpoint.stem}",
+        "session_path": session_path,
         "gb_path": str(rom),
         "debug": False,
         "reward_scale": 0.5,
         "explore_weight": 0.25,
     }
 
-    env = RedGymEnv(env_config)
-    model = PPO.load(str(checkpoint), env=env, custom_objects={"lr_schedule": 0, "clip_range": 0})
-
-    obs, info = env.reset()
-    total_reward = 0.0
-    for step in range(steps):
-        action, _states = model.predict(obs, deterministic=True)
-        obs, reward, terminated, truncated, info = env.step(action)
-        total_reward += float(reward)
-        if terminated or truncated:
-            break
-
-    screen = env.render()  # latest screen
-    explore_map = env.get_explore_map()
-    coverage = int(np.count_nonzero(explore_map))
-
-    stats = {
-        "checkpoint": str(checkpoint),
-        "steps_run": step + 1,
-        "total_reward": total_reward,
-        "badges": env.get_badges(),
-        "coverage_pixels": coverage,
-        "max_map_progress": env.max_map_progress,
-    }
 
-    env.close()
+def run_rollout(
+    checkpoint: Path, env_config: Dict[str, Any], steps: int, seed: int, deterministic: bool
+) -> Tuple[Dict[str, Any], np.ndarray, np.ndarray]:
+    """One seeded rollout; returns (stats, final screen, global explore map)."""
+    # per-process policy cache: each worker loads a checkpoint once
+    model = get_policy(checkpoint)
+    env = RedGymEnv(env_config)
+    try:
+        record = run_episode(model, env, steps, seed=seed, deterministic=deterministic)
+        screen = env.render()  # latest screen
+        explore_map = env.explore_map.copy()
+        stats = {
+            "steps_run": record["length"],
+            "total_reward": record["return"],
+            "badges": int(env.get_badges()),
+            "coverage_pixels": int(np.count_nonzero(explore_map)),
+            "max_map_progress": int(env.max_map_progress),
+        }
+    finally:
+        env.close()
     return stats, screen, explore_map
 
 
-def plot_comparison(screen_a, map_a, screen_b, map_b, out_path: Path):
-    fig, axes = plt.subplots(2, 2, figsize=(10, 8))
-    axes[0, 0].imshow(screen_a.squeeze(), cmap="gray")
-    axes[0, 0].set_title("Checkpoint A screen")
-    axes[0, 1].imshow(map_a, cmap="inferno")
-    axes[0, 1].set_title("Checkpoint A map")
-    axes[1, 0].imshow(screen_b.squeeze(), cmap="gray")
-    axes[1, 0].set_title("Checkpoint B screen")
-    axes[1, 1].imshow(map_b, cmap="inferno")
-    axes[1, 1].set_title("Checkpoint B map")
+def summarize(values: List[float], confidence: float) -> Dict[str, Any]:
+    ci = mean_ci(values, confidence)
+    return {"mean": float(np.mean(values)), "std": float(np.std(values)), "ci": list(ci) if ci else None}
+
+
+def plot_comparison(freq_a: np.ndarray, freq_b: np.ndarray, n_a: int, n_b: int, out_path: Path):
+    # crop to the region either checkpoint reached
+    visited = np.argwhere((freq_a + freq_b) > 0)
+    if len(visited):
+        (y0, x0), (y1, x1) = visited.min(axis=0), visited.max(axis=0) + 1
+        pad = 8
+        y0, x0 = max(y0 - pad, 0), max(x0 - pad, 0)
+        freq_a, freq_b = freq_a[y0:y1 + pad, x0:x1 + pad], freq_b[y0:y1 + pad, x0:x1 + pad]
+
+    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+    axes[0].imshow(freq_a, cmap="inferno", vmin=0, vmax=1)
+    axes[0].set_title(f"Checkpoint A visit rate ({n_a} rollouts)")
+    axes[1].imshow(freq_b, cmap="inferno", vmin=0, vmax=1)
+    axes[1].set_title(f"Checkpoint B visit rate ({n_b} rollouts)")
+    diff = axes[2].imshow(freq_b - freq_a, cmap="coolwarm", vmin=-1, vmax=1)
+    axes[2].set_title("B - A")
+    fig.colorbar(diff, ax=axes[2], fraction=0.046)
     for ax in axes.ravel():
         ax.axis("off")
     fig.tight_layout()
@@ -93,25 +134,105 @@ def plot_comparison(screen_a, map_a, screen_b, map_b, out_path: Path):
 
 if __name__ == "__main__":
     args = parse_args()
+    states = args.state or [Path("init.state")]
 
     for p in [args.checkpoint_a, args.checkpoint_b]:
         if not p.exists():
             raise FileNotFoundError(f"Checkpoint not found: {p}")
     if not args.rom.exists():
         raise FileNotFoundError(f"ROM not found at {args.rom}")
-    if not args.state.exists():
-        raise FileNotFoundError(f"State file not found at {args.state}")
+    for state in states:
+        if not state.exists():
+            raise FileNotFoundError(f"State file not found at {state}")
 
     out_dir = args.output or Path("runs") / f"compare_{int(time.time())}"
     out_dir.mkdir(parents=True, exist_ok=True)
+    cache = None if args.no_cache else EvalCache(args.cache_dir)
+
+    checkpoints = {"a": args.checkpoint_a, "b": args.checkpoint_b}
+    rollouts: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+    maps: Dict[str, List[np.ndarray]] = {"a": [], "b": []}
+    pending = []
+    for label, checkpoint in checkpoints.items():
+        for state in states:
+            env_config = rollout_env_config(args.rom, state, args.steps, out_dir / f"session_{label}")
+            for i in range(args.seeds):
+                seed = args.seed + i
+                key = None
+                if cache is not None:
+                    key = eval_cache_key(
+                        checkpoint, env_config, kind="compare_rollout", steps=args.steps,
+                        seed=seed, deterministic=args.deterministic,
+                    )
+                    stats = cache.get(key)
+                    arrays = cache.get_arrays(key) if stats is not None else None
+                    if arrays is not None:
+                        rollouts[(label, str(state), seed)] = {**stats, "cached": True}
+                        maps[label].append(arrays["explore_map"])
+                        continue
+                pending.append((label, checkpoint, state, seed, env_config, key))
+
+    n_total = len(rollouts) + len(pending)
+    print(f"{n_total} rollouts ({len(states)} states x {args.seeds} seeds x 2 checkpoints): "
+          f"{len(rollouts)} cached, {len(pending)} on {args.workers} workers")
+    if pending:
+        with ProcessPoolExecutor(
+            max_workers=min(args.workers, len(pending)),
+            mp_context=mp.get_context("spawn"),
+            initializer=init_single_thread,
+        ) as pool:
+            futures = {
+                pool.submit(run_rollout, checkpoint, env_config, args.steps, seed, args.deterministic):
+                    (label, state, seed, key)
+                for label, checkpoint, state, seed, env_config, key in pending
+            }
+            for future in as_completed(futures):
+                label, state, seed, key = futures[future]
+                stats, screen, explore_map = future.result()
+                if cache is not None:
+                    cache.put(key, stats, {"screen": screen, "explore_map": explore_map})
+                rollouts[(label, str(state), seed)] = {**stats, "cached": False}
+                maps[label].append(explore_map)
+
+    pairs = sorted({(state, seed) for _, state, seed in rollouts})
+    summary: Dict[str, Any] = {}
+    for label, checkpoint in checkpoints.items():
+        summary[f"run_{label}"] = {
+            "checkpoint": str(checkpoint),
+            **{m: summarize([rollouts[(label, s, seed)][m] for s, seed in pairs], args.confidence) for m in METRICS},
+        }
+    summary["difference"] = {
+        m: summarize(
+            [rollouts[("b", s, seed)][m] - rollouts[("a", s, seed)][m] for s, seed in pairs], args.confidence
+        )
+        for m in METRICS
+    }
 
-    stats_a, screen_a, map_a = run_eval(args.checkpoint_a, args.rom, args.state, args.steps, out_dir)
-    stats_b, screen_b, map_b = run_eval(args.checkpoint_b, args.rom, args.state, args.steps, out_dir)
+    print(f"\n{'Metric':18s} {'A mean':>10s} {'B mean':>10s} {'B - A':>10s}   {int(args.confidence * 100)}% CI (B - A)")
+    for m in METRICS:
+        diff = summary["difference"][m]
+        ci = f"[{diff['ci'][0]:.3f}, {diff['ci'][1]:.3f}]" if diff["ci"] else "n/a"
+        print(f"{m:18s} {summary['run_a'][m]['mean']:10.3f} {summary['run_b'][m]['mean']:10.3f} "
+              f"{diff['mean']:10.3f}   {ci}")
 
+    freq = {label: (np.mean(maps[label], axis=0) / 255.0) for label in checkpoints}
     comp_png = out_dir / "comparison.png"
-    plot_comparison(screen_a, map_a.squeeze(), screen_b, map_b.squeeze(), comp_png)
-
-    summary = {"run_a": stats_a, "run_b": stats_b, "comparison_image": str(comp_png)}
+    plot_comparison(freq["a"], freq["b"], len(maps["a"]), len(maps["b"]), comp_png)
+
+    summary.update(
+        {
+            "states": [str(s) for s in states],
+            "seeds": args.seeds,
+            "steps": args.steps,
+            "deterministic": args.deterministic,
+            "confidence": args.confidence,
+            "rollouts": [
+                {"checkpoint": label, "state": state, "seed": seed, **stats}
+                for (label, state, seed), stats in sorted(rollouts.items())
+            ],
+            "comparison_image": str(comp_png),
+        }
+    )
     (out_dir / "summary.json").write_text(json.dumps(summary, indent=2))
 
     print(f"Wrote comparison to {out_dir}")
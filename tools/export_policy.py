@@ -0,0 +1,96 @@
+"""
+Export checkpoints as weights-only policy files or traced inference graphs.
+
+Writes ``<checkpoint>.policy.pt`` next to each SB3 zip: the policy state dict
+and its spec, without the optimizer state and algorithm attributes. Tools that
+only run the policy (eval_policy.py, compare_runs.py, tournament.py,
+play_checkpoint.py) accept either file and load it with
+``training.policy_io.load_policy``, which memory-maps the weights.
+
+``--format torchscript`` / ``--format onnx`` write ``<checkpoint>.policy.ts`` /
+``<checkpoint>.policy.onnx`` instead: the whole inference graph (obs dict in,
+action logits out) for ``training.policy_runtime`` and ``--runtime`` in the
+eval tools. ONNX needs ``pip install onnx onnxruntime``.
+
+Usage:
+    python tools/export_policy.py runs/my_run/final.zip
+    python tools/export_policy.py runs/my_run            # every checkpoint in the run's manifest
+    python tools/export_policy.py runs/my_run/final.zip --output policies/final.policy.pt
+    python tools/export_policy.py runs/my_run/final.zip --format onnx
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from training.checkpoint_manifest import load_manifest
+from training.policy_io import POLICY_SUFFIX, export_policy, load_policy
+from training.policy_runtime import ONNX_SUFFIX, TORCHSCRIPT_SUFFIX, export_onnx, export_torchscript
+
+FORMATS = {
+    "weights": (POLICY_SUFFIX, export_policy),
+    "torchscript": (TORCHSCRIPT_SUFFIX, lambda checkpoint, path: export_torchscript(load_policy(checkpoint, "cpu"), path)),
+    "onnx": (ONNX_SUFFIX, lambda checkpoint, path: export_onnx(load_policy(checkpoint, "cpu"), path)),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export checkpoints as weights-only policy files.")
+    parser.add_argument("paths", type=Path, nargs="+", help="Checkpoint .zip files or run directories.")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Output file for a single checkpoint (default: <checkpoint> + the format's suffix).")
+    parser.add_argument("--format", choices=FORMATS, default="weights",
+                        help=f"weights ({POLICY_SUFFIX}), torchscript ({TORCHSCRIPT_SUFFIX}) or onnx ({ONNX_SUFFIX}).")
+    parser.add_argument("--force", action="store_true", help="Re-export checkpoints that already have a newer export.")
+    return parser.parse_args()
+
+
+def collect_checkpoints(paths):
+    checkpoints = []
+    for path in paths:
+        if path.is_dir():
+            checkpoints.extend(Path(record.path) for record in load_manifest(path).records())
+        else:
+            checkpoints.append(path)
+    return checkpoints
+
+
+def main():
+    args = parse_args()
+    checkpoints = collect_checkpoints(args.paths)
+    missing = [c for c in checkpoints if not c.exists() or c.suffix != ".zip"]
+    if missing:
+        print(f"Error: not a checkpoint .zip: {', '.join(str(c) for c in missing)}")
+        sys.exit(1)
+    if not checkpoints:
+        print("Error: no checkpoints found")
+        sys.exit(1)
+    if args.output is not None and len(checkpoints) > 1:
+        print("Error: --output needs a single checkpoint")
+        sys.exit(1)
+
+    suffix, export = FORMATS[args.format]
+    for checkpoint in checkpoints:
+        target = args.output or checkpoint.with_name(checkpoint.stem + suffix)
+        if not args.force and target.exists() and target.stat().st_mtime >= checkpoint.stat().st_mtime:
+            print(f"{target} is up to date")
+            continue
+        start = time.perf_counter()
+        try:
+            path = export(checkpoint, target)
+        except ImportError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(
+            f"{checkpoint} ({checkpoint.stat().st_size / 1e6:.1f} MB) -> {path} "
+            f"({path.stat().st_size / 1e6:.1f} MB) in {time.perf_counter() - start:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Golden-trace equivalence harness for RedGymEnv.
+
+Records actions, per-step reward components, observation hashes, tracking
+counters and `info` from a fixed savestate and action sequence, then replays
+the same actions against the current code and diffs every field. Use it to
+check that a performance change keeps training dynamics bit-identical (default)
+or within a declared tolerance.
+
+Usage:
+    # record on the baseline commit
+    python tools/golden_trace.py record --config configs/gym_quest.json --steps 2000 --output golden.json
+    # replay after the change
+    python tools/golden_trace.py compare --golden golden.json
+    python tools/golden_trace.py compare --golden golden.json --atol 1e-9
+
+    # ROM-free variant on the fake emulator backend
+    python tools/golden_trace.py record --backend fake --steps 2000 --output golden_fake.json
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from env.red_gym_env import RedGymEnv
+from training.status_tracking import convert_numpy_types
+
+GOLDEN_FORMAT_VERSION = 1
+
+# Small float observations are stored raw so --atol applies to them;
+# everything else is compared by hash.
+RAW_OBS_KEYS = ("health", "level")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Record and compare golden env traces.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Record a golden trace with the current code.")
+    rec.add_argument("--config", type=Path, default=None, help="Task config JSON (uses its env section).")
+    rec.add_argument("--rom", type=Path, default=Path("PokemonRed.gb"), help="Path to Pokemon Red ROM.")
+    rec.add_argument("--state", type=Path, default=Path("init.state"), help="Start savestate path.")
+    rec.add_argument("--backend", choices=["pyboy", "fake"], default="pyboy", help="Emulator backend.")
+    rec.add_argument("--trace", type=Path, default=None, help="Fake backend trace .npz (default: synthetic).")
+    rec.add_argument("--steps", type=int, default=1000, help="Number of steps to record.")
+    rec.add_argument("--seed", type=int, default=0, help="Seed for the random action sequence.")
+    rec.add_argument("--actions", type=Path, default=None, help="JSON list of actions to use instead of random ones.")
+    rec.add_argument("--output", type=Path, required=True, help="Golden trace JSON to write.")
+
+    cmp = sub.add_parser("compare", help="Replay a golden trace against the current code and diff it.")
+    cmp.add_argument("--golden", type=Path, required=True, help="Golden trace JSON written by 'record'.")
+    cmp.add_argument("--atol", type=float, default=0.0, help="Absolute tolerance for numeric fields (0 = bit-identical).")
+    cmp.add_argument("--max-report", type=int, default=20, help="Maximum number of mismatches to print.")
+    return parser.parse_args()
+
+
+def file_sha256(path: Path) -> Optional[str]:
+    if not path.exists():
+        return None
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_obs(obs: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    hashed = {}
+    for key in sorted(obs.keys()):
+        arr = np.ascontiguousarray(obs[key])
+        if key in RAW_OBS_KEYS:
+            hashed[key] = arr.astype(np.float64).ravel().tolist()
+        else:
+            digest = hashlib.sha1(arr.tobytes()).hexdigest()
+            hashed[key] = f"{arr.dtype}{list(arr.shape)}:{digest}"
+    return hashed
+
+
+def snapshot(env: RedGymEnv) -> Dict[str, Any]:
+    """Per-step env bookkeeping that reward/observation optimizations could disturb."""
+    return {
+        "components": dict(env.episode_reward_components),
+        "coords": list(env.get_game_coords()),
+        "seen_coords": len(env.seen_coords),
+        "visited_tiles": len(env.episode_visited_tiles),
+        "max_map_progress": env.max_map_progress,
+        "battle_stats": dict(env.episode_battle_stats),
+        "milestones": dict(env.episode_milestones),
+    }
+
+
+def build_env_config(args) -> Dict[str, Any]:
+    env_config: Dict[str, Any] = {}
+    if args.config is not None:
+        with open(args.config) as f:
+            env_config = json.load(f).get("env", {})
+    env_config.update(
+        {
+            "gb_path": str(args.rom),
+            "init_state": str(args.state),
+            "session_path": "golden_session",
+            "headless": True,
+            "save_final_state": False,
+            "print_rewards": False,
+            "save_video": False,
+            "fast_video": True,
+            "emulator_backend": args.backend,
+        }
+    )
+    env_config.setdefault("action_freq", 24)
+    env_config.setdefault("max_steps", args.steps + 1)
+    if args.backend == "fake":
+        env_config["emulator_trace"] = str(args.trace) if args.trace else None
+    return env_config
+
+
+def make_env(env_config: Dict[str, Any]) -> RedGymEnv:
+    conf = dict(env_config)
+    conf["session_path"] = Path(conf["session_path"])
+    return RedGymEnv(conf)
+
+
+def rollout(env: RedGymEnv, actions: List[int]) -> List[Dict[str, Any]]:
+    """Run actions, resetting on episode end, and record every step."""
+    records = []
+    obs, info = env.reset(seed=0)
+    records.append({"event": "reset", "obs": hash_obs(obs), "state": snapshot(env)})
+    for idx, action in enumerate(actions):
+        obs, reward, terminated, truncated, info = env.step(action)
+        records.append(
+            {
+                "event": "step",
+                "index": idx,
+                "action": int(action),
+                "reward": float(reward),
+                "terminated": bool(terminated),
+                "truncated": bool(truncated),
+                "obs": hash_obs(obs),
+                "state": snapshot(env),
+                "info": convert_numpy_types(info),
+            }
+        )
+        if terminated or truncated:
+            obs, info = env.reset()
+            records.append({"event": "reset", "obs": hash_obs(obs), "state": snapshot(env)})
+    return records
+
+
+def diff_values(path: str, expected: Any, actual: Any, atol: float, out: List[str]):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            if key not in expected or key not in actual:
+                out.append(f"{path}.{key}: missing on {'replay' if key in expected else 'golden'} side")
+                continue
+            diff_values(f"{path}.{key}", expected[key], actual[key], atol, out)
+    elif isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            out.append(f"{path}: length {len(expected)} != {len(actual)}")
+            return
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            diff_values(f"{path}[{i}]", e, a, atol, out)
+    elif isinstance(expected, bool) or isinstance(actual, bool) or not (
+        isinstance(expected, (int, float)) and isinstance(actual, (int, float))
+    ):
+        if expected != actual:
+            out.append(f"{path}: {expected!r} != {actual!r}")
+    elif abs(expected - actual) > atol or (atol == 0 and expected != actual):
+        out.append(f"{path}: {expected!r} != {actual!r} (|diff|={abs(expected - actual):.3g})")
+
+
+def record(args):
+    if args.backend == "pyboy" and not args.rom.exists():
+        raise FileNotFoundError(f"ROM not found at {args.rom}")
+    if args.actions is not None:
+        actions = [int(a) for a in json.loads(args.actions.read_text())][: args.steps]
+    else:
+        rng = random.Random(args.seed)
+        actions = [rng.randrange(7) for _ in range(args.steps)]
+
+    env_config = build_env_config(args)
+    env = make_env(env_config)
+    start = time.perf_counter()
+    records = rollout(env, actions)
+    elapsed = time.perf_counter() - start
+
+    try:
+        git_commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        git_commit = None
+
+    golden = {
+        "format_version": GOLDEN_FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "git_commit": git_commit,
+        "env_config": convert_numpy_types(env_config),
+        "state_sha256": file_sha256(Path(env_config["init_state"])),
+        "actions": actions,
+        "records": records,
+    }
+    args.output.write_text(json.dumps(golden))
+    print(f"Recorded {len(actions)} steps ({len(records)} records) in {elapsed:.1f}s -> {args.output}")
+
+
+def compare(args):
+    golden = json.loads(args.golden.read_text())
+    if golden.get("format_version") != GOLDEN_FORMAT_VERSION:
+        raise ValueError(f"Unsupported golden trace version: {golden.get('format_version')}")
+
+    env_config = golden["env_config"]
+    state_hash = file_sha256(Path(env_config["init_state"]))
+    if state_hash != golden["state_sha256"]:
+        print(f"Warning: start state {env_config['init_state']} differs from the recorded one")
+
+    env = make_env(env_config)
+    start = time.perf_counter()
+    replayed = rollout(env, golden["actions"])
+    elapsed = time.perf_counter() - start
+
+    mismatches: List[str] = []
+    diff_values("records", golden["records"], replayed, args.atol, mismatches)
+
+    print(f"Replayed {len(golden['actions'])} steps in {elapsed:.1f}s (golden from commit {golden.get('git_commit')})")
+    if not mismatches:
+        tol = "bit-identical" if args.atol == 0 else f"within atol={args.atol}"
+        print(f"OK: all fields {tol}")
+        return 0
+
+    print(f"FAIL: {len(mismatches)} mismatching fields")
+    for line in mismatches[: args.max_report]:
+        print(f"  {line}")
+    if len(mismatches) > args.max_report:
+        print(f"  ... {len(mismatches) - args.max_report} more")
+    return 1
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "record":
+        record(args)
+    else:
+        sys.exit(compare(args))
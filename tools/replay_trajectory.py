@@ -0,0 +1,124 @@
+"""
+Inspect and re-emulate recorded .traj trajectories.
+
+Stats and the exploration map come straight from the recorded RAM deltas (no
+emulator). Frames are regenerated by re-emulating the actions from the start
+savestate, which also checks the replay stays in sync with the recording.
+
+Usage:
+    python tools/replay_trajectory.py runs/my_run/trajectories/traj_ab12cd34_3.traj
+    python tools/replay_trajectory.py traj.traj --stats stats.json --map map.png
+    python tools/replay_trajectory.py traj.traj --video full.mp4 --rom PokemonRed.gb
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from env.global_map import GLOBAL_MAP_SHAPE, local_to_global
+from env.trajectory import TrajectoryReader, replay_trajectory
+
+PARTY_HP = [0xD16C, 0xD198, 0xD1C4, 0xD1F0, 0xD21C, 0xD248]
+PARTY_MAX_HP = [0xD18D, 0xD1B9, 0xD1E5, 0xD211, 0xD23D, 0xD269]
+PARTY_LEVELS = [0xD18C, 0xD1B8, 0xD1E4, 0xD210, 0xD23C, 0xD268]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Inspect or re-emulate a recorded trajectory.")
+    parser.add_argument("trajectory", type=Path, help="Path to a .traj file.")
+    parser.add_argument("--stats", type=Path, default=None, help="Write per-step stats JSON (from recorded RAM).")
+    parser.add_argument("--map", type=Path, default=None, help="Write the visited-tiles map PNG (from recorded RAM).")
+    parser.add_argument("--video", type=Path, default=None, help="Re-emulate and write full-resolution frames to MP4.")
+    parser.add_argument("--rom", type=Path, default=None, help="Override the recorded ROM path.")
+    parser.add_argument("--state", type=Path, default=None, help="Override the recorded start savestate path.")
+    parser.add_argument("--no-check", action="store_true", help="Skip comparing emulator RAM to the recording.")
+    return parser.parse_args()
+
+
+def step_stats(reader: TrajectoryReader):
+    """Per-step game stats reconstructed from the recorded WRAM."""
+    start = reader.metadata["wram_start"]
+
+    def m(wram, addr):
+        return int(wram[addr - start])
+
+    def hp(wram, addr):
+        return 256 * m(wram, addr) + m(wram, addr + 1)
+
+    stats = []
+    for step, action, wram in reader.iter_wram():
+        max_hp = max(sum(hp(wram, a) for a in PARTY_MAX_HP), 1)
+        stats.append(
+            {
+                "step": step,
+                "action": action,
+                "position": (m(wram, 0xD362), m(wram, 0xD361), m(wram, 0xD35E)),
+                "hp": sum(hp(wram, a) for a in PARTY_HP) / max_hp,
+                "levels_sum": sum(m(wram, a) for a in PARTY_LEVELS),
+                "badges": bin(m(wram, 0xD356)).count("1"),
+                "in_battle": m(wram, 0xD057) != 0,
+            }
+        )
+    return stats
+
+
+def explore_map(stats) -> np.ndarray:
+    explored = np.zeros(GLOBAL_MAP_SHAPE, dtype=np.uint8)
+    for row in stats:
+        x, y, map_n = row["position"]
+        gy, gx = local_to_global(y, x, map_n)
+        if 0 <= gy < explored.shape[0] and 0 <= gx < explored.shape[1]:
+            explored[gy, gx] = 255
+    return explored
+
+
+def main():
+    args = parse_args()
+    if not args.trajectory.exists():
+        print(f"Error: Trajectory not found at {args.trajectory}")
+        sys.exit(1)
+
+    reader = TrajectoryReader(args.trajectory)
+    meta = reader.metadata
+    size_kb = args.trajectory.stat().st_size / 1024
+    print(f"Trajectory:   {args.trajectory} ({size_kb:.1f} KB)")
+    print(f"Steps:        {len(reader)}")
+    print(f"Start state:  {meta.get('start_state')} (sha256 {str(meta.get('start_state_sha256'))[:12]})")
+    print(f"Recorded:     {meta.get('created')} by env {meta.get('instance_id')}")
+
+    stats = step_stats(reader) if (args.stats or args.map or not args.video) else None
+    if stats:
+        final = stats[-1]
+        print(f"Final:        position={final['position']}, badges={final['badges']}, levels_sum={final['levels_sum']}")
+        print(f"Tiles:        {len({row['position'] for row in stats})} unique")
+    if args.stats:
+        args.stats.write_text(json.dumps(stats, indent=2))
+        print(f"Stats saved to: {args.stats}")
+    if args.map:
+        import matplotlib.pyplot as plt
+        plt.imsave(args.map, explore_map(stats), cmap="gray")
+        print(f"Map saved to: {args.map}")
+
+    if args.video:
+        import mediapy as media
+
+        overrides = {}
+        if args.rom:
+            overrides["gb_path"] = str(args.rom)
+        if args.state:
+            overrides["init_state"] = str(args.state)
+        with media.VideoWriter(args.video, (144, 160), fps=60, input_format="gray") as writer:
+            for step, action, env in replay_trajectory(args.trajectory, overrides, check=not args.no_check):
+                writer.add_image(env.render(reduce_res=False)[:, :, 0])
+        print(f"Re-emulated {len(reader)} steps -> {args.video}")
+
+
+if __name__ == "__main__":
+    main()
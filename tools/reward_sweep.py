@@ -0,0 +1,207 @@
+"""
+Sweep many RewardConfig variants over recorded reward RAM traces.
+
+Record traces once during any rollout by setting "reward_trace_dir" in the env
+config (or `python debug_rewards.py --reward-trace DIR`), then recompute the
+exploration, battle, milestone and penalty rewards for every variant offline,
+vectorized over time steps (see env/reward_trace.py). No emulator or ROM needed.
+
+Usage:
+    # compare the redesign configs on the same trajectories
+    python tools/reward_sweep.py --traces reward_traces --variants configs/*_redesign.json
+
+    # grid over coefficients on top of a task's reward config
+    python tools/reward_sweep.py --traces reward_traces --config configs/balanced_redesign.json \
+        --grid battle_win=10,50,100 --grid penalty_step=-0.01,-0.001 --output sweep.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from env.reward_config import RewardConfig, get_reward_config
+from env.reward_trace import (
+    SHAPED_COMPONENTS,
+    RewardFeatures,
+    episode_totals,
+    evaluate_reward_configs,
+    load_reward_trace,
+)
+
+# Upper bound on (configs x steps) elements evaluated per batch
+BATCH_ELEMENTS = 4_000_000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate RewardConfig variants on recorded reward traces.")
+    parser.add_argument("--traces", type=Path, nargs="+", required=True,
+                        help="Trace directories or rewardtrace_*.npz shards.")
+    parser.add_argument("--config", type=Path, default=None,
+                        help="Base task config JSON (env.reward_config) or RewardConfig JSON.")
+    parser.add_argument("--variants", type=Path, nargs="*", default=[],
+                        help="Task/RewardConfig JSON files evaluated as-is, named by file stem.")
+    parser.add_argument("--grid", action="append", default=[],
+                        help="field=v1,v2,... grid over the base config (repeatable).")
+    parser.add_argument("--top", type=int, default=20, help="Number of rows to print.")
+    parser.add_argument("--output", type=Path, default=None, help="Write results to .csv or .json.")
+    return parser.parse_args()
+
+
+def load_reward_config(path: Path) -> RewardConfig:
+    """RewardConfig from a task config (env section) or a bare RewardConfig JSON."""
+    with open(path) as f:
+        data = json.load(f)
+    if "env" not in data:
+        return RewardConfig.from_dict(data)
+    env_config = data["env"]
+    rc = env_config.get("reward_config")
+    if isinstance(rc, dict):
+        return RewardConfig.from_dict(rc)
+    if isinstance(rc, str):
+        return get_reward_config(rc)
+    # same default as RedGymEnv without a reward_config
+    return RewardConfig(reward_scale=env_config.get("reward_scale", 1), legacy_heal=10.0)
+
+
+def parse_grid(specs: List[str]) -> List[Tuple[str, list]]:
+    types = {f.name: f.type for f in fields(RewardConfig)}
+    grid = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        name = name.strip()
+        if name not in types or not values:
+            raise ValueError(f"Invalid --grid '{spec}'. Expected field=v1,v2,... with a RewardConfig field")
+        field_type = types[name]
+        if field_type in (bool, "bool"):
+            parsed = [v.strip().lower() in ("1", "true", "yes") for v in values.split(",")]
+        elif field_type in (int, "int"):
+            parsed = [int(v) for v in values.split(",")]
+        else:
+            parsed = [float(v) for v in values.split(",")]
+        grid.append((name, parsed))
+    return grid
+
+
+def build_variants(args) -> Dict[str, RewardConfig]:
+    base = load_reward_config(args.config) if args.config else RewardConfig()
+    variants: Dict[str, RewardConfig] = {}
+    for path in args.variants:
+        variants[path.stem] = load_reward_config(path)
+
+    grid = parse_grid(args.grid)
+    if grid:
+        names = [name for name, _ in grid]
+        for combo in itertools.product(*[values for _, values in grid]):
+            overrides = dict(zip(names, combo))
+            label = ",".join(f"{k}={v}" for k, v in overrides.items())
+            variants[label] = RewardConfig.from_dict({**base.to_dict(), **overrides})
+    elif not variants or args.config:
+        variants[args.config.stem if args.config else "default"] = base
+    return variants
+
+
+def find_shards(paths: List[Path]) -> List[Path]:
+    shards = []
+    for path in paths:
+        if path.is_dir():
+            shards.extend(sorted(path.glob("rewardtrace_*.npz")))
+        elif path.exists():
+            shards.append(path)
+        else:
+            raise FileNotFoundError(f"Trace path not found: {path}")
+    if not shards:
+        raise FileNotFoundError(f"No rewardtrace_*.npz shards in {[str(p) for p in paths]}")
+    return shards
+
+
+def sweep(features: List[RewardFeatures], configs: List[RewardConfig]) -> Dict[str, np.ndarray]:
+    """Per-episode component totals, {component: (n_configs, n_episodes)} over all traces."""
+    results = {name: [] for name in SHAPED_COMPONENTS + ('total',)}
+    for feat in features:
+        if feat.n_steps == 0:
+            continue
+        batch = max(1, BATCH_ELEMENTS // feat.n_steps)
+        per_trace = {name: [] for name in results}
+        for lo in range(0, len(configs), batch):
+            per_step = evaluate_reward_configs(feat, configs[lo:lo + batch])
+            for name in SHAPED_COMPONENTS:
+                per_trace[name].append(episode_totals(feat, per_step[name]))
+        for name in SHAPED_COMPONENTS:
+            results[name].append(np.concatenate(per_trace[name], axis=0))
+    totals = {name: np.concatenate(results[name], axis=1) for name in SHAPED_COMPONENTS}
+    totals['total'] = sum(totals[name] for name in SHAPED_COMPONENTS)
+    return totals
+
+
+def write_output(path: Path, rows: List[dict]):
+    if path.suffix == ".csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+def main():
+    args = parse_args()
+    variants = build_variants(args)
+    names = list(variants.keys())
+    configs = list(variants.values())
+
+    start = time.perf_counter()
+    traces = load_reward_trace(find_shards(args.traces))
+    features = [RewardFeatures(trace) for trace in traces]
+    load_time = time.perf_counter() - start
+    n_steps = sum(f.n_steps for f in features)
+    n_episodes = sum(f.n_episodes for f in features)
+    if n_steps == 0:
+        print("Error: traces contain no steps")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    totals = sweep(features, configs)
+    sweep_time = time.perf_counter() - start
+
+    rows = []
+    for idx, (name, config) in enumerate(zip(names, configs)):
+        row = {"variant": name, "mean_return": float(totals['total'][idx].mean()),
+               "std_return": float(totals['total'][idx].std())}
+        for comp in SHAPED_COMPONENTS:
+            row[f"mean_{comp}"] = float(totals[comp][idx].mean())
+        rows.append(row)
+    rows.sort(key=lambda r: r["mean_return"], reverse=True)
+
+    print(f"Traces: {len(traces)} env(s), {n_episodes} episodes, {n_steps} steps (loaded in {load_time:.2f}s)")
+    print(f"Evaluated {len(configs)} reward configs in {sweep_time:.2f}s")
+    print()
+    width = min(max(len(r["variant"]) for r in rows), 60)
+    header = f"{'variant':<{width}}  {'return':>12}  " + "  ".join(f"{c:>12}" for c in SHAPED_COMPONENTS)
+    print(header)
+    print("-" * len(header))
+    for row in rows[: args.top]:
+        comps = "  ".join(f"{row[f'mean_{c}']:12.4f}" for c in SHAPED_COMPONENTS)
+        print(f"{row['variant'][:width]:<{width}}  {row['mean_return']:12.4f}  {comps}")
+    if len(rows) > args.top:
+        print(f"... {len(rows) - args.top} more")
+
+    if args.output:
+        write_output(args.output, rows)
+        print(f"\nResults saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
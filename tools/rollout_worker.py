@@ -0,0 +1,87 @@
+"""
+Step RedGymEnv envs for a distributed training run and stream the rollouts to its learner.
+
+Connects to ``train_ppo.py --distributed HOST:PORT``, receives the run's env
+config, policy spec and weights, and plays ``--num-envs`` envs until the
+learner stops (training/distributed.py). Start as many workers, on as many
+machines, as you like; they can join and leave mid-run. Paths in the learner's
+env config (ROM, init state) are the learner's, so pass ``--rom``/``--state``
+when this machine keeps them elsewhere.
+
+Usage:
+    python training/train_ppo.py --run-name dist --num-envs 32 --distributed 0.0.0.0:5600 --authkey s3cret
+    python tools/rollout_worker.py --learner trainer-host:5600 --num-envs 16 --authkey s3cret
+    python tools/rollout_worker.py --learner trainer-host:5600 --num-envs 16 --rom ~/roms/PokemonRed.gb --state ~/init.state
+"""
+
+import argparse
+import multiprocessing as mp
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from training.distributed import run_worker
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Play envs for a distributed train_ppo.py learner.")
+    parser.add_argument("--learner", required=True, help="host:port the learner listens on (train_ppo.py --distributed).")
+    parser.add_argument("--num-envs", type=int, default=8,
+                        help="Envs this worker steps (one rollout segment is n_steps x this); must divide the learner's --num-envs.")
+    parser.add_argument("--name", default=None, help="Name in the learner's stats (default: hostname-pid).")
+    parser.add_argument("--rom", type=Path, default=None, help="ROM path on this machine (default: the learner's).")
+    parser.add_argument("--state", type=Path, default=None, help="Initial save state on this machine (default: the learner's).")
+    parser.add_argument("--session-dir", type=Path, default=None,
+                        help="Where the envs write session files (default: <learner run dir>/worker_<name>).")
+    parser.add_argument("--seed", type=int, default=0, help="Env i is reset with seed + i.")
+    parser.add_argument("--authkey", default=None, help="Shared secret, if the learner was started with --authkey.")
+    parser.add_argument("--connect-timeout", type=float, default=60.0, help="Seconds to keep retrying the learner.")
+    parser.add_argument("--log-every", type=float, default=30.0, help="Seconds between throughput lines.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.num_envs < 1:
+        print("Error: --num-envs must be >= 1")
+        sys.exit(1)
+    overrides = {}
+    for key, path in (("gb_path", args.rom), ("init_state", args.state)):
+        if path is not None:
+            if not path.exists():
+                print(f"Error: {path} not found")
+                sys.exit(1)
+            overrides[key] = str(path)
+    if args.session_dir is not None:
+        overrides["session_path"] = args.session_dir
+
+    print(f"Connecting to {args.learner} with {args.num_envs} envs; Ctrl+C to stop")
+    try:
+        totals = run_worker(
+            args.learner,
+            num_envs=args.num_envs,
+            name=args.name,
+            seed=args.seed,
+            env_overrides=overrides,
+            authkey=args.authkey.encode() if args.authkey else None,
+            connect_timeout=args.connect_timeout,
+            log_every=args.log_every,
+        )
+    except mp.AuthenticationError:
+        print(f"Error: the learner at {args.learner} rejected --authkey")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except (ConnectionRefusedError, OSError) as e:
+        print(f"Error: could not reach the learner at {args.learner}: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        sys.exit(0)
+    print(
+        f"Learner closed the connection after {totals['segments']} segments "
+        f"({totals['steps']} steps, {totals['steps_per_s']:.0f} steps/s, {totals['bytes'] / 1e6:.1f} MB sent)"
+    )
@@ -1,5 +1,4 @@
 import json
-import re
 import sys
 import threading
 from http.server import HTTPServer, SimpleHTTPRequestHandler
@@ -10,14 +9,9 @@ REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
-RUNS_DIR = Path("runs")
-
+from training.checkpoint_manifest import load_manifest
 
-def parse_checkpoint_steps(path: Path) -> Optional[int]:
-    m = re.search(r"_(\d+)_steps\.zip", path.name)
-    if m:
-        return int(m.group(1))
-    return None
+RUNS_DIR = Path("runs")
 
 
 def collect_runs(runs_dir: Path) -> List[Dict]:
@@ -34,15 +28,18 @@ def collect_runs(runs_dir: Path) -> List[Dict]:
                 metadata = json.loads(metadata_path.read_text())
             except json.JSONDecodeError:
                 metadata = {}
-        checkpoints = sorted(run.glob("*.zip"))
-        latest_ckpt = checkpoints[-1] if checkpoints else None
+        manifest = load_manifest(run)
+        latest_ckpt = manifest.latest()
+        best_ckpt = manifest.best()
         runs.append(
             {
                 "name": run.name,
                 "path": str(run),
-                "latest_checkpoint": str(latest_ckpt) if latest_ckpt else None,
-                "latest_steps": parse_checkpoint_steps(latest_ckpt) if latest_ckpt else None,
-                "last_modified": latest_ckpt.stat().st_mtime if latest_ckpt else run.stat().st_mtime,
+                "latest_checkpoint": latest_ckpt.path if latest_ckpt else None,
+                "latest_steps": latest_ckpt.steps if latest_ckpt else None,
+                "best_checkpoint": best_ckpt.path if best_ckpt else None,
+                "best_score": best_ckpt.score if best_ckpt else None,
+                "last_modified": latest_ckpt.created if latest_ckpt else run.stat().st_mtime,
                 "metadata": metadata,
             }
         )
@@ -50,6 +47,19 @@ def collect_runs(runs_dir: Path) -> List[Dict]:
     return runs
 
 
+def latest_leaderboard(runs_dir: Path) -> Optional[Dict]:
+    """Newest leaderboard written by tools/tournament.py, or None."""
+    boards = sorted(runs_dir.glob("tournament_*/leaderboard.json"), key=lambda p: p.stat().st_mtime)
+    for path in reversed(boards):
+        try:
+            board = json.loads(path.read_text())
+        except json.JSONDecodeError:
+            continue
+        board["path"] = str(path)
+        return board
+    return None
+
+
 DASHBOARD_HTML = """<!DOCTYPE html>
 <html>
 <head>
@@ -68,6 +78,8 @@ DASHBOARD_HTML = """<!DOCTYPE html>
     select, button { padding: 8px; margin-right: 8px; border-radius: 4px; border: 1px solid #294261; background: #0f1e30; color: #e8eef5; }
     button { cursor: pointer; background: #1f8ef1; border: none; }
     a { color: #1f8ef1; text-decoration: none; }
+    table { border-collapse: collapse; width: 100%; font-size: 13px; }
+    th, td { text-align: left; padding: 6px 8px; border-bottom: 1px solid #1f3247; }
   </style>
 </head>
 <body>
@@ -83,6 +95,12 @@ DASHBOARD_HTML = """<!DOCTYPE html>
     <div id="compareCmd" class="meta" style="margin-top:8px;"></div>
   </div>
 
+  <div class="compare">
+    <div style="margin-bottom:8px;font-weight:700;">Tournament leaderboard</div>
+    <div id="leaderboardMeta" class="meta"></div>
+    <table id="leaderboard"></table>
+  </div>
+
   <script>
     async function loadRuns() {
       const res = await fetch('/api/runs');
@@ -99,6 +117,7 @@ DASHBOARD_HTML = """<!DOCTYPE html>
           <div class="title">${run.name}</div>
           <div class="meta">Latest steps: ${run.latest_steps ?? 'n/a'}</div>
           <div class="meta">Checkpoint: ${run.latest_checkpoint ? run.latest_checkpoint : 'n/a'}</div>
+          <div class="meta">Best by eval: ${run.best_checkpoint ? `${run.best_checkpoint} (${run.best_score.toFixed(3)})` : 'n/a'}</div>
           <div class="meta">Streaming: ${run.metadata.stream_enabled ? 'on' : 'off'}</div>
           <div class="meta">Num envs: ${run.metadata.train_config ? run.metadata.train_config.num_envs : 'n/a'}</div>
           <div class="meta">Batch size: ${run.metadata.train_config ? run.metadata.train_config.batch_size : 'n/a'}</div>
@@ -123,7 +142,31 @@ DASHBOARD_HTML = """<!DOCTYPE html>
       const cmd = `python tools/compare_runs.py --checkpoint-a "${a}" --checkpoint-b "${b}" --rom PokemonRed.gb --state init.state`;
       document.getElementById('compareCmd').innerText = cmd;
     }
+    async function loadLeaderboard() {
+      const res = await fetch('/api/leaderboard');
+      const board = await res.json();
+      const table = document.getElementById('leaderboard');
+      const meta = document.getElementById('leaderboardMeta');
+      if (!board) {
+        meta.innerText = 'No tournament yet. Run python tools/tournament.py --run runs/<a> --run runs/<b> ...';
+        table.innerHTML = '';
+        return;
+      }
+      meta.innerText = `${board.created} | ranked by ${board.rank_by} | ${board.states.length} states x ${board.seeds} seeds, ${board.steps} steps`;
+      const fmt = (v) => (v === null || v === undefined ? 'n/a' : v.toFixed(3));
+      table.innerHTML = `<tr><th>#</th><th>Checkpoint</th><th>${board.rank_by}</th><th>CI</th><th>Mean rank</th><th>Win rate</th></tr>` +
+        board.leaderboard.map((row) => `
+          <tr>
+            <td>${row.rank}</td>
+            <td>${row.name}</td>
+            <td>${fmt(row.score)}</td>
+            <td>${row.score_ci ? `[${fmt(row.score_ci[0])}, ${fmt(row.score_ci[1])}]` : 'n/a'}</td>
+            <td>${row.mean_rank.toFixed(2)}</td>
+            <td>${(row.win_rate * 100).toFixed(1)}%</td>
+          </tr>`).join('');
+    }
     loadRuns();
+    loadLeaderboard();
   </script>
 </body>
 </html>
@@ -145,6 +188,13 @@ class DashboardHandler(SimpleHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps(runs).encode("utf-8"))
             return
+        if self.path.startswith("/api/leaderboard"):
+            board = latest_leaderboard(RUNS_DIR)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(board).encode("utf-8"))
+            return
         return super().do_GET()
 
 
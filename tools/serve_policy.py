@@ -0,0 +1,85 @@
+"""
+Serve a checkpoint's policy to many env processes from one batched process.
+
+Loads the checkpoint once and answers observation requests over a Unix socket
+or TCP, batching concurrent requests (training/inference_server.py). Point
+eval_policy.py --inference_server, training/play_checkpoint.py --server or
+your own ``PolicyClient`` at the address it prints.
+
+Usage:
+    python tools/serve_policy.py --checkpoint runs/my_run/final.zip
+    python tools/serve_policy.py --checkpoint runs/my_run/final.policy.onnx --address 127.0.0.1:5599 --threads 4
+    python eval_policy.py --config configs/gym_quest.json --checkpoint runs/my_run/final.zip --workers 16 --inference_server /tmp/pokered-policy.sock
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from training.inference_server import DEFAULT_MAX_BATCH, DEFAULT_MAX_LATENCY_MS, InferenceServer
+from training.policy_runtime import RUNTIMES
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve batched policy inference to env processes.")
+    parser.add_argument("--checkpoint", type=Path, required=True,
+                        help="Checkpoint .zip, weights-only policy file or exported .policy.ts/.policy.onnx.")
+    parser.add_argument("--address", default="/tmp/pokered-policy.sock",
+                        help="Unix socket path, or host:port to listen on TCP.")
+    parser.add_argument("--runtime", choices=RUNTIMES, default="torchscript",
+                        help="Inference backend (sb3 serves the same graph eagerly, like torch).")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op inference threads.")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Most observations per forward pass.")
+    parser.add_argument("--max-latency-ms", type=float, default=DEFAULT_MAX_LATENCY_MS,
+                        help="Longest a request waits for others to batch with.")
+    parser.add_argument("--stats-every", type=float, default=30.0, help="Seconds between stats lines (0 = never).")
+    return parser.parse_args()
+
+
+def report(server: InferenceServer, every: float):
+    while True:
+        time.sleep(every)
+        stats = server.stats()
+        print(
+            f"[{time.strftime('%H:%M:%S')}] clients={stats['clients']} requests={stats['requests']} "
+            f"observations={stats['observations']} mean_batch={stats['mean_batch']:.2f} "
+            f"mean_latency={stats['mean_latency_ms']:.2f}ms",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.checkpoint.exists():
+        print(f"Error: Checkpoint not found at {args.checkpoint}")
+        sys.exit(1)
+
+    try:
+        server = InferenceServer(
+            args.checkpoint,
+            args.address,
+            runtime=args.runtime,
+            num_threads=args.threads,
+            max_batch=args.max_batch,
+            max_latency_ms=args.max_latency_ms,
+        )
+    except ImportError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(
+        f"Serving {args.checkpoint} ({server.runtime.backend}) on {args.address} "
+        f"(max batch {args.max_batch}, max latency {args.max_latency_ms} ms); Ctrl+C to stop"
+    )
+    if args.stats_every > 0:
+        threading.Thread(target=report, args=(server, args.stats_every), daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
+    print(f"Stopped: {server.stats()}")
@@ -17,13 +17,17 @@ def parse_args():
     parser.add_argument("--state", type=Path, default=Path("init.state"), help="Initial save state path.")
     parser.add_argument("--steps", type=int, default=128, help="Number of random steps to run.")
     parser.add_argument("--headless", action="store_true", default=True, help="Force headless mode.")
+    parser.add_argument(
+        "--backend", choices=["pyboy", "fake"], default="pyboy",
+        help="Emulator backend; 'fake' plays back a synthetic RAM trace and needs no ROM.",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
 
-    if not args.rom.exists():
+    if args.backend == "pyboy" and not args.rom.exists():
         raise FileNotFoundError(f"ROM not found at {args.rom}")
     if not args.state.exists():
         raise FileNotFoundError(f"State file not found at {args.state}")
@@ -43,6 +47,7 @@ if __name__ == "__main__":
         "debug": False,
         "reward_scale": 0.5,
         "explore_weight": 0.25,
+        "emulator_backend": args.backend,
     }
 
     env = RedGymEnv(env_config)
@@ -0,0 +1,176 @@
+"""
+Evaluate every checkpoint of a run and build an offline learning curve.
+
+Reads the ``poke_<steps>_steps.zip`` checkpoints from a run's manifest
+(training/checkpoint_manifest.py) and evaluates each one against one or more task configs on a process pool. Results are cached
+by checkpoint hash + config + episode settings (see training/eval_cache.py), so
+rerunning the sweep while training continues only evaluates new checkpoints.
+
+Usage:
+    python tools/sweep_checkpoints.py runs/my_run --config configs/walk_to_pokecenter.json --workers 8
+    python tools/sweep_checkpoints.py runs/my_run --config configs/gym_quest.json \\
+        --config configs/battle_training.json --n-episodes 5 --output curve.csv
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from training.checkpoint_manifest import load_manifest
+from training.eval_cache import DEFAULT_CACHE_DIR, EvalCache, eval_cache_key
+from training.evaluation import evaluate_checkpoint, init_single_thread
+
+CHECKPOINT_PATTERN = re.compile(r"poke_(\d+)_steps\.zip$")
+CURVE_COLUMNS = (
+    "config", "timesteps", "checkpoint", "n_episodes", "mean_return", "std_return",
+    "success_rate", "mean_length", "cached",
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate all checkpoints of a run into a learning curve.")
+    parser.add_argument("run_dir", type=Path, help="Run directory containing poke_<steps>_steps.zip checkpoints.")
+    parser.add_argument("--config", type=Path, action="append", required=True,
+                        help="Task config JSON to evaluate against (repeatable).")
+    parser.add_argument("--rom", type=Path, default=Path("PokemonRed.gb"), help="Path to Pokemon Red ROM.")
+    parser.add_argument("--state", type=Path, default=Path("init.state"), help="Initial save state path.")
+    parser.add_argument("--n-episodes", type=int, default=3, help="Episodes per checkpoint and config.")
+    parser.add_argument("--max-steps", type=int, default=None, help="Max steps per episode (default: from config).")
+    parser.add_argument("--seed", type=int, default=42, help="Episode i uses seed + i.")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes (one checkpoint/config per task).")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Evaluation result cache.")
+    parser.add_argument("--no-cache", action="store_true", help="Re-evaluate every checkpoint and skip the cache.")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Learning curve .csv or .json (default: <run_dir>/learning_curve.csv).")
+    return parser.parse_args()
+
+
+def find_checkpoints(run_dir: Path) -> List[Tuple[int, Path]]:
+    """(timesteps, path) for every periodic checkpoint in the run's manifest, in training order."""
+    found = []
+    for record in load_manifest(run_dir).records():
+        if CHECKPOINT_PATTERN.search(record.name):
+            found.append((record.steps, Path(record.path)))
+    return sorted(found)
+
+
+def task_env_config(config_path: Path, rom: Path, state: Path, session_path: Path) -> Dict[str, Any]:
+    env_config = dict(json.loads(config_path.read_text()).get("env", {}))
+    env_config.update(
+        {
+            "gb_path": str(rom),
+            "init_state": str(state),
+            "session_path": session_path,
+            "headless": True,
+            "save_video": False,
+            "print_rewards": False,
+        }
+    )
+    return env_config
+
+
+def curve_row(config_name: str, timesteps: int, checkpoint: Path, result: Dict[str, Any], cached: bool):
+    return {
+        "config": config_name,
+        "timesteps": timesteps,
+        "checkpoint": str(checkpoint),
+        "n_episodes": result["n_episodes"],
+        "mean_return": result["mean_return"],
+        "std_return": result["std_return"],
+        "success_rate": result["success_rate"],
+        "mean_length": result["mean_length"],
+        "cached": cached,
+    }
+
+
+def write_curve(rows: List[Dict[str, Any]], path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".json":
+        path.write_text(json.dumps(rows, indent=2))
+        return
+    with path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CURVE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    args = parse_args()
+    if not args.run_dir.is_dir():
+        print(f"Error: Run directory not found at {args.run_dir}")
+        sys.exit(1)
+    for path, label in [(args.rom, "ROM"), (args.state, "State file"), *[(c, "Config") for c in args.config]]:
+        if not path.exists():
+            print(f"Error: {label} not found at {path}")
+            sys.exit(1)
+
+    checkpoints = find_checkpoints(args.run_dir)
+    if not checkpoints:
+        print(f"Error: No poke_<steps>_steps.zip checkpoints in {args.run_dir}")
+        sys.exit(1)
+
+    cache = None if args.no_cache else EvalCache(args.cache_dir)
+    session_path = args.run_dir / "sweep_session"
+    rows: List[Dict[str, Any]] = []
+    pending = []
+    for config_path in args.config:
+        env_config = task_env_config(config_path, args.rom, args.state, session_path)
+        max_steps = args.max_steps or env_config.get("max_steps", 10000)
+        for timesteps, checkpoint in checkpoints:
+            key = eval_cache_key(
+                checkpoint, env_config, n_episodes=args.n_episodes, max_steps=max_steps, seed=args.seed
+            )
+            result = cache.get(key) if cache else None
+            if result is not None:
+                rows.append(curve_row(config_path.stem, timesteps, checkpoint, result, cached=True))
+            else:
+                pending.append((config_path.stem, timesteps, checkpoint, env_config, max_steps, key))
+
+    print(f"{len(checkpoints)} checkpoints x {len(args.config)} configs: "
+          f"{len(rows)} cached, {len(pending)} to evaluate on {args.workers} workers")
+    start_time = time.time()
+    if pending:
+        with ProcessPoolExecutor(
+            max_workers=min(args.workers, len(pending)),
+            mp_context=mp.get_context("spawn"),
+            initializer=init_single_thread,
+        ) as pool:
+            futures = {
+                pool.submit(evaluate_checkpoint, checkpoint, env_config, args.n_episodes, max_steps, args.seed):
+                    (config_name, timesteps, checkpoint, key)
+                for config_name, timesteps, checkpoint, env_config, max_steps, key in pending
+            }
+            for future in as_completed(futures):
+                config_name, timesteps, checkpoint, key = futures[future]
+                result = future.result()
+                # cache as results arrive so an interrupted sweep keeps its progress
+                if cache:
+                    cache.put(key, result)
+                rows.append(curve_row(config_name, timesteps, checkpoint, result, cached=False))
+                print(f"  [{config_name}] {timesteps:>12d} steps: return={result['mean_return']:.3f} "
+                      f"success={result['success_rate']*100:.0f}%")
+
+    rows.sort(key=lambda r: (r["config"], r["timesteps"]))
+    print(f"\n{'Config':24s} {'Timesteps':>12s} {'Return':>10s} {'± std':>8s} {'Success':>8s} {'Length':>8s}")
+    for row in rows:
+        print(f"{row['config']:24s} {row['timesteps']:12d} {row['mean_return']:10.3f} {row['std_return']:8.3f} "
+              f"{row['success_rate']*100:7.1f}% {row['mean_length']:8.1f}{'' if not row['cached'] else '  (cached)'}")
+
+    output = args.output or (args.run_dir / "learning_curve.csv")
+    write_curve(rows, output)
+    print(f"\nEvaluated {len(pending)} in {time.time() - start_time:.1f}s; learning curve saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
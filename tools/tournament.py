@@ -0,0 +1,223 @@
+"""
+Rank many checkpoints on a shared set of scenarios.
+
+Every checkpoint is rolled out on every scenario, where a scenario is a
+(start state, seed) pair. This gives an N x M matrix, evaluated on a process
+pool with the same rollout and cache as tools/compare_runs.py. Workers keep each
+policy they load, and tasks are queued checkpoint by checkpoint so a worker
+mostly reuses its policy. The leaderboard ranks checkpoints by the mean of
+``--rank-by`` and also reports each checkpoint's mean per-scenario rank and its
+head-to-head win rate on identical scenarios.
+
+Outputs (default runs/tournament_<timestamp>/): leaderboard.json (leaderboard +
+matrix), leaderboard.csv. serve_dashboard.py and ui_server.py serve the newest
+leaderboard at /api/leaderboard.
+
+Usage:
+    python tools/tournament.py --run runs/runA --run runs/runB --run runs/runC \\
+        --state init.state --state states/viridian.state --seeds 8 --workers 8
+    python tools/tournament.py --checkpoint a.zip --checkpoint b.zip --all-checkpoints --run runs/runA
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from compare_runs import METRICS, rollout_env_config, run_rollout, summarize
+from sweep_checkpoints import find_checkpoints
+from training.eval_cache import DEFAULT_CACHE_DIR, EvalCache, eval_cache_key
+from training.evaluation import init_single_thread
+
+LEADERBOARD_COLUMNS = ("rank", "name", "checkpoint", "score", "score_ci_low", "score_ci_high", "mean_rank", "win_rate")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rank N checkpoints on M (state, seed) scenarios.")
+    parser.add_argument("--checkpoint", type=Path, action="append", default=[], help="Checkpoint .zip (repeatable).")
+    parser.add_argument("--run", type=Path, action="append", default=[],
+                        help="Run directory; adds its latest poke_<steps>_steps.zip (repeatable).")
+    parser.add_argument("--all-checkpoints", action="store_true", help="With --run, add every checkpoint of the run.")
+    parser.add_argument("--rom", type=Path, default=Path("PokemonRed.gb"), help="Path to Pokemon Red ROM.")
+    parser.add_argument("--state", type=Path, action="append", default=None,
+                        help="Start savestate (repeatable; default: init.state).")
+    parser.add_argument("--steps", type=int, default=512, help="Steps per rollout.")
+    parser.add_argument("--seeds", type=int, default=4, help="Seeds per start state.")
+    parser.add_argument("--seed", type=int, default=0, help="Scenario seeds are seed + i.")
+    parser.add_argument("--deterministic", action="store_true", help="Greedy actions instead of sampling.")
+    parser.add_argument("--rank-by", choices=list(METRICS), default="total_reward", help="Metric to rank by.")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes for rollouts.")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level for the intervals.")
+    parser.add_argument("--output", type=Path, default=None, help="Directory to write the leaderboard.")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Evaluation result cache.")
+    parser.add_argument("--no-cache", action="store_true", help="Always roll out; skip the cache.")
+    return parser.parse_args()
+
+
+def collect_entrants(args) -> Dict[str, Path]:
+    """{display name: checkpoint}; names are <run>/<checkpoint stem>."""
+    entrants: Dict[str, Path] = {}
+    for checkpoint in args.checkpoint:
+        entrants[f"{checkpoint.parent.name}/{checkpoint.stem}"] = checkpoint
+    for run_dir in args.run:
+        found = find_checkpoints(run_dir)
+        for _, checkpoint in (found if args.all_checkpoints else found[-1:]):
+            entrants[f"{run_dir.name}/{checkpoint.stem}"] = checkpoint
+    return entrants
+
+
+def rank_entrants(
+    matrix: Dict[str, Dict[str, Dict[str, Any]]], metric: str, confidence: float
+) -> List[Dict[str, Any]]:
+    """Leaderboard rows from {name: {scenario: stats}}, best first."""
+    names = list(matrix)
+    scenarios = sorted(next(iter(matrix.values())))
+    scores = np.array([[matrix[n][s][metric] for s in scenarios] for n in names], dtype=np.float64)
+    # per-scenario ranks (1 = best, ties share the average rank)
+    order = (-scores).argsort(axis=0).argsort(axis=0).astype(np.float64) + 1
+    for j in range(scores.shape[1]):
+        for value in np.unique(scores[:, j]):
+            tied = scores[:, j] == value
+            order[tied, j] = order[tied, j].mean()
+    wins = (scores[:, None, :] > scores[None, :, :]).sum(axis=(1, 2))
+    ties = (scores[:, None, :] == scores[None, :, :]).sum(axis=(1, 2)) - scores.shape[1]
+    matchups = max((len(names) - 1) * len(scenarios), 1)
+
+    rows = []
+    for i, name in enumerate(names):
+        summary = {m: summarize([matrix[name][s][m] for s in scenarios], confidence) for m in METRICS}
+        rows.append(
+            {
+                "name": name,
+                "score": summary[metric]["mean"],
+                "score_ci": summary[metric]["ci"],
+                "mean_rank": float(order[i].mean()),
+                "win_rate": float((wins[i] + 0.5 * ties[i]) / matchups),
+                "metrics": summary,
+            }
+        )
+    rows.sort(key=lambda r: (-r["score"], r["mean_rank"]))
+    for rank, row in enumerate(rows, start=1):
+        row["rank"] = rank
+    return rows
+
+
+def write_csv(rows: List[Dict[str, Any]], path: Path):
+    with path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=LEADERBOARD_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            ci = row["score_ci"] or [None, None]
+            writer.writerow(
+                {
+                    "rank": row["rank"],
+                    "name": row["name"],
+                    "checkpoint": row["checkpoint"],
+                    "score": row["score"],
+                    "score_ci_low": ci[0],
+                    "score_ci_high": ci[1],
+                    "mean_rank": row["mean_rank"],
+                    "win_rate": row["win_rate"],
+                }
+            )
+
+
+def main():
+    args = parse_args()
+    states = args.state or [Path("init.state")]
+    entrants = collect_entrants(args)
+    if len(entrants) < 2:
+        print("Error: Need at least two checkpoints (--checkpoint / --run)")
+        sys.exit(1)
+    required = [(args.rom, "ROM"), *[(s, "State file") for s in states], *[(c, "Checkpoint") for c in entrants.values()]]
+    for path, label in required:
+        if not path.exists():
+            print(f"Error: {label} not found at {path}")
+            sys.exit(1)
+
+    out_dir = args.output or Path("runs") / f"tournament_{int(time.time())}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cache = None if args.no_cache else EvalCache(args.cache_dir)
+
+    scenarios = [(state, args.seed + i) for state in states for i in range(args.seeds)]
+    matrix: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in entrants}
+    pending: List[Tuple[str, Path, Dict[str, Any], int, str, Any]] = []
+    for name, checkpoint in entrants.items():
+        for state, seed in scenarios:
+            scenario = f"{state.name}#{seed}"
+            env_config = rollout_env_config(args.rom, state, args.steps, out_dir / "session")
+            key = None
+            if cache is not None:
+                key = eval_cache_key(
+                    checkpoint, env_config, kind="compare_rollout", steps=args.steps,
+                    seed=seed, deterministic=args.deterministic,
+                )
+                stats = cache.get(key)
+                if stats is not None:
+                    matrix[name][scenario] = stats
+                    continue
+            pending.append((name, checkpoint, env_config, seed, scenario, key))
+
+    n_cached = len(entrants) * len(scenarios) - len(pending)
+    print(f"{len(entrants)} checkpoints x {len(scenarios)} scenarios: {n_cached} cached, "
+          f"{len(pending)} rollouts on {args.workers} workers")
+    start_time = time.time()
+    if pending:
+        with ProcessPoolExecutor(
+            max_workers=min(args.workers, len(pending)),
+            mp_context=mp.get_context("spawn"),
+            initializer=init_single_thread,
+        ) as pool:
+            # submitted checkpoint by checkpoint, so workers mostly reuse their loaded policy
+            futures = {
+                pool.submit(run_rollout, checkpoint, env_config, args.steps, seed, args.deterministic):
+                    (name, scenario, key)
+                for name, checkpoint, env_config, seed, scenario, key in pending
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                name, scenario, key = futures[future]
+                stats, screen, explore_map = future.result()
+                if cache is not None:
+                    cache.put(key, stats, {"screen": screen, "explore_map": explore_map})
+                matrix[name][scenario] = stats
+                if done % max(len(pending) // 20, 1) == 0 or done == len(pending):
+                    print(f"  {done}/{len(pending)} rollouts ({time.time() - start_time:.0f}s)")
+
+    rows = rank_entrants(matrix, args.rank_by, args.confidence)
+    for row in rows:
+        row["checkpoint"] = str(entrants[row["name"]])
+
+    print(f"\n{'Rank':>4s}  {'Checkpoint':40s} {args.rank_by:>16s} {'Mean rank':>10s} {'Win rate':>9s}")
+    for row in rows:
+        print(f"{row['rank']:4d}  {row['name']:40s} {row['score']:16.3f} {row['mean_rank']:10.2f} "
+              f"{row['win_rate']*100:8.1f}%")
+
+    leaderboard = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "rank_by": args.rank_by,
+        "states": [str(s) for s in states],
+        "seeds": args.seeds,
+        "steps": args.steps,
+        "deterministic": args.deterministic,
+        "confidence": args.confidence,
+        "leaderboard": rows,
+        "matrix": matrix,
+    }
+    (out_dir / "leaderboard.json").write_text(json.dumps(leaderboard, indent=2))
+    write_csv(rows, out_dir / "leaderboard.csv")
+    print(f"\nLeaderboard saved to: {out_dir / 'leaderboard.json'}")
+
+
+if __name__ == "__main__":
+    main()
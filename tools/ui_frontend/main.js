@@ -116,11 +116,37 @@ function renderCheckpoints(list) {
   list.forEach((ckpt) => {
     const div = document.createElement("div");
     const ts = new Date(ckpt.mtime * 1000).toLocaleString();
-    div.innerHTML = `<strong>${ckpt.name}</strong> — ${ts} — ${Math.round(ckpt.size / 1024)} KB`;
+    const score = ckpt.score === null || ckpt.score === undefined ? "" : ` — eval ${ckpt.score.toFixed(3)}`;
+    div.innerHTML = `<strong>${ckpt.name}</strong> — ${ts} — ${Math.round(ckpt.size / 1024)} KB${score}`;
     el.appendChild(div);
   });
 }
 
+async function refreshLeaderboard() {
+  const el = document.getElementById("leaderboard-list");
+  try {
+    const res = await fetch("/api/leaderboard");
+    if (!res.ok) return;
+    const board = await res.json();
+    el.innerHTML = "";
+    if (!board) {
+      setText("leaderboard-meta", "");
+      el.innerHTML = "<div class='muted'>No tournament yet (tools/tournament.py).</div>";
+      return;
+    }
+    setText("leaderboard-meta", `${board.created} — ranked by ${board.rank_by}, ${board.states.length} states x ${board.seeds} seeds`);
+    board.leaderboard.forEach((row) => {
+      const div = document.createElement("div");
+      div.innerHTML = `<strong>#${row.rank} ${row.name}</strong> — ${row.score.toFixed(3)}, mean rank ${row.mean_rank.toFixed(
+        2
+      )}, win rate ${percentFmt(row.win_rate)}`;
+      el.appendChild(div);
+    });
+  } catch (err) {
+    console.error("leaderboard refresh failed", err);
+  }
+}
+
 function renderLogs(stdoutLines, stderrLines) {
   document.getElementById("stdout-log").textContent = stdoutLines.join("\n");
   document.getElementById("stderr-log").textContent = stderrLines.join("\n");
@@ -161,3 +187,5 @@ stopBtn.addEventListener("click", stopRun);
 
 refreshStatus();
 setInterval(refreshStatus, 4000);
+refreshLeaderboard();
+setInterval(refreshLeaderboard, 30000);
@@ -16,6 +16,11 @@ from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field, validator
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from training.checkpoint_manifest import load_manifest
+
 RUNS_DIR = REPO_ROOT / "runs"
 FRONTEND_DIR = REPO_ROOT / "tools" / "ui_frontend"
 
@@ -210,12 +215,31 @@ def list_checkpoints(run_dir: Path) -> List[Dict[str, Any]]:
     if not run_dir.exists():
         return []
     results = []
-    for ckpt in sorted(run_dir.glob("*.zip")):
-        stat = ckpt.stat()
-        results.append({"path": str(ckpt), "name": ckpt.name, "mtime": stat.st_mtime, "size": stat.st_size})
+    for ckpt in load_manifest(run_dir).records():
+        results.append(
+            {
+                "path": ckpt.path,
+                "name": ckpt.name,
+                "mtime": ckpt.created,
+                "size": ckpt.size,
+                "steps": ckpt.steps,
+                "score": ckpt.score,
+                "sha256": ckpt.sha256,
+            }
+        )
     return list(reversed(results))
 
 
+def read_latest_leaderboard(runs_dir: Path) -> Optional[Dict[str, Any]]:
+    boards = sorted(runs_dir.glob("tournament_*/leaderboard.json"), key=lambda p: p.stat().st_mtime)
+    for path in reversed(boards):
+        board = read_status_file(path)
+        if board is not None:
+            board["path"] = str(path)
+            return board
+    return None
+
+
 app = FastAPI(title="Pokemon PPO Control Panel")
 app.add_middleware(
     CORSMiddleware,
@@ -302,6 +326,11 @@ def get_checkpoints(run: Optional[str] = None):
     return list_checkpoints(run_dir) if run_dir else []
 
 
+@app.get("/api/leaderboard")
+def get_leaderboard():
+    return read_latest_leaderboard(RUNS_DIR)
+
+
 def main():
     import uvicorn
 
@@ -0,0 +1,620 @@
+"""
+Actor/learner PPO: rollout collection overlapped with gradient updates.
+
+``model.learn`` alternates strictly: every env waits while PPO runs its epochs,
+and the learner waits while the envs play the next rollout. In actor/learner
+mode the envs live in ``ActorPool`` actor processes that keep stepping while
+``ActorLearnerPPO`` trains:
+
+- The learner publishes its weights to shared memory (``SharedWeights``: one
+  flat float32 tensor and a version counter) before it waits for each rollout.
+- Each actor plays ``n_steps`` with the newest published weights, picking up
+  a new version between steps, and ships the rollout with the behaviour
+  policy's log-probs and the weight version of every step.
+- Rollout ``k`` is consumed at version ``k``. An actor only starts rollout
+  ``k`` once version ``k - max_staleness`` is out, so no step is more than
+  ``max_staleness`` versions behind (1 by default: actors play rollout ``k + 1``
+  while the learner trains on rollout ``k``; 0 is synchronous PPO).
+
+Stale samples keep the PPO update correct the way decoupled PPO does (Hilton
+et al., 2021): the learner re-evaluates a rollout that has stale steps with
+its current weights (one no-grad forward pass) and uses those values and
+log-probs as PPO's "old" policy, so the ratio is clipped around the policy
+being updated rather than around weights the learner has already moved away
+from. Each sample's
+advantage is then weighted by the importance ratio current / behaviour,
+truncated at ``max_is_weight``. Advantages are normalized over the whole
+rollout before weighting (per-minibatch normalization would undo the
+weights). With no stale samples every weight is 1 and this is plain PPO.
+
+The learner logs ``actor_learner/*``: staleness (mean/max versions behind),
+the mean importance weight and the fraction truncated, and how long the
+learner waited for rollouts versus how long actors waited for weights.
+
+Callbacks see every rollout step replayed after it arrives (``infos``, ``dones``,
+``rewards`` and ``num_timesteps`` as in ``collect_rollouts``). ``get_attr`` on the
+pool asks the actors for live values; ``set_attr`` and ``env_method`` are not
+supported, so exact resume states cannot be captured in this mode.
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+import traceback
+from abc import abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch as th
+import torch.multiprocessing  # noqa: F401  (registers the shared-tensor pickler for pipes)
+from gymnasium import spaces
+from stable_baselines3 import PPO
+from stable_baselines3.common.utils import obs_as_tensor
+from stable_baselines3.common.vec_env import DummyVecEnv, VecEnv, VecMonitor, VecTransposeImage, is_vecenv_wrapped
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+DEFAULT_MAX_STALENESS = 1
+DEFAULT_MAX_IS_WEIGHT = 2.0
+
+
+def policy_tensors(policy: th.nn.Module) -> List[th.Tensor]:
+    """Parameters then buffers, in the order every copy of the same policy class lists them."""
+    tensors = list(policy.parameters()) + list(policy.buffers())
+    for tensor in tensors:
+        if not tensor.is_floating_point():
+            raise TypeError(f"Only floating-point policy tensors can be shared, got {tensor.dtype}")
+    return tensors
+
+
+def flatten_weights(policy: th.nn.Module) -> th.Tensor:
+    """All of ``policy``'s weights as one float32 CPU tensor."""
+    with th.no_grad():
+        return th.cat([t.detach().reshape(-1).to("cpu", th.float32) for t in policy_tensors(policy)])
+
+
+def load_weights(policy: th.nn.Module, flat: th.Tensor):
+    """Copy a ``flatten_weights`` tensor back into ``policy``."""
+    with th.no_grad():
+        offset = 0
+        for tensor in policy_tensors(policy):
+            n = tensor.numel()
+            tensor.copy_(flat[offset:offset + n].view_as(tensor))
+            offset += n
+
+
+class SharedWeights:
+    """
+    A policy's parameters in one shared float32 tensor, with a version counter.
+
+    ``publish`` (learner) and ``load_into`` (actors) hold ``lock``, a
+    ``multiprocessing.Condition`` that actors also wait on for new versions.
+    The lock is not pickled; processes attach their inherited one.
+    """
+
+    def __init__(self, policy: th.nn.Module, lock):
+        self.flat = th.zeros(sum(t.numel() for t in policy_tensors(policy)), dtype=th.float32).share_memory_()
+        self.version = th.full((1,), -1, dtype=th.int64).share_memory_()
+        self.lock = lock
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["lock"] = None
+        return state
+
+    def current(self) -> int:
+        return int(self.version[0])
+
+    def publish(self, policy: th.nn.Module) -> int:
+        """Copy ``policy``'s weights in and bump the version; returns the new version."""
+        flat = flatten_weights(policy)
+        with self.lock:
+            self.flat.copy_(flat)
+            self.version += 1
+            self.lock.notify_all()
+        return self.current()
+
+    def load_into(self, policy: th.nn.Module) -> int:
+        """Copy the published weights into ``policy``; returns their version."""
+        with self.lock:
+            load_weights(policy, self.flat)
+            return self.current()
+
+
+@dataclass
+class Rollout:
+    """One actor's ``n_steps`` x ``n_envs`` rollout, observations in the policy's layout."""
+
+    observations: Dict[str, np.ndarray]
+    actions: np.ndarray
+    rewards: np.ndarray
+    episode_starts: np.ndarray
+    values: np.ndarray
+    log_probs: np.ndarray
+    versions: np.ndarray
+    last_observation: Dict[str, np.ndarray]
+    last_dones: np.ndarray
+    infos: List[List[Tuple[int, Dict[str, Any]]]] = field(default_factory=list)
+    idle_seconds: float = 0.0
+    collect_seconds: float = 0.0
+
+
+def _serve_command(venv: VecEnv, conn, message: Tuple[Any, ...]):
+    if message[0] == "get_attr":
+        conn.send(venv.get_attr(message[1]))
+    elif message[0] == "env_is_wrapped":
+        conn.send(venv.env_is_wrapped(message[1]))
+
+
+def _command_loop(venv: VecEnv, conn, stop):
+    try:
+        while not stop.is_set():
+            message = conn.recv()
+            if message[0] == "close":
+                break
+            _serve_command(venv, conn, message)
+    except (EOFError, OSError):
+        pass
+    stop.set()
+
+
+def _actor_main(actor_id: int, env_fns: CloudpickleWrapper, conn, rollouts, cond, stop):
+    # the learner owns the CPU for its updates; each actor steps its envs on one thread
+    th.set_num_threads(1)
+    venv = None
+    try:
+        venv = VecMonitor(DummyVecEnv(env_fns.var))
+        conn.send((venv.observation_space, venv.action_space))
+        while True:
+            message = conn.recv()
+            if message[0] == "close":
+                return
+            if message[0] == "start":
+                break
+            _serve_command(venv, conn, message)
+        _, weights, options = message
+        weights.lock = cond
+        if options["transpose"]:
+            venv = VecTransposeImage(venv)
+        spec = options["policy_spec"]
+        policy = spec["policy_class"](
+            spec["observation_space"], spec["action_space"], lambda _: 0.0, **spec["policy_kwargs"]
+        )
+        policy.set_training_mode(False)
+        threading.Thread(target=_command_loop, args=(venv, conn, stop), name="actor-commands", daemon=True).start()
+        _collect(venv, policy, weights, rollouts, cond, stop, options)
+    except Exception:
+        rollouts.put(("error", traceback.format_exc()))
+    finally:
+        if venv is not None:
+            venv.close()
+
+
+def play_rollout(
+    venv: VecEnv,
+    policy,
+    obs: Dict[str, np.ndarray],
+    episode_starts: np.ndarray,
+    n_steps: int,
+    gamma: float,
+    refresh: Callable[[], int],
+    stop=None,
+) -> Optional[Rollout]:
+    """
+    Step ``venv`` for ``n_steps`` with ``policy``, starting from ``obs``.
+
+    ``refresh()`` runs before every step and returns the weight version the
+    policy holds (reloading it first, if it likes). The next rollout starts
+    from the returned one's ``last_observation`` and ``last_dones``. Returns
+    None if ``stop`` (an Event) is set part way.
+    """
+    n_envs = venv.num_envs
+    action_space = venv.action_space
+    started = time.perf_counter()
+    rollout = Rollout(
+        observations={
+            key: np.zeros((n_steps, n_envs, *space.shape), space.dtype)
+            for key, space in venv.observation_space.spaces.items()
+        },
+        actions=np.zeros((n_steps, n_envs, *action_space.shape), action_space.dtype),
+        rewards=np.zeros((n_steps, n_envs), np.float32),
+        episode_starts=np.zeros((n_steps, n_envs), np.float32),
+        values=np.zeros((n_steps, n_envs), np.float32),
+        log_probs=np.zeros((n_steps, n_envs), np.float32),
+        versions=np.zeros(n_steps, np.int64),
+        last_observation={},
+        last_dones=np.zeros(n_envs, np.float32),
+    )
+    for step in range(n_steps):
+        if stop is not None and stop.is_set():
+            return None
+        version = refresh()
+        with th.no_grad():
+            actions, values, log_probs = policy(obs_as_tensor(obs, policy.device))
+        actions = actions.cpu().numpy()
+        clipped_actions = actions
+        if isinstance(action_space, spaces.Box):
+            if policy.squash_output:
+                clipped_actions = policy.unscale_action(clipped_actions)
+            else:
+                clipped_actions = np.clip(actions, action_space.low, action_space.high)
+        new_obs, rewards, dones, infos = venv.step(clipped_actions)
+
+        finished = []
+        for idx, done in enumerate(dones):
+            if not done:
+                continue
+            terminal_obs = infos[idx].get("terminal_observation")
+            if terminal_obs is not None and infos[idx].get("TimeLimit.truncated", False):
+                # bootstrap timeouts with the behaviour value, as collect_rollouts does
+                with th.no_grad():
+                    terminal_value = policy.predict_values(policy.obs_to_tensor(terminal_obs)[0])[0]
+                rewards[idx] += gamma * terminal_value.item()
+            finished.append((idx, {k: v for k, v in infos[idx].items() if k != "terminal_observation"}))
+
+        for key in rollout.observations:
+            rollout.observations[key][step] = obs[key]
+        rollout.actions[step] = actions
+        rollout.rewards[step] = rewards
+        rollout.episode_starts[step] = episode_starts
+        rollout.values[step] = values.flatten().cpu().numpy()
+        rollout.log_probs[step] = log_probs.cpu().numpy()
+        rollout.versions[step] = version
+        rollout.infos.append(finished)
+        obs = new_obs
+        episode_starts = dones.astype(np.float32)
+
+    rollout.last_observation = {key: value.copy() for key, value in obs.items()}
+    rollout.last_dones = episode_starts.copy()
+    rollout.collect_seconds = time.perf_counter() - started
+    return rollout
+
+
+def _collect(venv: VecEnv, policy, weights: SharedWeights, rollouts, cond, stop, options: Dict[str, Any]):
+    loaded = [weights.load_into(policy)]
+
+    def refresh() -> int:
+        if weights.current() != loaded[0]:
+            loaded[0] = weights.load_into(policy)
+        return loaded[0]
+
+    obs = venv.reset()
+    episode_starts = np.ones(venv.num_envs, dtype=np.float32)
+    index = 0
+    while not stop.is_set():
+        idle_start = time.perf_counter()
+        with cond:
+            cond.wait_for(lambda: stop.is_set() or weights.current() >= index - options["max_staleness"])
+        idle_seconds = time.perf_counter() - idle_start
+        rollout = play_rollout(venv, policy, obs, episode_starts, options["n_steps"], options["gamma"], refresh, stop)
+        if rollout is None:
+            return
+        rollout.idle_seconds = idle_seconds
+        rollouts.put(("rollout", rollout))
+        obs, episode_starts = rollout.last_observation, rollout.last_dones
+        index += 1
+
+
+def _zeros(space: spaces.Space, n: int) -> Any:
+    if isinstance(space, spaces.Dict):
+        return {key: _zeros(sub, n) for key, sub in space.spaces.items()}
+    return np.zeros((n, *space.shape), dtype=space.dtype)
+
+
+class RolloutPool(VecEnv):
+    """
+    A ``VecEnv`` whose envs are stepped elsewhere, feeding ``ActorLearnerPPO``.
+
+    It is a ``VecEnv`` so PPO can size its buffer and wrap it
+    (``VecTransposeImage``), but ``step`` is not available and ``reset`` only
+    returns placeholder observations. Subclasses ship ``Rollout``s: ``gather``
+    returns rollouts whose env columns add up to ``num_envs``.
+    """
+
+    @property
+    @abstractmethod
+    def started(self) -> bool:
+        ...
+
+    @abstractmethod
+    def start(self, model: PPO, n_steps: int) -> int:
+        """Publish ``model``'s weights and start collecting ``n_steps``-step rollouts; returns the version."""
+
+    @abstractmethod
+    def publish(self, policy: th.nn.Module) -> int:
+        """Make ``policy``'s weights the newest version; returns it."""
+
+    @abstractmethod
+    def gather(self) -> List[Rollout]:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        """Extra ``logger.record`` values for the update that consumed the last ``gather``."""
+        return {}
+
+    def reset(self):
+        return _zeros(self.observation_space, self.num_envs)
+
+    def step_async(self, actions: np.ndarray) -> None:
+        raise NotImplementedError(f"{type(self).__name__} envs are stepped elsewhere; train with ActorLearnerPPO")
+
+    def step_wait(self):
+        raise NotImplementedError(f"{type(self).__name__} envs are stepped elsewhere; train with ActorLearnerPPO")
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        if attr_name == "render_mode":  # asked by VecEnv.__init__
+            return [None] * len(self._get_indices(indices))
+        raise NotImplementedError(f"{type(self).__name__} envs cannot be inspected from the learner")
+
+    def set_attr(self, attr_name: str, value: Any, indices=None) -> None:
+        raise NotImplementedError(f"{type(self).__name__} envs cannot be modified from the learner")
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List[Any]:
+        raise NotImplementedError(f"{type(self).__name__} envs cannot be called from the learner")
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False] * len(self._get_indices(indices))
+
+
+class ActorPool(RolloutPool):
+    """
+    ``num_actors`` processes stepping ``len(env_fns)`` envs for ``ActorLearnerPPO``.
+
+    Env ``i`` runs in actor ``i // (len(env_fns) // num_actors)``, so the learner's
+    rollout buffer columns line up with the actors.
+    """
+
+    def __init__(self, env_fns: Sequence, num_actors: int):
+        if num_actors < 1 or len(env_fns) % num_actors:
+            raise ValueError(f"{len(env_fns)} envs do not split evenly over {num_actors} actors")
+        self.num_actors = num_actors
+        self.envs_per_actor = len(env_fns) // num_actors
+        ctx = mp.get_context("spawn")
+        self._cond = ctx.Condition()
+        self._stop = ctx.Event()
+        self._conns = []
+        self._queues = []
+        self._processes = []
+        for actor in range(num_actors):
+            conn, child_conn = ctx.Pipe()
+            rollouts = ctx.Queue()
+            fns = env_fns[actor * self.envs_per_actor:(actor + 1) * self.envs_per_actor]
+            process = ctx.Process(
+                target=_actor_main,
+                args=(actor, CloudpickleWrapper(list(fns)), child_conn, rollouts, self._cond, self._stop),
+                name=f"actor-{actor}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._conns.append(conn)
+            self._queues.append(rollouts)
+            self._processes.append(process)
+        spaces_by_actor = [self._recv(actor) for actor in range(num_actors)]
+        self.weights: Optional[SharedWeights] = None
+        self.rollouts_consumed = 0
+        self.closed = False
+        super().__init__(len(env_fns), *spaces_by_actor[0])
+
+    def _recv(self, actor: int) -> Any:
+        try:
+            return self._conns[actor].recv()
+        except EOFError:
+            message = self._queues[actor].get(timeout=5) if not self._queues[actor].empty() else None
+            detail = f":\n{message[1]}" if message and message[0] == "error" else ""
+            raise RuntimeError(f"Actor {actor} exited (code {self._processes[actor].exitcode}){detail}") from None
+
+    @property
+    def started(self) -> bool:
+        return self.weights is not None
+
+    def start(self, model: PPO, n_steps: int) -> int:
+        self.weights = SharedWeights(model.policy, self._cond)
+        version = self.weights.publish(model.policy)
+        options = {
+            "policy_spec": {
+                "policy_class": model.policy_class,
+                "policy_kwargs": model.policy_kwargs,
+                "observation_space": model.observation_space,
+                "action_space": model.action_space,
+            },
+            "transpose": is_vecenv_wrapped(model.env, VecTransposeImage),
+            "n_steps": n_steps,
+            "gamma": model.gamma,
+            "max_staleness": model.max_staleness,
+        }
+        for conn in self._conns:
+            conn.send(("start", self.weights, options))
+        return version
+
+    def publish(self, policy: th.nn.Module) -> int:
+        return self.weights.publish(policy)
+
+    def gather(self) -> List[Rollout]:
+        """The next rollout of every actor, in actor order."""
+        rollouts = []
+        for actor, rollout_queue in enumerate(self._queues):
+            while True:
+                try:
+                    message = rollout_queue.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    if not self._processes[actor].is_alive():
+                        raise RuntimeError(f"Actor {actor} exited with code {self._processes[actor].exitcode}")
+            if message[0] == "error":
+                raise RuntimeError(f"Actor {actor} failed:\n{message[1]}")
+            rollouts.append(message[1])
+        self.rollouts_consumed += 1
+        return rollouts
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for conn in self._conns:
+            try:
+                conn.send(("close",))
+            except OSError:
+                pass
+        for actor, process in enumerate(self._processes):
+            # keep draining so an actor blocked flushing a rollout can exit
+            deadline = time.monotonic() + 10
+            while process.is_alive() and time.monotonic() < deadline:
+                try:
+                    while True:
+                        self._queues[actor].get_nowait()
+                except queue.Empty:
+                    pass
+                process.join(timeout=0.1)
+            if process.is_alive():
+                process.terminate()
+
+    def _ask(self, message: Tuple[Any, ...], indices) -> List[Any]:
+        results = []
+        for actor, conn in enumerate(self._conns):
+            conn.send(message)
+            results.extend(self._recv(actor))
+        return [results[i] for i in self._get_indices(indices)]
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        return self._ask(("get_attr", attr_name), indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return self._ask(("env_is_wrapped", wrapper_class), indices)
+
+
+class ActorLearnerPPO(PPO):
+    """
+    PPO that trains on rollouts from a ``RolloutPool`` while its actors collect the next ones.
+
+    ``max_staleness`` is how many weight versions a rollout step may lag the
+    update that trains on it; ``max_is_weight`` truncates the per-sample
+    importance weight (current / behaviour policy).
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        max_staleness: int = DEFAULT_MAX_STALENESS,
+        max_is_weight: float = DEFAULT_MAX_IS_WEIGHT,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        if max_staleness < 0:
+            raise ValueError("max_staleness must be >= 0")
+        self.max_staleness = max_staleness
+        self.max_is_weight = max_is_weight
+
+    def collect_rollouts(self, env: VecEnv, callback, rollout_buffer, n_rollout_steps: int) -> bool:
+        pool = env.unwrapped
+        if not isinstance(pool, RolloutPool):
+            raise TypeError("ActorLearnerPPO collects rollouts from a RolloutPool env (ActorPool, RemoteActorPool)")
+        if self.use_sde:
+            raise ValueError("ActorLearnerPPO does not support gSDE (use_sde)")
+        self.policy.set_training_mode(False)
+        if not pool.started:
+            version = pool.start(self, n_rollout_steps)
+        else:
+            version = pool.publish(self.policy)
+
+        callback.on_rollout_start()
+        wait_start = time.perf_counter()
+        rollouts = pool.gather()
+        learner_wait = time.perf_counter() - wait_start
+
+        rollout_buffer.reset()
+        offsets = np.cumsum([0] + [rollout.rewards.shape[1] for rollout in rollouts])
+        versions = np.concatenate([np.repeat(r.versions[:, None], r.rewards.shape[1], axis=1) for r in rollouts], axis=1)
+        for offset, rollout in zip(offsets, rollouts):
+            width = rollout.rewards.shape[1]
+            columns = slice(offset, offset + width)
+            for key, value in rollout.observations.items():
+                rollout_buffer.observations[key][:, columns] = value
+            rollout_buffer.actions[:, columns] = rollout.actions.reshape(n_rollout_steps, width, -1)
+            rollout_buffer.rewards[:, columns] = rollout.rewards
+            rollout_buffer.episode_starts[:, columns] = rollout.episode_starts
+            rollout_buffer.values[:, columns] = rollout.values
+            rollout_buffer.log_probs[:, columns] = rollout.log_probs
+        rollout_buffer.pos = rollout_buffer.buffer_size
+        rollout_buffer.full = True
+        last_obs = {key: np.concatenate([r.last_observation[key] for r in rollouts]) for key in rollouts[0].last_observation}
+        last_dones = np.concatenate([rollout.last_dones for rollout in rollouts])
+
+        # replay the steps for callbacks, as collect_rollouts would have seen them
+        for step in range(n_rollout_steps):
+            infos: List[Dict[str, Any]] = [{} for _ in range(env.num_envs)]
+            for offset, rollout in zip(offsets, rollouts):
+                for idx, info in rollout.infos[step]:
+                    infos[offset + idx] = info
+            dones = rollout_buffer.episode_starts[step + 1] if step + 1 < n_rollout_steps else last_dones
+            rewards = rollout_buffer.rewards[step]
+            self.num_timesteps += env.num_envs
+            callback.update_locals(locals())
+            if not callback.on_step():
+                return False
+            self._update_info_buffer(infos, dones.astype(bool))
+
+        # the "old" policy for PPO's clipped ratio is the learner's, not the stale behaviour policy
+        staleness = version - versions
+        behaviour_log_probs = rollout_buffer.log_probs.copy()
+        if staleness.any():
+            rollout_buffer.values[:], rollout_buffer.log_probs[:] = self._evaluate_buffer(rollout_buffer)
+        with th.no_grad():
+            last_values = self.policy.predict_values(obs_as_tensor(last_obs, self.device))
+        rollout_buffer.compute_returns_and_advantage(last_values=last_values, dones=last_dones)
+
+        raw_weights = np.exp(rollout_buffer.log_probs - behaviour_log_probs)
+        is_weights = np.minimum(raw_weights, self.max_is_weight)
+        advantages = rollout_buffer.advantages
+        if self.normalize_advantage and advantages.size > 1:
+            advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-8)
+        rollout_buffer.advantages = (advantages * is_weights).astype(np.float32)
+
+        self.logger.record("actor_learner/policy_version", version)
+        self.logger.record("actor_learner/staleness_mean", float(staleness.mean()))
+        self.logger.record("actor_learner/staleness_max", int(staleness.max()))
+        self.logger.record("actor_learner/is_weight_mean", float(is_weights.mean()))
+        self.logger.record("actor_learner/is_weight_truncated", float((raw_weights > self.max_is_weight).mean()))
+        self.logger.record("actor_learner/learner_wait_s", learner_wait)
+        self.logger.record("actor_learner/actor_idle_s", float(np.mean([r.idle_seconds for r in rollouts])))
+        self.logger.record("actor_learner/actor_collect_s", float(np.mean([r.collect_seconds for r in rollouts])))
+        for key, value in pool.stats().items():
+            self.logger.record(key, value)
+
+        callback.update_locals(locals())
+        callback.on_rollout_end()
+        return True
+
+    def _evaluate_buffer(self, rollout_buffer) -> Tuple[np.ndarray, np.ndarray]:
+        """Values and log-probs of the buffer's actions under the current policy."""
+        n_steps, n_envs = rollout_buffer.buffer_size, rollout_buffer.n_envs
+        chunk = max(self.batch_size // n_envs, 1)
+        values = np.zeros((n_steps, n_envs), dtype=np.float32)
+        log_probs = np.zeros((n_steps, n_envs), dtype=np.float32)
+        with th.no_grad():
+            for start in range(0, n_steps, chunk):
+                stop = min(start + chunk, n_steps)
+                obs = {
+                    key: th.as_tensor(value[start:stop].reshape(-1, *value.shape[2:]), device=self.device)
+                    for key, value in rollout_buffer.observations.items()
+                }
+                actions = th.as_tensor(rollout_buffer.actions[start:stop].reshape(-1, rollout_buffer.action_dim), device=self.device)
+                if isinstance(self.action_space, spaces.Discrete):
+                    actions = actions.long().flatten()
+                step_values, step_log_probs, _ = self.policy.evaluate_actions(obs, actions)
+                values[start:stop] = step_values.flatten().cpu().numpy().reshape(stop - start, n_envs)
+                log_probs[start:stop] = step_log_probs.cpu().numpy().reshape(stop - start, n_envs)
+        return values, log_probs
+
+    def train(self) -> None:
+        # advantages were normalized over the whole rollout before importance weighting
+        normalize_advantage = self.normalize_advantage
+        self.normalize_advantage = False
+        try:
+            super().train()
+        finally:
+            self.normalize_advantage = normalize_advantage
@@ -0,0 +1,241 @@
+"""
+Periodic evaluation in a long-lived background process.
+
+``AsyncEvalCallback`` keeps training running while an eval worker plays the
+episodes. At each eval point the callback sends a weights-only snapshot of the
+policy (its ``state_dict`` as numpy arrays) to the worker, which builds its own
+policy and env(s) once at startup. Finished results come back over a queue and
+are polled on the training thread, which appends them to ``eval.jsonl`` and
+forwards them to ``StatusWriterCallback`` exactly like ``PeriodicEvalCallback``.
+
+``timesteps_when_ran`` is the step count of the snapshot; ``timesteps_when_logged``
+is where training had got to when the result arrived. If an eval point comes
+while the worker is still busy, the ``"skip"`` overlap policy drops it and the
+``"queue"`` policy sends the snapshot anyway so the worker runs it next.
+"""
+
+import multiprocessing as mp
+import queue
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+from training.checkpointing import AsyncCheckpointCallback
+from training.eval_stopping import StoppingRule
+from training.evaluation import run_batched_episodes
+from training.status_tracking import StatusWriterCallback, append_jsonl, eval_result_from_records
+
+OVERLAP_POLICIES = ("skip", "queue")
+
+
+def _eval_worker(
+    requests,
+    results,
+    policy_spec: Dict[str, Any],
+    env_config: Dict[str, Any],
+    stream_metadata: Optional[Dict[str, Any]],
+    num_envs: int,
+    episodes: int,
+    max_steps: Optional[int],
+    base_seed: int,
+    stopping: Optional[StoppingRule],
+):
+    import torch
+
+    from env.red_gym_env import RedGymEnv
+
+    # the learner owns the CPU; the eval worker stays on one thread
+    torch.set_num_threads(1)
+
+    def make_env():
+        env = RedGymEnv(env_config)
+        if stream_metadata is not None:
+            from env.stream_agent_wrapper import StreamWrapper
+
+            return StreamWrapper(env, stream_metadata=stream_metadata)
+        return env
+
+    envs = [make_env() for _ in range(num_envs)]
+    policy = policy_spec["policy_class"](
+        policy_spec["observation_space"],
+        policy_spec["action_space"],
+        lambda _: 0.0,
+        **policy_spec["policy_kwargs"],
+    )
+    policy.set_training_mode(False)
+
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            timesteps, state = request
+            started = time.time()
+            try:
+                policy.load_state_dict({key: torch.as_tensor(value) for key, value in state.items()})
+                records = run_batched_episodes(
+                    policy,
+                    envs,
+                    n_episodes=episodes,
+                    max_steps=max_steps,
+                    base_seed=base_seed,
+                    deterministic=True,
+                    should_stop=stopping.check if stopping else None,
+                )
+                result = eval_result_from_records(records, timesteps, started)
+                if stopping:
+                    result.update(stopping.summary(records, episodes))
+                result["eval_seconds"] = time.time() - started
+                results.put(("result", result))
+            except Exception as exc:
+                results.put(("error", timesteps, repr(exc)))
+    finally:
+        for env in envs:
+            try:
+                env.close()
+            except Exception:
+                pass
+
+
+class AsyncEvalCallback(BaseCallback):
+    """
+    Runs deterministic evaluations in a background process and logs results to JSONL.
+
+    Takes the eval env config rather than a factory so the worker (a spawned
+    process) can build its own envs; ``stream_metadata`` wraps them in
+    ``StreamWrapper``. ``checkpoint_callback`` works as in ``PeriodicEvalCallback``:
+    the snapshot sent to the worker is also checkpointed.
+    """
+
+    def __init__(
+        self,
+        eval_env_config: Dict[str, Any],
+        eval_log_path: Path,
+        eval_every_steps: Optional[int],
+        eval_episodes: int,
+        eval_max_steps: Optional[int],
+        status_callback: Optional[StatusWriterCallback],
+        base_eval_seed: int = 0,
+        eval_num_envs: int = 1,
+        overlap: str = "skip",
+        stream_metadata: Optional[Dict[str, Any]] = None,
+        stopping: Optional[StoppingRule] = None,
+        checkpoint_callback: Optional[AsyncCheckpointCallback] = None,
+        verbose: int = 0,
+    ):
+        super().__init__(verbose)
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown eval overlap policy: {overlap}. Available: {list(OVERLAP_POLICIES)}")
+        self.eval_env_config = eval_env_config
+        self.eval_log_path = eval_log_path
+        self.eval_every_steps = eval_every_steps
+        self.eval_episodes = max(eval_episodes, 1)
+        self.eval_max_steps = eval_max_steps
+        self.status_callback = status_callback
+        self.base_eval_seed = base_eval_seed
+        self.eval_num_envs = max(min(eval_num_envs, self.eval_episodes), 1)
+        self.overlap = overlap
+        self.stream_metadata = stream_metadata
+        self.stopping = stopping
+        self.checkpoint_callback = checkpoint_callback
+
+        self.evals_skipped = 0
+        self._last_eval_step: int = 0
+        self._in_flight: int = 0
+        self._process = None
+        self._requests = None
+        self._results = None
+
+    def _on_training_start(self) -> None:
+        if not self.eval_every_steps:
+            return
+        ctx = mp.get_context("spawn")
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        policy_spec = {
+            "policy_class": self.model.policy_class,
+            "policy_kwargs": self.model.policy_kwargs,
+            "observation_space": self.model.observation_space,
+            "action_space": self.model.action_space,
+        }
+        self._process = ctx.Process(
+            target=_eval_worker,
+            args=(
+                self._requests,
+                self._results,
+                policy_spec,
+                self.eval_env_config,
+                self.stream_metadata,
+                self.eval_num_envs,
+                self.eval_episodes,
+                self.eval_max_steps,
+                self.base_eval_seed,
+                self.stopping,
+            ),
+            name="async-eval",
+            daemon=True,
+        )
+        self._process.start()
+
+    def _on_step(self) -> bool:
+        if self._process is None:
+            return True
+        self._poll_results(block=False)
+        if (self.num_timesteps - self._last_eval_step) < self.eval_every_steps:
+            return True
+
+        self._last_eval_step = self.num_timesteps
+        if not self._process.is_alive():
+            return True
+        if self._in_flight and self.overlap == "skip":
+            self.evals_skipped += 1
+            if self.verbose:
+                print(f"[eval] worker busy; skipped eval at {self.num_timesteps} steps")
+            return True
+        if self.checkpoint_callback:
+            self.checkpoint_callback.save_now()
+        self._requests.put((int(self.num_timesteps), self._policy_snapshot()))
+        self._in_flight += 1
+        return True
+
+    def _on_training_end(self) -> None:
+        if self._process is None:
+            return
+        # let queued evals finish so the last snapshot is logged
+        self._poll_results(block=True)
+        self._requests.put(None)
+        self._process.join(timeout=30)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    def _policy_snapshot(self) -> Dict[str, Any]:
+        # copied so the learner can keep updating its tensors while the queue pickles these
+        return {key: value.detach().cpu().numpy().copy() for key, value in self.model.policy.state_dict().items()}
+
+    def _poll_results(self, block: bool):
+        while self._in_flight:
+            try:
+                message = self._results.get(timeout=1.0) if block else self._results.get_nowait()
+            except queue.Empty:
+                if not self._process.is_alive():
+                    print(f"[eval] worker exited (code {self._process.exitcode}); dropping {self._in_flight} pending evals")
+                    self._in_flight = 0
+                    return
+                if block:
+                    continue
+                return
+            self._in_flight -= 1
+            if message[0] == "error":
+                if self.verbose:
+                    print(f"[eval] failed at {message[1]} steps: {message[2]}")
+                continue
+            result = message[1]
+            result["timesteps_when_logged"] = int(self.num_timesteps)
+            append_jsonl(self.eval_log_path, result)
+            if self.status_callback:
+                self.status_callback.record_eval_result(result)
+            if self.checkpoint_callback:
+                self.checkpoint_callback.record_eval_result(result)
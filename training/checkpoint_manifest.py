@@ -0,0 +1,252 @@
+"""
+Per-run checkpoint index: ``<run_dir>/checkpoints.jsonl``.
+
+The checkpoint writer appends one JSON event per line instead of tools
+globbing and stat-ing every zip:
+
+    {"event": "add", "file": "poke_81920_steps.zip", "steps": 81920, "size": ..., "sha256": ..., "created": ...}
+    {"event": "score", "file": "poke_81920_steps.zip", "score": 12.5, "metric": "mean_reward"}
+    {"event": "remove", "file": "poke_40960_steps.zip"}
+
+``resume_state`` names the checkpoint's exact-resume sidecar
+(training/resume_state.py), if it has one.
+
+``CheckpointManifest.records`` folds the events into the current checkpoint
+list (re-parsed only when the file changes), so "latest" and "best" lookups
+read a single file. A run without a manifest (older runs, or checkpoints copied
+in by hand) is indexed once by ``load_manifest``, which scans its ``*.zip`` files
+and writes the manifest. Rebuilt entries have no hash or score; deleting
+``checkpoints.jsonl`` forces a rescan.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+MANIFEST_NAME = "checkpoints.jsonl"
+STEPS_PATTERN = re.compile(r"_(\d+)_steps\.zip$")
+RESUME_SUFFIX = ".resume.pkl"
+
+# manifest path -> ((size, mtime_ns), records)
+_folded: Dict[str, Tuple[Tuple[int, int], List["CheckpointRecord"]]] = {}
+
+
+@dataclass
+class CheckpointRecord:
+    steps: Optional[int]
+    path: str
+    periodic: bool = True
+    score: Optional[float] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    created: Optional[float] = None
+    resume_state: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return Path(self.path).name
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "steps": self.steps,
+            "path": self.path,
+            "periodic": self.periodic,
+            "score": self.score,
+            "size": self.size,
+            "sha256": self.sha256,
+            "created": self.created,
+            "resume_state": self.resume_state,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CheckpointRecord":
+        return cls(
+            steps=data.get("steps"),
+            path=data["path"],
+            periodic=data.get("periodic", True),
+            score=data.get("score"),
+            size=data.get("size"),
+            sha256=data.get("sha256"),
+            created=data.get("created"),
+            resume_state=data.get("resume_state"),
+        )
+
+
+def checkpoint_steps(path: Path) -> Optional[int]:
+    match = STEPS_PATTERN.search(Path(path).name)
+    return int(match.group(1)) if match else None
+
+
+class CheckpointManifest:
+    """Append-only checkpoint events for one run directory."""
+
+    def __init__(self, run_dir: Path):
+        self.run_dir = Path(run_dir)
+        self.path = self.run_dir / MANIFEST_NAME
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def records(self) -> List[CheckpointRecord]:
+        """Current checkpoints, oldest first."""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return []
+        version = (stat.st_size, stat.st_mtime_ns)
+        cached = _folded.get(str(self.path))
+        if cached is not None and cached[0] == version:
+            return [replace(r) for r in cached[1]]
+        records: Dict[str, CheckpointRecord] = {}
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut off by a crash
+                name = event.get("file")
+                if event.get("event") == "add":
+                    records.pop(name, None)
+                    records[name] = CheckpointRecord(
+                        steps=event.get("steps"),
+                        path=str(self.run_dir / name),
+                        periodic=event.get("periodic", True),
+                        size=event.get("size"),
+                        sha256=event.get("sha256"),
+                        created=event.get("created"),
+                        resume_state=str(self.run_dir / event["resume_state"]) if event.get("resume_state") else None,
+                    )
+                elif event.get("event") == "score" and name in records:
+                    records[name].score = event.get("score")
+                elif event.get("event") == "remove":
+                    records.pop(name, None)
+        folded = list(records.values())
+        _folded[str(self.path)] = (version, folded)
+        return [replace(r) for r in folded]
+
+    def add(
+        self,
+        path: Path,
+        steps: Optional[int],
+        periodic: bool = True,
+        sha256: bool = True,
+        resume_state: Optional[Path] = None,
+    ) -> CheckpointRecord:
+        """Index a checkpoint that has just been written."""
+        path = Path(path)
+        stat = path.stat()
+        digest = None
+        if sha256:
+            from training.eval_cache import file_sha256
+
+            digest = file_sha256(path)
+        self._append(
+            {
+                "event": "add",
+                "file": path.name,
+                "steps": steps,
+                "periodic": periodic,
+                "size": stat.st_size,
+                "sha256": digest,
+                "created": stat.st_mtime,
+                "resume_state": Path(resume_state).name if resume_state else None,
+            }
+        )
+        return CheckpointRecord(
+            steps=steps,
+            path=str(path),
+            periodic=periodic,
+            size=stat.st_size,
+            sha256=digest,
+            created=stat.st_mtime,
+            resume_state=str(resume_state) if resume_state else None,
+        )
+
+    def set_score(self, path: Path, score: float, metric: str):
+        self._append({"event": "score", "file": Path(path).name, "score": score, "metric": metric})
+
+    def remove(self, path: Path):
+        self._append({"event": "remove", "file": Path(path).name})
+
+    def latest(self, resumable: bool = False) -> Optional[CheckpointRecord]:
+        """Most recently written checkpoint whose file still exists (and, if ``resumable``, its resume state)."""
+        for record in sorted(self.records(), key=lambda r: r.created or 0.0, reverse=True):
+            if resumable and not (record.resume_state and Path(record.resume_state).exists()):
+                continue
+            if Path(record.path).exists():
+                return record
+        return None
+
+    def best(self) -> Optional[CheckpointRecord]:
+        """Highest-scored checkpoint whose file still exists."""
+        scored = [r for r in self.records() if r.score is not None]
+        for record in sorted(scored, key=lambda r: (r.score, r.steps or 0), reverse=True):
+            if Path(record.path).exists():
+                return record
+        return None
+
+    def rebuild(self) -> List[CheckpointRecord]:
+        """Re-index the run's ``*.zip`` files, replacing the manifest (no hashes)."""
+        lines = []
+        for path in sorted(self.run_dir.glob("*.zip"), key=lambda p: p.stat().st_mtime):
+            stat = path.stat()
+            steps = checkpoint_steps(path)
+            sidecar = path.with_name(path.stem + RESUME_SUFFIX)
+            lines.append(
+                json.dumps(
+                    {
+                        "event": "add",
+                        "file": path.name,
+                        "steps": steps,
+                        "periodic": steps is not None,
+                        "size": stat.st_size,
+                        "sha256": None,
+                        "created": stat.st_mtime,
+                        "resume_state": sidecar.name if sidecar.exists() else None,
+                    }
+                )
+            )
+        # runs without checkpoints get an empty manifest too, so they are not rescanned
+        if lines or (self.run_dir / "metadata.json").exists():
+            with self._lock:
+                tmp = self.path.with_suffix(".jsonl.tmp")
+                tmp.write_text("".join(line + os.linesep for line in lines), encoding="utf-8")
+                tmp.replace(self.path)
+        return self.records()
+
+    def _append(self, event: Dict[str, Any]):
+        event.setdefault("time", time.time())
+        with self._lock:
+            self.run_dir.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + os.linesep)
+
+
+def load_manifest(run_dir: Path) -> CheckpointManifest:
+    """Manifest for ``run_dir``, built from a one-time scan if it has none yet."""
+    manifest = CheckpointManifest(run_dir)
+    if not manifest.exists() and manifest.run_dir.is_dir():
+        manifest.rebuild()
+    return manifest
+
+
+def find_latest_checkpoint(root: Path) -> Optional[Tuple[Path, float]]:
+    """(path, age in hours) of the newest checkpoint in ``root`` or any run directly under it."""
+    root = Path(root)
+    if not root.is_dir():
+        return None
+    candidates = [load_manifest(root).latest()]
+    for run_dir in root.iterdir():
+        if run_dir.is_dir():
+            candidates.append(load_manifest(run_dir).latest())
+    candidates = [c for c in candidates if c is not None]
+    if not candidates:
+        return None
+    latest = max(candidates, key=lambda r: r.created or 0.0)
+    return Path(latest.path), (time.time() - (latest.created or time.time())) / 3600
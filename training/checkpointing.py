@@ -0,0 +1,314 @@
+"""
+Periodic checkpoints written off the training thread, with retention.
+
+``AsyncCheckpointCallback`` replaces SB3's ``CheckpointCallback`` (same
+``save_freq`` in env-step calls and the same ``poke_<steps>_steps.zip`` names).
+At each save point it snapshots the model into memory (see training/policy_io.py).
+A writer thread then serializes the snapshot, renames it into place and applies
+the ``RetentionPolicy``, recording each write, score and removal in the run's
+``checkpoints.jsonl`` (training/checkpoint_manifest.py). With ``weights_freq`` it also writes weights-only
+``weights/poke_<steps>_steps.pt`` files at that cadence, keeping the newest
+``keep_weights``.
+
+With ``resume_states`` each periodic checkpoint also gets a
+``poke_<steps>_steps.resume.pkl`` sidecar (training/resume_state.py) holding the
+env savestates, VecMonitor counters and RNG states. That state is only
+consistent between rollouts, so a periodic save that falls due mid-rollout is
+taken at the start of the next rollout (or at training end).
+
+Best-by-eval retention needs a checkpoint of every evaluated policy. The eval
+callbacks call ``save_now`` when they start an eval and ``record_eval_result``
+when the result arrives, the same way they report to the status writer.
+"""
+
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+from training.checkpoint_manifest import CheckpointRecord, load_manifest
+from training.policy_io import ModelSnapshot, snapshot_model, write_model_zip, write_policy_weights
+from training.resume_state import capture_training_state, resume_state_path, write_training_state
+
+CHECKPOINT_PATTERN = re.compile(r"poke_(\d+)_steps\.(zip|pt)$")
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Which checkpoint zips to keep; with every field unset all are kept.
+
+    keep_last: newest N periodic checkpoints.
+    keep_every: every Kth periodic checkpoint (by save index, so 0, K, 2K, ...).
+    keep_best: N checkpoints with the highest eval ``best_metric``.
+    """
+
+    keep_last: Optional[int] = None
+    keep_every: Optional[int] = None
+    keep_best: int = 0
+    best_metric: str = "mean_reward"
+
+    def __post_init__(self):
+        for name in ("keep_last", "keep_every"):
+            value = getattr(self, name)
+            if value is not None and value < 1:
+                raise ValueError(f"{name} must be >= 1 when set")
+        if self.keep_best < 0:
+            raise ValueError("keep_best must be >= 0")
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep_last is not None or self.keep_every is not None or self.keep_best > 0
+
+    def select(self, records: List[CheckpointRecord], interval: int) -> Set[int]:
+        """Steps of the checkpoints to keep; ``interval`` is the periodic save interval in timesteps."""
+        if not self.enabled:
+            return {r.steps for r in records}
+        keep: Set[int] = set()
+        periodic = sorted(r.steps for r in records if r.periodic)
+        if self.keep_last:
+            keep.update(periodic[-self.keep_last:])
+        if self.keep_every:
+            keep.update(s for s in periodic if (s // max(interval, 1)) % self.keep_every == 0)
+        if self.keep_best:
+            scored = sorted((r for r in records if r.score is not None), key=lambda r: (-r.score, -r.steps))
+            keep.update(r.steps for r in scored[: self.keep_best])
+        return keep
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "keep_last": self.keep_last,
+            "keep_every": self.keep_every,
+            "keep_best": self.keep_best,
+            "best_metric": self.best_metric,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RetentionPolicy":
+        return cls(
+            keep_last=data.get("keep_last"),
+            keep_every=data.get("keep_every"),
+            keep_best=data.get("keep_best", 0),
+            best_metric=data.get("best_metric", "mean_reward"),
+        )
+
+
+def scan_checkpoints(directory: Path, suffix: str = ".zip") -> List[CheckpointRecord]:
+    records = []
+    for path in Path(directory).glob(f"poke_*_steps{suffix}"):
+        match = CHECKPOINT_PATTERN.search(path.name)
+        if match:
+            records.append(CheckpointRecord(steps=int(match.group(1)), path=str(path)))
+    return sorted(records, key=lambda r: r.steps)
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """
+    Saves ``poke_<steps>_steps.zip`` every ``save_freq`` calls without blocking on disk.
+
+    At most ``max_pending`` snapshots wait for the writer; past that the
+    training thread blocks until one is written rather than holding more
+    copies of the model in memory.
+    """
+
+    def __init__(
+        self,
+        save_freq: int,
+        save_path: Path,
+        name_prefix: str = "poke",
+        retention: Optional[RetentionPolicy] = None,
+        weights_freq: Optional[int] = None,
+        keep_weights: Optional[int] = 5,
+        max_pending: int = 2,
+        resume_states: bool = False,
+        verbose: int = 0,
+    ):
+        super().__init__(verbose)
+        self.save_freq = save_freq
+        self.save_path = Path(save_path)
+        self.name_prefix = name_prefix
+        self.retention = retention or RetentionPolicy()
+        self.weights_freq = weights_freq
+        self.keep_weights = keep_weights
+        self.max_pending = max(max_pending, 1)
+        self.resume_states = resume_states
+
+        self.checkpoints: Dict[int, CheckpointRecord] = {}
+        self.write_seconds: float = 0.0
+        self.snapshot_seconds: float = 0.0
+        self.errors: List[str] = []
+        self._pending_scores: Dict[int, float] = {}
+        self._last_snapshot_steps: Optional[int] = None
+        self._resume_due = False
+        self._in_rollout = False
+        self._lock = threading.Lock()
+        self.manifest = None
+        self._jobs: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def weights_dir(self) -> Path:
+        return self.save_path / "weights"
+
+    def checkpoint_path(self, steps: int) -> Path:
+        return self.save_path / f"{self.name_prefix}_{steps}_steps.zip"
+
+    def weights_path(self, steps: int) -> Path:
+        return self.weights_dir / f"{self.name_prefix}_{steps}_steps.pt"
+
+    def _on_training_start(self) -> None:
+        self.save_path.mkdir(parents=True, exist_ok=True)
+        self.manifest = load_manifest(self.save_path)
+        # earlier checkpoints of this run (and their eval scores) stay under retention
+        for record in self.manifest.records():
+            if record.steps is not None and record.name == self.checkpoint_path(record.steps).name:
+                self.checkpoints[record.steps] = record
+        self._jobs = queue.Queue(maxsize=self.max_pending)
+        self._thread = threading.Thread(target=self._writer_loop, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self.save_freq == 0:
+            if self.resume_states:
+                self._resume_due = True
+            else:
+                self._enqueue("zip", periodic=True)
+        elif self.weights_freq and self.n_calls % self.weights_freq == 0:
+            self._enqueue("weights", periodic=True)
+        return True
+
+    def _on_rollout_start(self) -> None:
+        if self._resume_due:
+            self._enqueue("zip", periodic=True, with_state=True)
+        self._in_rollout = True
+
+    def _on_rollout_end(self) -> None:
+        self._in_rollout = False
+
+    def _on_training_end(self) -> None:
+        if self._thread is None:
+            return
+        if self._resume_due:
+            # stopped mid-rollout: the envs are a step ahead of the learner, so no resume state
+            self._enqueue("zip", periodic=True, with_state=not self._in_rollout)
+        self._jobs.put(None)
+        self._thread.join()
+        self._thread = None
+        if self.verbose:
+            print(
+                f"[checkpoint] snapshot {self.snapshot_seconds:.1f}s on the training thread, "
+                f"{self.write_seconds:.1f}s writing in the background"
+            )
+
+    def save_now(self) -> None:
+        """Checkpoint the current policy (e.g. one that is about to be evaluated)."""
+        if self.num_timesteps != self._last_snapshot_steps and self.num_timesteps not in self.checkpoints:
+            self._enqueue("zip", periodic=False)
+
+    def record_eval_result(self, eval_result: Dict[str, Any]) -> None:
+        score = eval_result.get(self.retention.best_metric)
+        steps = eval_result.get("timesteps_when_ran")
+        if score is None or steps is None:
+            return
+        with self._lock:
+            record = self.checkpoints.get(int(steps))
+            if record is None:
+                # its snapshot is still queued; the writer picks the score up
+                self._pending_scores[int(steps)] = float(score)
+                return
+            record.score = float(score)
+        self.manifest.set_score(record.path, record.score, self.retention.best_metric)
+        self._submit(("retain", None))
+
+    def _interval(self) -> int:
+        return self.save_freq * max(self.training_env.num_envs if self.training_env is not None else 1, 1)
+
+    def _enqueue(self, kind: str, periodic: bool, with_state: bool = False) -> None:
+        start = time.perf_counter()
+        snapshot = snapshot_model(self.model)
+        training_state = capture_training_state(self.model) if with_state else None
+        self.snapshot_seconds += time.perf_counter() - start
+        self._last_snapshot_steps = snapshot.num_timesteps
+        if with_state:
+            self._resume_due = False
+        self._submit((kind, (snapshot, periodic, training_state)))
+
+    def _submit(self, job) -> None:
+        if self._thread is not None:
+            self._jobs.put(job)
+        else:
+            # writer already stopped (e.g. an async eval result drained at training end)
+            self._run_job(job)
+
+    def _writer_loop(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            self._run_job(job)
+
+    def _run_job(self, job) -> None:
+        kind, payload = job
+        try:
+            start = time.perf_counter()
+            if kind == "zip":
+                self._write_checkpoint(*payload)
+            elif kind == "weights":
+                self._write_weights(payload[0])
+            self._apply_retention()
+            self.write_seconds += time.perf_counter() - start
+        except Exception as exc:
+            self.errors.append(repr(exc))
+            print(f"[checkpoint] write failed: {exc!r}")
+
+    def _write_checkpoint(
+        self, snapshot: ModelSnapshot, periodic: bool, training_state: Optional[Dict[str, Any]] = None
+    ) -> None:
+        path = self.checkpoint_path(snapshot.num_timesteps)
+        # sidecar first, so an indexed checkpoint never points at a missing one
+        resume_path = None
+        if training_state is not None:
+            resume_path = resume_state_path(path)
+            write_training_state(training_state, resume_path)
+        write_model_zip(snapshot, path)
+        record = self.manifest.add(path, snapshot.num_timesteps, periodic=periodic, resume_state=resume_path)
+        with self._lock:
+            previous = self.checkpoints.get(snapshot.num_timesteps)
+            record.periodic = periodic or (previous is not None and previous.periodic)
+            self.checkpoints[snapshot.num_timesteps] = record
+            score = self._pending_scores.pop(snapshot.num_timesteps, None)
+        if score is not None:
+            record.score = score
+            self.manifest.set_score(path, score, self.retention.best_metric)
+        if self.verbose:
+            print(f"[checkpoint] saved {path}")
+
+    def _write_weights(self, snapshot: ModelSnapshot) -> None:
+        write_policy_weights(snapshot, self.weights_path(snapshot.num_timesteps))
+        if self.keep_weights:
+            for record in scan_checkpoints(self.weights_dir, suffix=".pt")[: -self.keep_weights]:
+                Path(record.path).unlink(missing_ok=True)
+
+    def _apply_retention(self) -> None:
+        if not self.retention.enabled:
+            return
+        with self._lock:
+            records = list(self.checkpoints.values())
+            keep = self.retention.select(records, self._interval())
+            # a score may still arrive for an eval snapshot; keep it until then
+            if self.retention.keep_best:
+                keep.update(r.steps for r in records if not r.periodic and r.score is None)
+            drop = [r for r in records if r.steps not in keep]
+            for record in drop:
+                del self.checkpoints[record.steps]
+        for record in drop:
+            Path(record.path).unlink(missing_ok=True)
+            resume_state_path(record.path).unlink(missing_ok=True)
+            self.manifest.remove(record.path)
+            if self.verbose:
+                print(f"[checkpoint] retention removed {record.path}")
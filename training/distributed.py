@@ -0,0 +1,703 @@
+"""
+Rollout workers on other machines, feeding one central learner over TCP.
+
+``RemoteActorPool`` is the learner side of ``ActorLearnerPPO`` (see
+training/actor_learner.py) when the envs run in other processes or on other
+hosts. It listens on ``host:port``. Any number of ``run_worker`` processes
+(tools/rollout_worker.py) can connect, play ``RedGymEnv`` batches with the
+newest weights they have pulled, and stream back ``n_steps``-step trajectory
+segments. Workers may join or leave at any time. The learner fills its
+``num_envs`` rollout-buffer columns from whichever segments arrive, so a
+worker's ``n_envs`` must divide ``num_envs``; other workers are turned away at
+HELLO. Columns of a segment that do not fit the current update carry over to
+the next one, and segments more than ``max_staleness`` versions behind
+(possible when workers deliver out of turn) are dropped.
+
+Protocol (``multiprocessing.connection`` messages, each ``<BQ`` op + version header):
+    worker -> learner  HELLO    JSON (name, host, n_envs)
+    learner -> worker  WELCOME  JSON (env config, n_steps, gamma, policy spec)
+    learner -> worker  REJECT   why the learner turned the worker away (instead of WELCOME)
+    learner -> worker  WEIGHTS  flat float32 policy weights (also the reply to PULL)
+    learner -> worker  CREDIT   permission to play one segment, with the learner's newest version
+    worker -> learner  PULL     sent before playing when the credit's version is newer than the worker's
+    worker -> learner  SEGMENT  ``TrajectoryCodec`` payload, tagged with its weight version
+
+Segments are compact. Image and other small-integer observations travel as
+uint8 (or the narrowest unsigned type that fits), ``MultiBinary`` observations
+and episode starts are bit-packed, and actions use the narrowest unsigned
+type. Rewards, values and log-probs are float32. The whole segment is then
+zlib-compressed (level ``compression``, 0 = off), which shrinks the mostly
+flat Game Boy screens several times over. The learner never unpickles
+anything a worker sends. Workers do unpickle the policy spec, so only point
+them at a learner you trust, and pass ``authkey`` on open networks.
+
+Backpressure works on weight versions, like ``ActorPool``'s gate. A worker
+plays a segment only on a credit, and refreshes its weights first. The learner
+grants the credit once the update that segment will land in is at most
+``max_staleness`` versions ahead of its newest weights, and at most
+``(max_staleness + 1) * num_envs`` columns are in flight or queued. Workers
+with the same ``n_envs`` fill every update exactly, so their segments are
+never too stale to use if they arrive in turn. Workers with different
+``n_envs`` can straddle two updates; with ``max_staleness`` >= 1 the gate
+waits for the later one, and with 0 the straddling columns are dropped
+(waiting would deadlock: the update they finish needs their first columns).
+Per-worker
+throughput (steps/s, MB received, segments dropped as stale, seconds spent
+waiting for credit) is logged under ``distributed/*`` and written to
+``stats_path``.
+"""
+
+import json
+import multiprocessing as mp
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from stable_baselines3 import PPO
+from stable_baselines3.common.save_util import data_to_json, json_to_data
+from stable_baselines3.common.vec_env import DummyVecEnv, VecMonitor, VecTransposeImage, is_vecenv_wrapped
+
+from training.actor_learner import Rollout, RolloutPool, flatten_weights, load_weights, play_rollout
+from training.inference_server import parse_address
+
+HEADER = struct.Struct("<BQ")
+OP_HELLO = 1
+OP_WELCOME = 2
+OP_WEIGHTS = 3
+OP_PULL = 4
+OP_SEGMENT = 5
+OP_CREDIT = 6
+OP_REJECT = 7
+DEFAULT_ADDRESS = "0.0.0.0:5600"
+DEFAULT_COMPRESSION = 1
+META = struct.Struct("<BI")
+
+
+def _send(conn: Connection, op: int, version: int = 0, payload: bytes = b""):
+    conn.send_bytes(HEADER.pack(op, version) + payload)
+
+
+def _recv(conn: Connection, expected: Optional[int] = None) -> Tuple[int, int, memoryview]:
+    message = conn.recv_bytes()
+    op, version = HEADER.unpack_from(message)
+    if expected is not None and op != expected:
+        raise ConnectionError(f"Expected message {expected}, got {op}")
+    return op, version, memoryview(message)[HEADER.size:]
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def _wire_dtype(space: spaces.Space) -> np.dtype:
+    """Narrowest dtype that holds every value of ``space`` (non-integer spaces keep theirs)."""
+    if isinstance(space, spaces.Discrete):
+        high = int(space.start + space.n - 1)
+        low = int(space.start)
+    elif isinstance(space, spaces.MultiDiscrete):
+        high = int(np.max(space.start + space.nvec - 1))
+        low = int(np.min(space.start))
+    elif isinstance(space, spaces.Box) and np.issubdtype(space.dtype, np.integer):
+        high, low = int(np.max(space.high)), int(np.min(space.low))
+    else:
+        return np.dtype(space.dtype)
+    if low < 0:
+        return np.dtype(space.dtype)
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if high <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(space.dtype)
+
+
+class TrajectoryCodec:
+    """
+    Packs a ``Rollout`` into bytes and back, for fixed observation/action spaces.
+
+    Layout: ``<BI`` (compressed?, meta length), then, zlib-compressed if the
+    flag is set: JSON meta (``n_steps``, ``n_envs``, finished
+    episode infos, timings), then every observation key's ``n_steps + 1`` rows
+    (the last one is the final observation), actions, rewards, values,
+    log-probs and the bit-packed ``n_steps + 1`` rows of episode starts (the
+    last one is the final dones).
+    """
+
+    def __init__(self, observation_space: spaces.Dict, action_space: spaces.Space, compression: int = DEFAULT_COMPRESSION):
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.compression = compression
+        self.action_dtype = _wire_dtype(action_space)
+        self._obs = [
+            (key, space, isinstance(space, spaces.MultiBinary), _wire_dtype(space))
+            for key, space in observation_space.spaces.items()
+        ]
+
+    def encode(self, rollout: Rollout) -> bytes:
+        n_steps, n_envs = rollout.rewards.shape
+        meta = json.dumps(
+            {
+                "n_steps": n_steps,
+                "n_envs": n_envs,
+                "infos": [[step, idx, info] for step, finished in enumerate(rollout.infos) for idx, info in finished],
+                "idle_seconds": rollout.idle_seconds,
+                "collect_seconds": rollout.collect_seconds,
+            },
+            default=_jsonable,
+        ).encode()
+        parts = [meta]
+        for key, space, bits, dtype in self._obs:
+            rows = np.concatenate([rollout.observations[key], rollout.last_observation[key][None]])
+            if bits:
+                parts.append(np.packbits(rows.reshape(n_steps + 1, n_envs, -1).astype(bool), axis=-1).tobytes())
+            else:
+                parts.append(rows.astype(dtype, copy=False).tobytes())
+        parts.append(rollout.actions.astype(self.action_dtype, copy=False).tobytes())
+        for values in (rollout.rewards, rollout.values, rollout.log_probs):
+            parts.append(values.astype(np.float32, copy=False).tobytes())
+        starts = np.concatenate([rollout.episode_starts, rollout.last_dones[None]])
+        parts.append(np.packbits(starts.astype(bool)).tobytes())
+        body = b"".join(parts)
+        if self.compression:
+            body = zlib.compress(body, self.compression)
+        return META.pack(bool(self.compression), len(meta)) + body
+
+    def decode(self, payload: memoryview, version: int) -> Rollout:
+        compressed, meta_size = META.unpack_from(payload)
+        payload = memoryview(zlib.decompress(payload[META.size:])) if compressed else payload[META.size:]
+        meta = json.loads(bytes(payload[:meta_size]))
+        n_steps, n_envs = meta["n_steps"], meta["n_envs"]
+        offset = meta_size
+
+        def take(dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+            nonlocal offset
+            count = int(np.prod(shape))
+            array = np.frombuffer(payload, dtype=dtype, count=count, offset=offset).reshape(shape)
+            offset += count * np.dtype(dtype).itemsize
+            return array
+
+        observations, last_observation = {}, {}
+        for key, space, bits, dtype in self._obs:
+            if bits:
+                size = int(np.prod(space.shape))
+                packed = take(np.uint8, (n_steps + 1, n_envs, (size + 7) // 8))
+                rows = np.unpackbits(packed, axis=-1, count=size).reshape(n_steps + 1, n_envs, *space.shape)
+            else:
+                rows = take(dtype, (n_steps + 1, n_envs, *space.shape))
+            rows = rows.astype(space.dtype, copy=False)
+            observations[key], last_observation[key] = rows[:n_steps], rows[n_steps]
+        actions = take(self.action_dtype, (n_steps, n_envs, *self.action_space.shape))
+        rewards, values, log_probs = (take(np.float32, (n_steps, n_envs)) for _ in range(3))
+        packed = take(np.uint8, (((n_steps + 1) * n_envs + 7) // 8,))
+        starts = np.unpackbits(packed, count=(n_steps + 1) * n_envs).reshape(n_steps + 1, n_envs).astype(np.float32)
+        infos: List[List[Tuple[int, Dict[str, Any]]]] = [[] for _ in range(n_steps)]
+        for step, idx, info in meta["infos"]:
+            infos[step].append((idx, info))
+        return Rollout(
+            observations=observations,
+            actions=actions.astype(self.action_space.dtype, copy=False),
+            rewards=rewards,
+            episode_starts=starts[:n_steps],
+            values=values,
+            log_probs=log_probs,
+            versions=np.full(n_steps, version, dtype=np.int64),
+            last_observation=last_observation,
+            last_dones=starts[n_steps],
+            infos=infos,
+            idle_seconds=meta["idle_seconds"],
+            collect_seconds=meta["collect_seconds"],
+        )
+
+
+def split_rollout(rollout: Rollout, n: int) -> Tuple[Rollout, Rollout]:
+    """The first ``n`` env columns of ``rollout`` and the rest."""
+
+    def part(columns: slice, keep) -> Rollout:
+        return Rollout(
+            observations={key: value[:, columns] for key, value in rollout.observations.items()},
+            actions=rollout.actions[:, columns],
+            rewards=rollout.rewards[:, columns],
+            episode_starts=rollout.episode_starts[:, columns],
+            values=rollout.values[:, columns],
+            log_probs=rollout.log_probs[:, columns],
+            versions=rollout.versions,
+            last_observation={key: value[columns] for key, value in rollout.last_observation.items()},
+            last_dones=rollout.last_dones[columns],
+            infos=[[(idx - (columns.start or 0), info) for idx, info in step if keep(idx)] for step in rollout.infos],
+            idle_seconds=rollout.idle_seconds,
+            collect_seconds=rollout.collect_seconds,
+        )
+
+    return part(slice(0, n), lambda idx: idx < n), part(slice(n, None), lambda idx: idx >= n)
+
+
+@dataclass
+class WorkerStats:
+    worker_id: int
+    name: str
+    host: str
+    address: str
+    n_envs: int
+    joined: float
+    welcomed: Optional[float] = None
+    left: Optional[float] = None
+    segments: int = 0
+    steps: int = 0
+    bytes_received: int = 0
+    dropped_stale: int = 0
+    blocked_seconds: float = 0.0
+    last_segment: Optional[float] = None
+    credited: bool = False
+
+    @property
+    def steps_per_second(self) -> float:
+        if self.welcomed is None or self.last_segment is None or self.last_segment <= self.welcomed:
+            return 0.0
+        return self.steps / (self.last_segment - self.welcomed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "steps_per_s": self.steps_per_second, "connected": self.left is None}
+
+
+class RemoteActorPool(RolloutPool):
+    """
+    ``num_envs`` rollout-buffer columns filled by TCP rollout workers.
+
+    ``observation_space``/``action_space`` are the envs' (as a local
+    ``RedGymEnv`` reports them); ``env_config`` is sent to every worker, which
+    may override paths such as the ROM. Listening starts at construction, so
+    workers can connect before training does.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        observation_space: spaces.Space,
+        action_space: spaces.Space,
+        env_config: Dict[str, Any],
+        address: str = DEFAULT_ADDRESS,
+        authkey: Optional[bytes] = None,
+        compression: int = DEFAULT_COMPRESSION,
+        stats_path: Optional[Path] = None,
+        verbose: int = 1,
+    ):
+        super().__init__(num_envs, observation_space, action_space)
+        self.env_config = env_config
+        self.authkey = authkey
+        self.compression = compression
+        self.stats_path = Path(stats_path) if stats_path is not None else None
+        self.verbose = verbose
+        self._listener = Listener(parse_address(address), authkey=authkey)
+        self.address = self._listener.address
+        # sized in start(), once max_staleness is known
+        self._segments: "queue.Queue[Tuple[int, Rollout]]" = queue.Queue()
+        self._leftover: List[Tuple[int, Rollout]] = []
+        self._started = threading.Event()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        # notified on new versions and whenever columns in flight are given up
+        self._cond = threading.Condition(self._lock)
+        # env columns credited (not yet delivered), delivered (not yet used) and used
+        self._credited = 0
+        self._queued = 0
+        self._consumed = 0
+        self._conns: Dict[int, Connection] = {}
+        self._local_workers: List[mp.Process] = []
+        self.workers: Dict[int, WorkerStats] = {}
+        self.version = -1
+        self.max_staleness = 0
+        self.n_steps = 0
+        self.dropped_stale = 0
+        self._welcome = b""
+        self._weights = b""
+        self._codec: Optional[TrajectoryCodec] = None
+        threading.Thread(target=self._accept_loop, name="rollout-accept", daemon=True).start()
+
+    @property
+    def connect_address(self) -> str:
+        """``host:port`` for workers on this machine."""
+        host, port = self.address
+        return f"{'127.0.0.1' if host in ('0.0.0.0', '') else host}:{port}"
+
+    @property
+    def started(self) -> bool:
+        return self._started.is_set()
+
+    def start(self, model: PPO, n_steps: int) -> int:
+        self.n_steps = n_steps
+        self.max_staleness = model.max_staleness
+        # credits bound the columns in flight, so puts never block
+        self._segments = queue.Queue(maxsize=(self.max_staleness + 1) * self.num_envs)
+        self._codec = TrajectoryCodec(model.observation_space, model.action_space)
+        spec = {
+            "policy_class": model.policy_class,
+            "policy_kwargs": model.policy_kwargs,
+            "observation_space": model.observation_space,
+            "action_space": model.action_space,
+        }
+        self._welcome = json.dumps(
+            {
+                "env_config": self.env_config,
+                "n_steps": n_steps,
+                "gamma": model.gamma,
+                "transpose": is_vecenv_wrapped(model.env, VecTransposeImage),
+                "compression": self.compression,
+                "spec": data_to_json(spec),
+            },
+            default=str,
+        ).encode()
+        version = self.publish(model.policy)
+        self._started.set()
+        return version
+
+    def publish(self, policy: th.nn.Module) -> int:
+        weights = flatten_weights(policy).numpy().tobytes()
+        with self._cond:
+            self.version += 1
+            self._weights = weights
+            self._cond.notify_all()
+            return self.version
+
+    def _grant(self, conn: Connection, stats: WorkerStats):
+        """Credit ``stats``'s worker with one more segment once it could not arrive too stale."""
+
+        def due() -> bool:
+            # the update this segment lands in if the columns ahead of it all arrive in turn
+            first = self._consumed + self._queued + self._credited
+            last = first + stats.n_envs - 1 if self.max_staleness else first
+            return self._closed.is_set() or self.version >= last // self.num_envs - self.max_staleness
+
+        with self._cond:
+            self._cond.wait_for(due)
+            if self._closed.is_set():
+                return
+            self._credited += stats.n_envs
+            stats.credited = True
+            version = self.version
+        _send(conn, OP_CREDIT, version)
+
+    def _release(self, width: int, consumed: bool):
+        with self._cond:
+            self._queued -= width
+            if consumed:
+                self._consumed += width
+            else:
+                self._cond.notify_all()
+
+    def _accept_loop(self):
+        worker_id = 0
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, mp.AuthenticationError) as exc:
+                if self._closed.is_set():
+                    return
+                if self.verbose:
+                    print(f"[distributed] rejected a connection: {exc}")
+                continue
+            address = self._listener.last_accepted
+            threading.Thread(
+                target=self._worker_loop, args=(worker_id, conn, address), name=f"rollout-worker-{worker_id}", daemon=True
+            ).start()
+            worker_id += 1
+
+    def _worker_loop(self, worker_id: int, conn: Connection, address: Any):
+        stats = None
+        try:
+            hello = json.loads(bytes(_recv(conn, OP_HELLO)[2]))
+            n_envs = int(hello["n_envs"])
+            if n_envs < 1 or self.num_envs % n_envs:
+                reason = f"--num-envs must divide the learner's {self.num_envs} envs, got {n_envs}"
+                if self.verbose:
+                    print(f"[distributed] rejected {hello.get('name') or f'worker{worker_id}'}: {reason}")
+                _send(conn, OP_REJECT, 0, reason.encode())
+                return
+            stats = WorkerStats(
+                worker_id=worker_id,
+                name=hello.get("name") or f"worker{worker_id}",
+                host=hello.get("host", ""),
+                address=f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address),
+                n_envs=n_envs,
+                joined=time.time(),
+            )
+            with self._lock:
+                self.workers[worker_id] = stats
+                self._conns[worker_id] = conn
+            if self.verbose:
+                print(f"[distributed] {stats.name} joined from {stats.address} with {stats.n_envs} envs")
+            while not self._started.wait(0.5):
+                if self._closed.is_set():
+                    return
+            _send(conn, OP_WELCOME, 0, self._welcome)
+            self._send_weights(conn)
+            stats.welcomed = time.time()
+            self._grant(conn, stats)
+            while not self._closed.is_set():
+                op, version, payload = _recv(conn)
+                if op == OP_PULL:
+                    self._send_weights(conn)
+                    continue
+                if op != OP_SEGMENT or not stats.credited:
+                    raise ConnectionError(f"Unexpected message {op}")
+                rollout = self._codec.decode(payload, version)
+                if rollout.rewards.shape != (self.n_steps, stats.n_envs):
+                    raise ConnectionError(f"Segment shape {rollout.rewards.shape}, expected {(self.n_steps, stats.n_envs)}")
+                with self._cond:
+                    stats.credited = False
+                    self._credited -= stats.n_envs
+                    self._queued += stats.n_envs
+                    stats.segments += 1
+                    stats.steps += rollout.rewards.size
+                    stats.bytes_received += len(payload)
+                    stats.blocked_seconds += rollout.idle_seconds
+                    stats.last_segment = time.time()
+                self._segments.put((worker_id, rollout))
+                self._grant(conn, stats)
+        except (EOFError, OSError, ConnectionError, ValueError, TypeError, struct.error) as exc:
+            # (TypeError: a read on a connection that close() shut under us)
+            if stats is not None and self.verbose and not self._closed.is_set():
+                reason = "" if isinstance(exc, EOFError) else f" ({exc})"
+                print(f"[distributed] {stats.name} left{reason}")
+        finally:
+            with self._cond:
+                if stats is not None:
+                    stats.left = time.time()
+                    if stats.credited:  # the credited segment will not come
+                        stats.credited = False
+                        self._credited -= stats.n_envs
+                        self._cond.notify_all()
+                self._conns.pop(worker_id, None)
+            conn.close()
+
+    def _send_weights(self, conn: Connection):
+        with self._lock:
+            version, weights = self.version, self._weights
+        _send(conn, OP_WEIGHTS, version, weights)
+
+    def _next_segment(self) -> Tuple[int, Rollout]:
+        if self._leftover:
+            return self._leftover.pop(0)
+        waits = 0
+        while True:
+            try:
+                return self._segments.get(timeout=5.0)
+            except queue.Empty:
+                if self._closed.is_set():
+                    raise RuntimeError("RemoteActorPool is closed")
+                if self.verbose and waits % 6 == 0:  # every 30 s
+                    connected = sum(1 for w in self.worker_stats() if w["connected"])
+                    print(f"[distributed] waiting for rollouts on {self.connect_address} ({connected} workers connected)")
+                waits += 1
+
+    def gather(self) -> List[Rollout]:
+        rollouts: List[Rollout] = []
+        filled = 0
+        while filled < self.num_envs:
+            worker_id, rollout = self._next_segment()
+            if self.version - int(rollout.versions.min()) > self.max_staleness:
+                with self._lock:
+                    self.workers[worker_id].dropped_stale += 1
+                    self.dropped_stale += 1
+                self._release(rollout.rewards.shape[1], consumed=False)
+                continue
+            width = rollout.rewards.shape[1]
+            if width > self.num_envs - filled:
+                rollout, rest = split_rollout(rollout, self.num_envs - filled)
+                self._leftover.insert(0, (worker_id, rest))
+                width = rollout.rewards.shape[1]
+            self._release(width, consumed=True)
+            rollouts.append(rollout)
+            filled += width
+        return rollouts
+
+    def worker_stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [stats.to_dict() for stats in self.workers.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        workers = self.worker_stats()
+        connected = [w for w in workers if w["connected"]]
+        values: Dict[str, Any] = {
+            "distributed/workers": len(connected),
+            "distributed/steps_per_s": sum(w["steps_per_s"] for w in connected),
+            "distributed/mb_received": sum(w["bytes_received"] for w in workers) / 1e6,
+            "distributed/dropped_stale": self.dropped_stale,
+            "distributed/pending_segments": self._segments.qsize() + len(self._leftover),
+        }
+        for w in connected:
+            values[f"distributed/{w['name']}/steps_per_s"] = w["steps_per_s"]
+            values[f"distributed/{w['name']}/blocked_s"] = w["blocked_seconds"]
+        if self.stats_path is not None:
+            tmp = self.stats_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"address": self.connect_address, "version": self.version, "workers": workers}, indent=2))
+            tmp.replace(self.stats_path)
+        return values
+
+    def spawn_local_workers(self, count: int, num_envs: int, seed: int = 0, env_overrides: Optional[Dict[str, Any]] = None):
+        """Start ``count`` ``run_worker`` processes on this machine (``num_envs`` envs each)."""
+        ctx = mp.get_context("spawn")
+        for i in range(count):
+            process = ctx.Process(
+                target=run_worker,
+                args=(self.connect_address,),
+                kwargs={
+                    "num_envs": num_envs,
+                    "name": f"local{i}",
+                    "seed": seed + i * num_envs,
+                    "env_overrides": env_overrides,
+                    "authkey": self.authkey,
+                    "verbose": 0,
+                },
+                name=f"rollout-worker-local{i}",
+                daemon=True,
+            )
+            process.start()
+            self._local_workers.append(process)
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        with self._cond:
+            self._closed.set()
+            self._cond.notify_all()
+        self._listener.close()
+        with self._lock:
+            conns = list(self._conns.values())
+        for conn in conns:
+            try:
+                conn.close()
+            except OSError:
+                pass
+        for process in self._local_workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+
+# --- worker -------------------------------------------------------------------
+
+
+def _connect(address: str, authkey: Optional[bytes], timeout: float) -> Connection:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return Client(parse_address(address), authkey=authkey)
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _make_env(env_config: Dict[str, Any], seed: int):
+    def _init():
+        from env.red_gym_env import RedGymEnv
+
+        env = RedGymEnv(env_config)
+        env.reset(seed=seed)
+        return env
+
+    return _init
+
+
+def run_worker(
+    address: str,
+    num_envs: int = 1,
+    name: Optional[str] = None,
+    seed: int = 0,
+    env_overrides: Optional[Dict[str, Any]] = None,
+    authkey: Optional[bytes] = None,
+    connect_timeout: float = 60.0,
+    verbose: int = 1,
+    log_every: float = 30.0,
+) -> Dict[str, Any]:
+    """
+    Play ``num_envs`` envs for the learner at ``address`` until it disconnects.
+
+    ``env_overrides`` replace keys of the learner's env config (ROM and state
+    paths, ``session_path``). Returns this worker's totals. Raises
+    ``ValueError`` if the learner turns the worker away (``num_envs`` must
+    divide the learner's env count).
+    """
+    th.set_num_threads(1)
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    conn = _connect(address, authkey, connect_timeout)
+    _send(conn, OP_HELLO, 0, json.dumps({"name": name, "host": socket.gethostname(), "n_envs": num_envs}).encode())
+    op, _, payload = _recv(conn)
+    if op == OP_REJECT:
+        conn.close()
+        raise ValueError(f"The learner at {address} rejected this worker: {bytes(payload).decode()}")
+    if op != OP_WELCOME:
+        raise ConnectionError(f"Expected message {OP_WELCOME}, got {op}")
+    welcome = json.loads(bytes(payload))
+    env_config = dict(welcome["env_config"])
+    env_config["session_path"] = Path(env_config.get("session_path") or "runs") / f"worker_{name}"
+    env_config.update(env_overrides or {})
+    env_config["session_path"] = Path(env_config["session_path"])
+    env_config["session_path"].mkdir(parents=True, exist_ok=True)
+    spec = json_to_data(welcome["spec"])
+    policy = spec["policy_class"](spec["observation_space"], spec["action_space"], lambda _: 0.0, **spec["policy_kwargs"])
+    policy.set_training_mode(False)
+    codec = TrajectoryCodec(spec["observation_space"], spec["action_space"], welcome["compression"])
+    _, version, weights = _recv(conn, OP_WEIGHTS)
+    load_weights(policy, th.frombuffer(bytearray(weights), dtype=th.float32))
+
+    venv = VecMonitor(DummyVecEnv([_make_env(env_config, seed + i) for i in range(num_envs)]))
+    if welcome["transpose"]:
+        venv = VecTransposeImage(venv)
+
+    totals = {"segments": 0, "steps": 0, "bytes": 0, "blocked_seconds": 0.0}
+    started = last_log = time.monotonic()
+    obs = venv.reset()
+    episode_starts = np.ones(num_envs, dtype=np.float32)
+    try:
+        while True:
+            wait_start = time.monotonic()
+            try:
+                _, learner_version, _ = _recv(conn, OP_CREDIT)
+                if learner_version > version:
+                    # play every segment with the newest weights there are
+                    _send(conn, OP_PULL, version)
+                    _, version, weights = _recv(conn, OP_WEIGHTS)
+                    load_weights(policy, th.frombuffer(bytearray(weights), dtype=th.float32))
+            except (EOFError, OSError, ConnectionError):
+                break
+            blocked = time.monotonic() - wait_start
+            rollout = play_rollout(venv, policy, obs, episode_starts, welcome["n_steps"], welcome["gamma"], lambda: version)
+            rollout.idle_seconds = blocked
+            payload = codec.encode(rollout)
+            try:
+                _send(conn, OP_SEGMENT, version, payload)
+            except OSError:
+                break
+            totals["segments"] += 1
+            totals["steps"] += rollout.rewards.size
+            totals["bytes"] += len(payload)
+            totals["blocked_seconds"] += blocked
+            obs, episode_starts = rollout.last_observation, rollout.last_dones
+            if verbose and time.monotonic() - last_log >= log_every:
+                last_log = time.monotonic()
+                elapsed = last_log - started
+                print(
+                    f"[{name}] {totals['segments']} segments, {totals['steps'] / elapsed:.0f} steps/s, "
+                    f"{totals['bytes'] / 1e6 / elapsed:.2f} MB/s, waited for credit {totals['blocked_seconds']:.1f}s, "
+                    f"weights v{version}",
+                    flush=True,
+                )
+    finally:
+        conn.close()
+        venv.close()
+    totals["steps_per_s"] = totals["steps"] / max(time.monotonic() - started, 1e-9)
+    return totals
@@ -0,0 +1,151 @@
+"""
+Content-addressed, size-bounded cache of evaluation results.
+
+Entries are keyed by the SHA-256 of the checkpoint file plus a canonical
+description of everything else that determines the result (env and reward
+config, savestate hash, episode count, step budget, seed). Each entry is a
+JSON file named by the hash of that key, with an optional ``.npz`` next to it
+for arrays such as the explore map and final frame. Renaming or copying a
+checkpoint still hits the cache and retraining into the same path does not.
+
+Reads refresh an entry's mtime; writes evict the least recently used entries
+once the cache grows past ``max_bytes``. Every eval entry point takes
+``--no-cache`` (``--no_cache`` in eval_policy.py) to bypass it.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = Path("runs") / "eval_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# env config keys that do not change rollouts (paths, logging, rendering)
+VOLATILE_ENV_KEYS = (
+    "session_path",
+    "gb_path",
+    "init_state",
+    "headless",
+    "save_video",
+    "fast_video",
+    "print_rewards",
+    "save_final_state",
+    "debug",
+    "record_trajectory",
+    "reward_trace_dir",
+    "video_buffer_frames",
+    "video_drop_policy",
+)
+
+_sha_memo: Dict[Any, str] = {}
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file, memoized on (path, size, mtime)."""
+    path = Path(path)
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    digest = _sha_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _sha_memo[memo_key] = h.hexdigest()
+    return digest
+
+
+def eval_cache_key(checkpoint: Path, env_config: Dict[str, Any], **params: Any) -> Dict[str, Any]:
+    """Canonical description of one evaluation; ``params`` are e.g. n_episodes, max_steps, seed."""
+    env_part = {k: v for k, v in env_config.items() if k not in VOLATILE_ENV_KEYS}
+    init_state = env_config.get("init_state")
+    key = {
+        "checkpoint_sha256": file_sha256(checkpoint),
+        "init_state_sha256": file_sha256(init_state) if init_state else None,
+        "env_config": env_part,
+        **params,
+    }
+    # round-trip so tuples/Paths compare equal to what a later get() reads back
+    return json.loads(json.dumps(key, sort_keys=True, default=str))
+
+
+class EvalCache:
+    """Result JSON (plus optional arrays) under ``root``, one entry per key hash."""
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def digest(key: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key: Dict[str, Any], suffix: str = ".json") -> Path:
+        return self.root / f"{self.digest(key)}{suffix}"
+
+    def get(self, key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+        if entry.get("key") != key:
+            return None
+        self._touch(key)
+        return entry["result"]
+
+    def get_arrays(self, key: Dict[str, Any]) -> Optional[Dict[str, np.ndarray]]:
+        """Arrays stored with the entry, or None if there are none."""
+        path = self._path(key, ".npz")
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    def put(self, key: Dict[str, Any], result: Dict[str, Any], arrays: Optional[Dict[str, np.ndarray]] = None):
+        self.root.mkdir(parents=True, exist_ok=True)
+        if arrays:
+            # arrays first: an entry is visible once its JSON exists
+            npz_path = self._path(key, ".npz")
+            tmp = npz_path.with_suffix(f".{os.getpid()}.tmp.npz")
+            np.savez_compressed(tmp, **arrays)
+            tmp.replace(npz_path)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"key": key, "created": time.time(), "result": result}))
+        tmp.replace(path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in ``max_bytes``."""
+        entries: Dict[str, list] = {}
+        for path in self.root.iterdir():
+            if path.suffix not in (".json", ".npz") or ".tmp" in path.name:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entry = entries.setdefault(path.stem, [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(path)
+        total = sum(size for _, size, _ in entries.values())
+        for _, size, paths in sorted(entries.values(), key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                path.unlink(missing_ok=True)
+            total -= size
+
+    def _touch(self, key: Dict[str, Any]):
+        for suffix in (".json", ".npz"):
+            try:
+                os.utime(self._path(key, suffix))
+            except OSError:
+                pass
@@ -0,0 +1,107 @@
+"""
+Sequential early stopping for evaluation runs.
+
+A ``StoppingRule`` is checked after every finished episode (in episode order)
+and ends the run once the results are conclusive:
+
+- ``return_ci_width``: the t confidence interval on mean return is at most this wide.
+- ``success_ci_width``: the Wilson interval on success rate is at most this wide.
+- ``success_threshold``: the Wilson interval lies entirely above or below it.
+
+Each rule applies from ``min_episodes`` on; the configured episode count stays
+the upper bound. Checking after every episode makes the intervals a little
+optimistic, so keep ``min_episodes`` and ``confidence`` conservative.
+"""
+
+import math
+from dataclasses import asdict, dataclass
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def mean_ci(values: List[float], confidence: float) -> Optional[Tuple[float, float]]:
+    """Student t interval on the mean; None with fewer than two values."""
+    n = len(values)
+    if n < 2:
+        return None
+    from scipy import stats
+
+    mean = sum(values) / n
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+    half = float(stats.t.ppf(0.5 + confidence / 2, n - 1)) * std / math.sqrt(n)
+    return mean - half, mean + half
+
+
+def wilson_interval(successes: int, n: int, confidence: float) -> Optional[Tuple[float, float]]:
+    """Wilson score interval on a success rate; None without trials."""
+    if n == 0:
+        return None
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(center - half, 0.0), min(center + half, 1.0)
+
+
+@dataclass
+class StoppingRule:
+    confidence: float = 0.95
+    min_episodes: int = 5
+    return_ci_width: Optional[float] = None
+    success_ci_width: Optional[float] = None
+    success_threshold: Optional[float] = None
+
+    def __post_init__(self):
+        if not 0.0 < self.confidence < 1.0:
+            raise ValueError(f"confidence must be in (0, 1), got {self.confidence}")
+        if self.min_episodes < 2:
+            raise ValueError(f"min_episodes must be >= 2, got {self.min_episodes}")
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            v is not None for v in (self.return_ci_width, self.success_ci_width, self.success_threshold)
+        )
+
+    def check(self, records: List[Dict[str, Any]]) -> Optional[str]:
+        """Reason to stop after these records (in episode order), or None to continue."""
+        n = len(records)
+        if not self.enabled or n < self.min_episodes:
+            return None
+        if self.return_ci_width is not None:
+            lo, hi = mean_ci([r['return'] for r in records], self.confidence)
+            if hi - lo <= self.return_ci_width:
+                return f"return CI width {hi - lo:.4f} <= {self.return_ci_width}"
+        successes = sum(bool(r['success']) for r in records)
+        lo, hi = wilson_interval(successes, n, self.confidence)
+        if self.success_ci_width is not None and hi - lo <= self.success_ci_width:
+            return f"success CI width {hi - lo:.4f} <= {self.success_ci_width}"
+        if self.success_threshold is not None:
+            if lo > self.success_threshold:
+                return f"success rate above {self.success_threshold} (CI {lo:.3f}-{hi:.3f})"
+            if hi < self.success_threshold:
+                return f"success rate below {self.success_threshold} (CI {lo:.3f}-{hi:.3f})"
+        return None
+
+    def summary(self, records: List[Dict[str, Any]], max_episodes: int) -> Dict[str, Any]:
+        """Result keys describing the stop decision and the final intervals."""
+        n = len(records)
+        reason = self.check(records)
+        return_ci = mean_ci([r['return'] for r in records], self.confidence)
+        success_ci = wilson_interval(sum(bool(r['success']) for r in records), n, self.confidence)
+        return {
+            'max_episodes': max_episodes,
+            'stopped_early': reason is not None and n < max_episodes,
+            'stop_reason': reason,
+            'return_ci': list(return_ci) if return_ci else None,
+            'success_ci': list(success_ci) if success_ci else None,
+            'stopping_rule': self.to_dict(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StoppingRule":
+        return cls(**{k: data[k] for k in cls.__dataclass_fields__ if k in data})
@@ -0,0 +1,394 @@
+"""
+Evaluation episode runner shared by eval_policy.py and the training callbacks.
+
+``run_episode`` plays one seeded episode and returns a JSON-ready record;
+``summarize_episodes`` folds records into the eval_policy.py result schema.
+``run_batched_episodes`` steps K envs in lockstep with one batched
+``model.predict`` per step, refilling each env with the next episode as soon
+as its current one ends. ``run_parallel_episodes`` spreads episodes over a
+process pool whose workers load the checkpoint and build their env once, then
+stream records back as episodes finish. Per-episode seeds make all three
+paths produce the same records for deterministic policies.
+
+The batched and pooled runners take a ``should_stop`` predicate (see
+training/eval_stopping.py). It is checked on the finished prefix of episodes
+in episode order, and the run is cut at the first prefix it accepts, so an
+early-stopped run returns the same episodes however they were scheduled.
+"""
+
+import multiprocessing as mp
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from stable_baselines3.common.utils import set_random_seed
+
+from env.red_gym_env import RedGymEnv
+
+REWARD_COMPONENTS = ('exploration', 'battle', 'milestone', 'penalty')
+
+
+def check_success(env: RedGymEnv, done: bool, truncated: bool) -> bool:
+    """
+    Determine if episode was successful based on task termination condition.
+
+    Args:
+        env: The environment
+        done: Whether episode is done
+        truncated: Whether episode was truncated
+
+    Returns:
+        True if task objective was achieved
+    """
+    if not done and not truncated:
+        return False
+
+    # If episode ended due to success condition (not max steps)
+    if done and not truncated:
+        return True
+
+    # Check task-specific success conditions
+    if env.termination_condition:
+        if env.termination_condition == 'badge_earned':
+            # Success if a badge was earned this episode
+            return env.get_badges() > env.start_badges
+        elif env.termination_condition == 'pokecenter_reached':
+            # Success if we're at Pokecenter map
+            current_map = env.read_m(0xD35E)
+            return current_map == 40
+
+    # Default: not successful if truncated
+    return done and not truncated
+
+
+def _episode_record(env, seed, episode_return, steps, done, truncated, info, start_position) -> Dict[str, Any]:
+    base = env.unwrapped
+    trajectory = None
+    if base.trajectory_writer is not None:
+        # streamed by the env; finish the file for this episode
+        base.trajectory_writer.close()
+        trajectory = str(base.trajectory_writer.path)
+
+    return {
+        'seed': seed,
+        'return': episode_return,
+        'length': steps,
+        'success': bool(check_success(base, done, truncated)),
+        'start_position': start_position,
+        'end_position': tuple(int(v) for v in base.get_game_coords()),
+        'reward_components': {c: float(base.episode_reward_components[c]) for c in REWARD_COMPONENTS},
+        'trajectory': trajectory,
+        # env info from the last step ('episode' and 'success' at the step limit)
+        'final_info': info,
+    }
+
+
+def run_episode(
+    model,
+    env: RedGymEnv,
+    max_steps: Optional[int],
+    seed: Optional[int] = None,
+    deterministic: bool = True,
+    progress_every: int = 0,
+    reseed: bool = True,
+) -> Dict[str, Any]:
+    """
+    Run one evaluation episode and return its record.
+
+    With ``reseed`` the global RNGs are seeded too, so stochastic policies
+    repeat; leave it off inside training to keep the learner's RNG stream.
+    """
+    if seed is not None and reseed:
+        set_random_seed(seed)
+    obs, info = env.reset(seed=seed)
+    start_position = tuple(int(v) for v in env.unwrapped.get_game_coords())
+    episode_reward = 0.0
+    steps = 0
+    done = truncated = False
+
+    while not max_steps or steps < max_steps:
+        action, _states = model.predict(obs, deterministic=deterministic)
+        obs, reward, done, truncated, info = env.step(action)
+        episode_reward += float(reward)
+        steps += 1
+
+        if progress_every and steps % progress_every == 0:
+            print(f"    Step {steps}: reward={episode_reward:.2f}, tiles={len(env.unwrapped.episode_visited_tiles)}")
+
+        if done or truncated:
+            break
+
+    return _episode_record(env, seed, episode_reward, steps, done, truncated, info, start_position)
+
+
+def run_batched_episodes(
+    model,
+    envs: List[RedGymEnv],
+    n_episodes: int,
+    max_steps: Optional[int],
+    base_seed: int = 0,
+    deterministic: bool = True,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    should_stop: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run episodes ``base_seed + i`` on ``envs`` with one batched predict per step.
+
+    Each env plays its episode independently; when it finishes, its record is
+    taken before the env is reset for the next pending episode. Returns the
+    records in episode order, cut short if ``should_stop`` accepts a prefix.
+    """
+    records: List[Optional[Dict[str, Any]]] = [None] * n_episodes
+    tracker = _PrefixTracker(records, should_stop)
+    next_episode = 0
+
+    def start(env):
+        nonlocal next_episode
+        if next_episode >= n_episodes:
+            return None
+        episode = next_episode
+        next_episode += 1
+        seed = base_seed + episode
+        obs, info = env.reset(seed=seed)
+        return {
+            'episode': episode,
+            'seed': seed,
+            'obs': obs,
+            'return': 0.0,
+            'steps': 0,
+            'start_position': tuple(int(v) for v in env.unwrapped.get_game_coords()),
+        }
+
+    slots = [start(env) for env in envs]
+    while any(slot is not None for slot in slots):
+        active = [i for i, slot in enumerate(slots) if slot is not None]
+        batch = {
+            key: np.stack([slots[i]['obs'][key] for i in active])
+            for key in slots[active[0]]['obs']
+        }
+        actions, _states = model.predict(batch, deterministic=deterministic)
+
+        for action, i in zip(actions, active):
+            slot = slots[i]
+            obs, reward, done, truncated, info = envs[i].step(action)
+            slot['obs'] = obs
+            slot['return'] += float(reward)
+            slot['steps'] += 1
+            if done or truncated or (max_steps and slot['steps'] >= max_steps):
+                record = _episode_record(
+                    envs[i], slot['seed'], slot['return'], slot['steps'],
+                    done, truncated, info, slot['start_position'],
+                )
+                record['episode'] = slot['episode']
+                records[slot['episode']] = record
+                if on_result is not None:
+                    on_result(record)
+                if tracker.update():
+                    return tracker.prefix()
+                slots[i] = start(envs[i])
+    return records
+
+
+class _PrefixTracker:
+    """Checks ``should_stop`` on each newly completed prefix of ``records``."""
+
+    def __init__(self, records: List[Optional[Dict[str, Any]]], should_stop):
+        self.records = records
+        self.should_stop = should_stop
+        self.done = 0
+
+    def update(self) -> bool:
+        while self.done < len(self.records) and self.records[self.done] is not None:
+            self.done += 1
+            if self.should_stop is not None and self.should_stop(self.records[:self.done]):
+                return True
+        return False
+
+    def prefix(self) -> List[Dict[str, Any]]:
+        return self.records[:self.done]
+
+
+def print_episode(record: Dict[str, Any]):
+    x, y, map_id = record['end_position']
+    print(f"  End position:   ({x}, {y}, map={map_id})")
+    print(f"  Episode length: {record['length']}")
+    print(f"  Episode return: {record['return']:.4f}")
+    print(f"  Success:        {'✓' if record['success'] else '✗'}")
+    print(f"  Reward breakdown:")
+    for comp, val in record['reward_components'].items():
+        print(f"    {comp:12s}: {val:8.4f}")
+
+
+def summarize_episodes(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold episode records (in episode order) into the eval result schema."""
+    returns = [r['return'] for r in records]
+    lengths = [r['length'] for r in records]
+    successes = [r['success'] for r in records]
+    results = {
+        'n_episodes': len(records),
+        'mean_return': float(np.mean(returns)),
+        'std_return': float(np.std(returns)),
+        'mean_length': float(np.mean(lengths)),
+        'std_length': float(np.std(lengths)),
+        'success_rate': float(np.mean(successes)),
+        'max_return': float(np.max(returns)),
+        'min_return': float(np.min(returns)),
+        'episode_returns': [float(r) for r in returns],
+        'episode_lengths': [int(l) for l in lengths],
+        'successes': [bool(s) for s in successes],
+        'episode_seeds': [r['seed'] for r in records],
+        'episode_reward_components': [r['reward_components'] for r in records],
+    }
+    if any(r['trajectory'] for r in records):
+        results['trajectories'] = [r['trajectory'] for r in records]
+    if any('obs_cache' in r for r in records):
+        from training.obs_cache import merge_cache_stats
+
+        results['obs_cache'] = merge_cache_stats([r['obs_cache'] for r in records if 'obs_cache' in r])
+    return results
+
+
+# --- process pool -----------------------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(
+    checkpoint: str,
+    env_config: Dict[str, Any],
+    device: str,
+    runtime: str = "sb3",
+    server: Optional[str] = None,
+    obs_cache: int = 0,
+    pids=None,
+):
+    import torch
+
+    from training.inference_server import PolicyClient
+    from training.obs_cache import ObservationCache
+    from training.policy_runtime import get_runtime
+
+    if pids is not None:
+        pids.put(os.getpid())
+    # one thread per worker; the pool provides the parallelism
+    torch.set_num_threads(1)
+    _worker['env'] = RedGymEnv(env_config)
+    if server is not None:
+        _worker['model'] = PolicyClient(server)
+    else:
+        _worker['model'] = get_runtime(checkpoint, runtime, device, num_threads=1)
+    _worker['obs_cache'] = ObservationCache(_worker['model'], obs_cache) if obs_cache else None
+    if _worker['obs_cache'] is not None:
+        _worker['model'] = _worker['obs_cache']
+
+
+def _worker_episode(episode: int, seed: int, max_steps: int, deterministic: bool) -> Dict[str, Any]:
+    record = run_episode(_worker['model'], _worker['env'], max_steps, seed=seed, deterministic=deterministic)
+    record['episode'] = episode
+    if _worker['obs_cache'] is not None:
+        record['obs_cache'] = _worker['obs_cache'].stats(reset=True)
+    return record
+
+
+def init_single_thread():
+    """Pool initializer: one torch thread per worker; the pool provides the parallelism."""
+    import torch
+
+    torch.set_num_threads(1)
+
+
+def evaluate_checkpoint(
+    checkpoint: Path,
+    env_config: Dict[str, Any],
+    n_episodes: int,
+    max_steps: int,
+    base_seed: int = 0,
+    deterministic: bool = True,
+    device: str = "cpu",
+    runtime: str = "sb3",
+) -> Dict[str, Any]:
+    """
+    Load ``checkpoint``, run episodes ``base_seed + i`` on one env and return
+    the summary. Self-contained so pools can schedule one checkpoint per task
+    (use ``init_single_thread`` as the pool initializer). ``runtime`` picks the
+    inference backend (training/policy_runtime.py).
+    """
+    from training.policy_runtime import get_runtime
+
+    env = RedGymEnv(env_config)
+    try:
+        model = get_runtime(checkpoint, runtime, device)
+        records = [
+            dict(run_episode(model, env, max_steps, seed=base_seed + ep, deterministic=deterministic), episode=ep)
+            for ep in range(n_episodes)
+        ]
+    finally:
+        env.close()
+    return summarize_episodes(records)
+
+
+def _abandon_pool(pool: ProcessPoolExecutor, pids):
+    """
+    Cancel queued tasks and kill the workers, so running episodes do not run
+    to the end. ``pids`` is the queue the workers' ``_init_worker`` reported to.
+    """
+    pool.shutdown(wait=False, cancel_futures=True)
+    while not pids.empty():
+        try:
+            os.kill(pids.get(), signal.SIGTERM)
+        except OSError:  # already exited
+            pass
+
+
+def run_parallel_episodes(
+    checkpoint: Path,
+    env_config: Dict[str, Any],
+    n_episodes: int,
+    max_steps: int,
+    workers: int,
+    base_seed: int = 0,
+    deterministic: bool = True,
+    device: str = "cpu",
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    should_stop: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+    runtime: str = "sb3",
+    server: Optional[str] = None,
+    obs_cache: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Run episodes ``base_seed + i`` on a pool of ``workers`` processes.
+
+    ``on_result`` is called with each record as it arrives; the returned list
+    is in episode order. When ``should_stop`` accepts a prefix, queued episodes
+    are cancelled, running ones are killed with their workers, and the prefix
+    is returned. With ``server`` (an
+    ``InferenceServer`` address) the workers share its policy instead of each
+    loading the checkpoint. ``obs_cache`` > 0 puts an ``ObservationCache`` of
+    that many entries in front of each worker's policy.
+    """
+    records: List[Optional[Dict[str, Any]]] = [None] * n_episodes
+    tracker = _PrefixTracker(records, should_stop)
+    ctx = mp.get_context("spawn")
+    pids = ctx.SimpleQueue()
+    with ProcessPoolExecutor(
+        max_workers=min(workers, n_episodes),
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(str(checkpoint), env_config, device, runtime, server, obs_cache, pids),
+    ) as pool:
+        futures = [
+            pool.submit(_worker_episode, ep, base_seed + ep, max_steps, deterministic)
+            for ep in range(n_episodes)
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            records[record['episode']] = record
+            if on_result is not None:
+                on_result(record)
+            if tracker.update():
+                _abandon_pool(pool, pids)
+                return tracker.prefix()
+    return records
@@ -0,0 +1,308 @@
+"""
+Batched policy inference shared by many env processes.
+
+``InferenceServer`` loads a checkpoint once (as a ``PolicyRuntime``, see
+training/policy_runtime.py) and answers observation requests from any number
+of clients over a Unix socket (a filesystem path) or TCP (``host:port``).
+Requests are batched dynamically: the server runs a forward pass as soon as
+every connected client is waiting, ``max_batch`` observations are queued, or
+the oldest request has waited ``max_latency_ms``, whichever comes first.
+
+``PolicyClient`` is the env side. It has the ``predict`` signature the eval
+runners use, so it drops in wherever a policy or runtime does
+(``run_episode``, ``run_batched_episodes``, pool workers, play_checkpoint).
+The server returns logits and the client picks the action: the argmax, or a
+sample from the client's own torch RNG. Seeded stochastic episodes therefore
+repeat exactly as with a local runtime, however requests get batched.
+
+Wire format (``multiprocessing.connection`` messages):
+    server -> client on connect: JSON spec (keys, env-layout shapes, dtypes, n_actions)
+    client -> server: ``<BI`` header (op, n) + the n observations' arrays, key by key
+    server -> client: n x n_actions float32 logits (``OP_LOGITS``) or JSON (``OP_STATS``)
+
+``start_inference_server`` runs a server in a child process for the duration
+of an eval; ``tools/serve_policy.py`` runs a standalone one.
+"""
+
+import json
+import multiprocessing as mp
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from training.policy_runtime import actions_from_logits, batch_observation, get_runtime
+
+HEADER = struct.Struct("<BI")
+OP_LOGITS = 1
+OP_STATS = 2
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_LATENCY_MS = 2.0
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(address: str) -> Address:
+    """``host:port`` for TCP, anything else is a Unix socket path."""
+    host, sep, port = str(address).rpartition(":")
+    if sep and host and port.isdigit():
+        return host, int(port)
+    return str(address)
+
+
+def default_address() -> str:
+    return str(Path(tempfile.gettempdir()) / f"pokered-policy-{os.getpid()}.sock")
+
+
+@dataclass
+class _Request:
+    conn: Connection
+    n: int
+    arrays: List[np.ndarray]
+    received: float
+
+
+class InferenceServer:
+    """Serves one checkpoint's logits to many ``PolicyClient`` connections."""
+
+    def __init__(
+        self,
+        checkpoint: Path,
+        address: Optional[str] = None,
+        runtime: str = "torchscript",
+        num_threads: Optional[int] = None,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_latency_ms: float = DEFAULT_MAX_LATENCY_MS,
+    ):
+        if runtime == "sb3":
+            runtime = "torch"  # the same graph, with logits exposed
+        self.checkpoint = Path(checkpoint)
+        self.address = parse_address(address or default_address())
+        self.runtime = get_runtime(self.checkpoint, runtime, num_threads=num_threads)
+        self.max_batch = max(max_batch, 1)
+        self.max_latency = max_latency_ms / 1000
+        self.spec = json.dumps(
+            {
+                "keys": list(self.runtime.keys),
+                "shapes": [list(shape) for shape in self.runtime.shapes],
+                "dtypes": [dtype.name for dtype in self.runtime.dtypes],
+                "n_actions": self.runtime.n_actions,
+                "checkpoint": str(self.checkpoint),
+                "backend": self.runtime.backend,
+            }
+        ).encode()
+        self._row_bytes = [
+            int(np.prod(shape)) * dtype.itemsize for shape, dtype in zip(self.runtime.shapes, self.runtime.dtypes)
+        ]
+        self._requests: "queue.Queue[_Request]" = queue.Queue()
+        self._clients = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._listener: Optional[Listener] = None
+        self.requests = 0
+        self.observations = 0
+        self.batches = 0
+        self.clients_served = 0
+        self._latency_total = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": self._clients,
+                "clients_served": self.clients_served,
+                "requests": self.requests,
+                "observations": self.observations,
+                "batches": self.batches,
+                "mean_batch": self.observations / self.batches if self.batches else 0.0,
+                "mean_latency_ms": self._latency_total / self.requests * 1000 if self.requests else 0.0,
+            }
+
+    def serve_forever(self, ready: Optional[Any] = None):
+        """Accept clients until ``close``; ``ready`` (an Event) is set once listening."""
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # left behind by a killed server
+        self._listener = Listener(self.address)
+        threading.Thread(target=self._batch_loop, name="inference-batcher", daemon=True).start()
+        if ready is not None:
+            ready.set()
+        try:
+            while not self._closed.is_set():
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    break  # listener closed
+                conn.send_bytes(self.spec)
+                with self._lock:
+                    self._clients += 1
+                    self.clients_served += 1
+                threading.Thread(target=self._read_loop, args=(conn,), name="inference-client", daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.close()
+
+    def _read_loop(self, conn: Connection):
+        try:
+            while True:
+                message = conn.recv_bytes()
+                op, n = HEADER.unpack_from(message)
+                if op == OP_STATS:
+                    conn.send_bytes(json.dumps(self.stats()).encode())
+                    continue
+                arrays, offset = [], HEADER.size
+                for shape, dtype, row_bytes in zip(self.runtime.shapes, self.runtime.dtypes, self._row_bytes):
+                    count = n * row_bytes // dtype.itemsize
+                    arrays.append(np.frombuffer(message, dtype=dtype, count=count, offset=offset).reshape(n, *shape))
+                    offset += n * row_bytes
+                self._requests.put(_Request(conn, n, arrays, time.monotonic()))
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._clients -= 1
+            conn.close()
+
+    def _batch_loop(self):
+        while not self._closed.is_set():
+            try:
+                first = self._requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch, rows = [first], first.n
+            deadline = first.received + self.max_latency
+            while rows < self.max_batch:
+                try:
+                    request = self._requests.get_nowait()
+                except queue.Empty:
+                    # nothing queued: wait for the rest unless every client is already in
+                    timeout = deadline - time.monotonic()
+                    if len(batch) >= self._clients or timeout <= 0:
+                        break
+                    try:
+                        request = self._requests.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                batch.append(request)
+                rows += request.n
+            self._run(batch)
+
+    def _run(self, batch: List[_Request]):
+        observation = {key: np.concatenate([r.arrays[i] for r in batch]) for i, key in enumerate(self.runtime.keys)}
+        logits = self.runtime.logits(observation).astype(np.float32, copy=False)
+        now = time.monotonic()
+        start = 0
+        for request in batch:
+            try:
+                request.conn.send_bytes(logits[start:start + request.n].tobytes())
+            except OSError:
+                pass  # client went away; its reader cleans up
+            start += request.n
+        with self._lock:
+            self.requests += len(batch)
+            self.observations += start
+            self.batches += 1
+            self._latency_total += sum(now - r.received for r in batch)
+
+
+class PolicyClient:
+    """
+    ``predict``-compatible stand-in for a policy, backed by an ``InferenceServer``.
+
+    One client per process (or per thread): requests on a connection are
+    answered in order.
+    """
+
+    def __init__(self, address: str, timeout: float = 0.0):
+        self.address = parse_address(address)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._conn = Client(self.address)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+        spec = json.loads(self._conn.recv_bytes())
+        self.keys = tuple(spec["keys"])
+        self.shapes = tuple(tuple(shape) for shape in spec["shapes"])
+        self.dtypes = tuple(np.dtype(dtype) for dtype in spec["dtypes"])
+        self.n_actions = spec["n_actions"]
+        self.backend = spec["backend"]
+        self.checkpoint = spec["checkpoint"]
+
+    def logits(self, observation: Dict[str, Any]) -> np.ndarray:
+        arrays, _ = batch_observation(observation, self.keys, self.shapes, self.dtypes)
+        return self._logits(arrays)
+
+    def _logits(self, arrays: List[np.ndarray]) -> np.ndarray:
+        n = arrays[0].shape[0]
+        self._conn.send_bytes(HEADER.pack(OP_LOGITS, n) + b"".join(a.tobytes() for a in arrays))
+        return np.frombuffer(self._conn.recv_bytes(), dtype=np.float32).reshape(n, self.n_actions)
+
+    def predict(
+        self,
+        observation: Dict[str, Any],
+        state: Any = None,
+        episode_start: Any = None,
+        deterministic: bool = False,
+    ) -> Tuple[np.ndarray, None]:
+        arrays, single = batch_observation(observation, self.keys, self.shapes, self.dtypes)
+        actions = actions_from_logits(self._logits(arrays).copy(), deterministic)
+        return (actions[0] if single else actions), None
+
+    def stats(self) -> Dict[str, Any]:
+        self._conn.send_bytes(HEADER.pack(OP_STATS, 0))
+        return json.loads(self._conn.recv_bytes())
+
+    def close(self):
+        self._conn.close()
+
+
+def _serve(checkpoint: str, address: str, options: Dict[str, Any], ready):
+    import torch
+
+    torch.set_num_threads(options.get("num_threads") or 1)
+    InferenceServer(Path(checkpoint), address, **options).serve_forever(ready)
+
+
+def start_inference_server(
+    checkpoint: Path, address: Optional[str] = None, timeout: float = 60.0, **options: Any
+) -> Tuple[mp.Process, str]:
+    """
+    Run an ``InferenceServer`` for ``checkpoint`` in a child process; returns
+    the process (``terminate`` it when done) and the address to connect to.
+    ``options`` go to ``InferenceServer``.
+    """
+    address = address or default_address()
+    ctx = mp.get_context("spawn")
+    ready = ctx.Event()
+    process = ctx.Process(target=_serve, args=(str(checkpoint), address, options, ready), daemon=True)
+    process.start()
+    deadline = time.monotonic() + timeout
+    while not ready.wait(0.1):
+        if not process.is_alive():
+            raise RuntimeError(f"Inference server for {checkpoint} exited with code {process.exitcode}")
+        if time.monotonic() >= deadline:
+            process.terminate()
+            raise TimeoutError(f"Inference server for {checkpoint} did not start within {timeout:.0f}s")
+    return process, address
+
+
+def stop_inference_server(process: mp.Process, address: str):
+    process.terminate()
+    process.join(timeout=5)
+    address = parse_address(address)
+    if isinstance(address, str) and os.path.exists(address):
+        os.unlink(address)
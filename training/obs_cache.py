@@ -0,0 +1,134 @@
+"""
+Observation-hash cache in front of a policy for repeated states.
+
+Menus, text boxes and wall-bumping loops produce byte-identical observations
+for many consecutive steps. ``ObservationCache`` wraps anything with the eval
+runners' ``predict`` and remembers the policy output for each observation,
+keyed by a BLAKE2b digest of its arrays, in an LRU of ``max_entries``.
+
+What is cached depends on the wrapped model:
+
+- ``PolicyRuntime`` / ``PolicyClient`` (anything with ``logits``): the logits.
+  Deterministic calls take the argmax, stochastic calls sample from them with
+  the torch RNG, so both modes are served and stochastic episodes draw the same
+  actions as without the cache (batched misses can differ in the last bits,
+  since the forward pass sees a smaller batch).
+- an SB3 policy: the deterministic action. Stochastic calls bypass the cache.
+
+Batched observations are looked up row by row, and only the misses go to the
+model, as one smaller batch. ``stats()`` reports hits, misses and hit rate.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from training.policy_runtime import actions_from_logits
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+def observation_digest(observation: Dict[str, np.ndarray]) -> bytes:
+    """128-bit digest of one (unbatched) observation's arrays, in key order."""
+    h = hashlib.blake2b(digest_size=16)
+    for value in observation.values():
+        h.update(np.ascontiguousarray(value))
+    return h.digest()
+
+
+def merge_cache_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum per-episode or per-worker ``ObservationCache.stats`` counters."""
+    hits = sum(s["hits"] for s in stats)
+    misses = sum(s["misses"] for s in stats)
+    bypassed = sum(s["bypassed"] for s in stats)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "bypassed": bypassed,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+class ObservationCache:
+    """LRU of policy outputs keyed by observation digest; a drop-in for ``model``."""
+
+    def __init__(self, model, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.model = model
+        self.max_entries = max(max_entries, 1)
+        self.caches_logits = hasattr(model, "logits")
+        if hasattr(model, "shapes"):
+            self._keys = tuple(model.keys)
+            self._ndim = len(model.shapes[0])
+        else:  # SB3 policy: the env layout has as many dims as the policy's space
+            self._keys = tuple(model.observation_space.spaces)
+            self._ndim = len(model.observation_space[self._keys[0]].shape)
+        self._entries: "OrderedDict[bytes, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def stats(self, reset: bool = False) -> Dict[str, Any]:
+        """Counters since creation (or the last ``reset``)."""
+        stats = merge_cache_stats([{"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed}])
+        stats["entries"] = len(self._entries)
+        if reset:
+            self.hits = self.misses = self.bypassed = 0
+        return stats
+
+    def clear(self):
+        self._entries.clear()
+
+    def predict(
+        self,
+        observation: Dict[str, Any],
+        state: Any = None,
+        episode_start: Any = None,
+        deterministic: bool = False,
+    ) -> Tuple[np.ndarray, None]:
+        single = np.ndim(observation[self._keys[0]]) == self._ndim
+        if not deterministic and not self.caches_logits:
+            self.bypassed += 1 if single else len(observation[self._keys[0]])
+            return self.model.predict(observation, deterministic=False)
+        batch = {key: np.asarray(observation[key]) for key in self._keys}
+        if single:
+            batch = {key: value[None] for key, value in batch.items()}
+        outputs = self._lookup(batch)
+        if self.caches_logits:
+            actions = actions_from_logits(np.stack(outputs), deterministic)
+        else:
+            actions = np.array(outputs)
+        return (actions[0] if single else actions), None
+
+    def _lookup(self, batch: Dict[str, np.ndarray]) -> List[Any]:
+        n = len(batch[self._keys[0]])
+        digests = [observation_digest({key: value[i] for key, value in batch.items()}) for i in range(n)]
+        outputs: List[Any] = [None] * n
+        missing: Dict[bytes, List[int]] = {}
+        for i, digest in enumerate(digests):
+            cached = self._entries.get(digest)
+            if cached is not None:
+                self._entries.move_to_end(digest)
+                outputs[i] = cached
+                self.hits += 1
+            elif digest in missing:
+                missing[digest].append(i)  # repeats within a batch share the first one's row
+                self.hits += 1
+            else:
+                missing[digest] = [i]
+                self.misses += 1
+        if missing:
+            rows = [indices[0] for indices in missing.values()]
+            sub_batch = {key: value[rows] for key, value in batch.items()}
+            if self.caches_logits:
+                fresh = [row.copy() for row in self.model.logits(sub_batch)]
+            else:
+                fresh = list(self.model.predict(sub_batch, deterministic=True)[0])
+            for (digest, indices), output in zip(missing.items(), fresh):
+                self._entries[digest] = output
+                for i in indices:
+                    outputs[i] = output
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return outputs
@@ -1,8 +1,6 @@
 import argparse
-import time
 import sys
 from pathlib import Path
-from typing import Optional, Tuple
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
@@ -10,21 +8,14 @@ if str(REPO_ROOT) not in sys.path:
 
 from env.red_gym_env import RedGymEnv
 from env.stream_agent_wrapper import StreamWrapper
-from stable_baselines3 import PPO
-
-
-def find_latest_checkpoint(run_dir: Path) -> Optional[Tuple[Path, float]]:
-    zip_files = list(run_dir.glob("**/*.zip"))
-    if not zip_files:
-        return None
-    most_recent = max(zip_files, key=lambda p: p.stat().st_mtime)
-    age_hours = (time.time() - most_recent.stat().st_mtime) / 3600
-    return most_recent, age_hours
+from training.checkpoint_manifest import find_latest_checkpoint
+from training.inference_server import PolicyClient
+from training.policy_runtime import RUNTIMES, get_runtime
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Play a trained checkpoint interactively.")
-    parser.add_argument("--checkpoint", type=Path, default=None, help="Path to checkpoint .zip. Defaults to latest in runs/.")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="Checkpoint .zip or weights-only policy file. Defaults to latest in runs/.")
     parser.add_argument("--runs-dir", type=Path, default=Path("runs"), help="Directory to search for checkpoints.")
     parser.add_argument("--rom", type=Path, default=Path("PokemonRed.gb"), help="Path to Pokemon Red ROM.")
     parser.add_argument("--state", type=Path, default=Path("init.state"), help="Initial save state path.")
@@ -32,6 +23,9 @@ def parse_args():
     parser.add_argument("--stream", action="store_true", default=True, help="Enable map streaming.")
     parser.add_argument("--no-stream", dest="stream", action="store_false", help="Disable map streaming.")
     parser.add_argument("--steps", type=int, default=None, help="Stop after this many steps (default: full episode).")
+    parser.add_argument("--runtime", choices=RUNTIMES, default="sb3", help="Inference backend (see training/policy_runtime.py).")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op inference threads for --runtime.")
+    parser.add_argument("--server", default=None, help="Use the policy of a running tools/serve_policy.py at this address instead of loading a checkpoint.")
     return parser.parse_args()
 
 
@@ -44,15 +38,14 @@ if __name__ == "__main__":
         raise FileNotFoundError(f"State file not found at {args.state}")
 
     checkpoint = args.checkpoint
-    if checkpoint is None:
+    if checkpoint is None and args.server is None:
         latest = find_latest_checkpoint(args.runs_dir)
         if latest is None:
             raise FileNotFoundError("No checkpoint found. Provide --checkpoint or place .zip files under runs/.")
         checkpoint, age = latest
         print(f"Using latest checkpoint: {checkpoint} (age: {age:.2f} hours)")
-    else:
-        if not checkpoint.exists():
-            raise FileNotFoundError(f"Checkpoint not found at {checkpoint}")
+    elif checkpoint is not None and not checkpoint.exists():
+        raise FileNotFoundError(f"Checkpoint not found at {checkpoint}")
 
     ep_length = 2**23
     env_config = {
@@ -86,7 +79,11 @@ if __name__ == "__main__":
     else:
         env = base_env
 
-    model = PPO.load(str(checkpoint), env=env, custom_objects={"lr_schedule": 0, "clip_range": 0})
+    if args.server is not None:
+        model = PolicyClient(args.server)
+        print(f"Using inference server at {args.server} ({model.checkpoint})")
+    else:
+        model = get_runtime(checkpoint, args.runtime, num_threads=args.threads)
 
     obs, info = env.reset()
     max_steps = args.steps or ep_length
@@ -0,0 +1,247 @@
+"""
+In-memory model snapshots and atomic checkpoint files.
+
+``snapshot_model`` copies everything ``BaseAlgorithm.save`` would write (the
+serialized attributes, policy and optimizer state dicts) into CPU memory, so
+the training thread only pays for a tensor copy. ``write_model_zip`` later
+turns a snapshot into the same zip layout SB3 writes, loadable with
+``PPO.load``. Weights-only files hold just the policy state dict and are much
+smaller than the zip, which also carries optimizer state.
+
+Every file is written to ``<name>.tmp`` and renamed into place, so readers
+never see a partial checkpoint.
+
+Weights-only files (``weights/poke_<steps>_steps.pt`` from the checkpoint
+writer, or ``<checkpoint>.policy.pt`` from ``export_policy``) also carry the
+policy spec: class, kwargs and spaces, serialized the way SB3 serializes them
+in the zip. ``load_policy`` builds just the inference policy from either
+format, with no algorithm, rollout buffer or optimizer state. On CPU it
+memory-maps the weights file and uses the mapped tensors as the parameters, so
+worker processes share the pages instead of each holding a copy.
+``get_policy`` keeps loaded policies in a small per-process ``PolicyCache``, so
+a worker that plays many episodes or several checkpoints reads each file once.
+"""
+
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import stable_baselines3 as sb3
+import torch as th
+from stable_baselines3.common.policies import BasePolicy
+from stable_baselines3.common.save_util import data_to_json, json_to_data, load_from_zip_file
+from stable_baselines3.common.utils import get_device, get_system_info
+
+POLICY_SUFFIX = ".policy.pt"
+POLICY_SPEC_KEYS = ("policy_class", "policy_kwargs", "observation_space", "action_space", "use_sde")
+# schedules are not needed for inference and may not unpickle across Python versions
+CUSTOM_OBJECTS = {"lr_schedule": 0, "clip_range": 0}
+
+
+@dataclass
+class ModelSnapshot:
+    num_timesteps: int
+    data_json: str
+    params: Dict[str, Dict[str, Any]]
+    pytorch_variables: Dict[str, Any]
+
+
+def _clone_to_cpu(obj: Any, memo: Optional[Dict[Tuple[str, int], Any]] = None) -> Any:
+    # tensors sharing a storage (SB3's shared features extractors) keep sharing their copy
+    memo = {} if memo is None else memo
+    if isinstance(obj, th.Tensor):
+        tensor = obj.detach()
+        storage = tensor.untyped_storage()
+        key = (str(storage.device), storage.data_ptr())
+        if key not in memo:
+            memo[key] = storage.clone() if storage.device.type == "cpu" else storage.cpu()
+        return th.empty(0, dtype=tensor.dtype).set_(memo[key], tensor.storage_offset(), tensor.size(), tensor.stride())
+    if isinstance(obj, dict):
+        return {key: _clone_to_cpu(value, memo) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_clone_to_cpu(value, memo) for value in obj)
+    return obj
+
+
+def snapshot_model(model) -> ModelSnapshot:
+    """Copy what ``model.save`` would write; safe to serialize from another thread."""
+    data = model.__dict__.copy()
+    exclude = set(model._excluded_save_params())
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    for name in state_dicts_names + torch_variable_names:
+        exclude.add(name.split(".")[0])
+    for name in exclude:
+        data.pop(name, None)
+    pytorch_variables = {}
+    for name in torch_variable_names:
+        obj = model
+        for attr in name.split("."):
+            obj = getattr(obj, attr)
+        pytorch_variables[name] = obj
+    memo: Dict[Tuple[str, int], Any] = {}
+    return ModelSnapshot(
+        num_timesteps=int(model.num_timesteps),
+        # serialized now: the attributes are live objects the learner keeps mutating
+        data_json=data_to_json(data),
+        params=_clone_to_cpu(model.get_parameters(), memo),
+        pytorch_variables=_clone_to_cpu(pytorch_variables, memo),
+    )
+
+
+def atomic_write(path: Path, write_fn: Callable[[Path], None]):
+    """Call ``write_fn(tmp_path)`` and rename the result to ``path``."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        write_fn(tmp)
+        with tmp.open("rb") as f:
+            os.fsync(f.fileno())
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def write_model_zip(snapshot: ModelSnapshot, path: Path):
+    """Write ``snapshot`` as an SB3 model zip (same entries as ``save_to_zip_file``)."""
+
+    def write(tmp: Path):
+        with zipfile.ZipFile(tmp, mode="w") as archive:
+            archive.writestr("data", snapshot.data_json)
+            with archive.open("pytorch_variables.pth", mode="w", force_zip64=True) as f:
+                th.save(snapshot.pytorch_variables, f)
+            for name, state_dict in snapshot.params.items():
+                with archive.open(name + ".pth", mode="w", force_zip64=True) as f:
+                    th.save(state_dict, f)
+            archive.writestr("_stable_baselines3_version", sb3.__version__)
+            archive.writestr("system_info.txt", get_system_info(print_info=False)[1])
+
+    atomic_write(path, write)
+
+
+def _spec_json(data_json: str) -> str:
+    data = json.loads(data_json)
+    return json.dumps({key: data[key] for key in POLICY_SPEC_KEYS if key in data})
+
+
+def _write_policy_file(path: Path, num_timesteps: int, spec_json: str, state_dict: Dict[str, th.Tensor]):
+    payload = {"num_timesteps": num_timesteps, "spec": spec_json, "policy": state_dict}
+    atomic_write(path, lambda tmp: th.save(payload, tmp))
+
+
+def write_policy_weights(snapshot: ModelSnapshot, path: Path):
+    """Weights-only file: the policy state dict, its spec and the timestep it was taken at."""
+    _write_policy_file(path, snapshot.num_timesteps, _spec_json(snapshot.data_json), snapshot.params["policy"])
+
+
+def export_policy(checkpoint: Path, path: Optional[Path] = None) -> Path:
+    """Write the inference policy of an SB3 zip as ``<checkpoint>.policy.pt`` (or ``path``)."""
+    checkpoint = Path(checkpoint)
+    path = Path(path) if path is not None else checkpoint.with_name(checkpoint.stem + POLICY_SUFFIX)
+    data, params, _ = load_from_zip_file(checkpoint, custom_objects=CUSTOM_OBJECTS, device="cpu")
+    spec = {key: data[key] for key in POLICY_SPEC_KEYS if key in data}
+    _write_policy_file(path, int(data.get("num_timesteps", 0)), data_to_json(spec), params["policy"])
+    return path
+
+
+def load_policy_weights(model, path: Path) -> int:
+    """Load a weights-only file into ``model.policy``; returns its timestep."""
+    payload = th.load(path, map_location=model.device, weights_only=True)
+    model.policy.load_state_dict(payload["policy"])
+    return int(payload["num_timesteps"])
+
+
+def build_policy(spec: Dict[str, Any], state_dict: Dict[str, th.Tensor], device: th.device) -> BasePolicy:
+    """Inference policy from a deserialized spec, using the ``state_dict`` tensors as its parameters."""
+    policy_kwargs = dict(spec.get("policy_kwargs") or {})
+    policy_kwargs.pop("device", None)
+    if "use_sde" in spec:
+        policy_kwargs["use_sde"] = spec["use_sde"]
+    def make():
+        return spec["policy_class"](spec["observation_space"], spec["action_space"], lambda _: 0.0, **policy_kwargs)
+
+    # built without storage (skipping the random init), then pointed at the loaded tensors
+    try:
+        with th.device("meta"):
+            policy = make()
+        assign = True
+    except NotImplementedError:
+        # a parameter-less features extractor makes SB3 report the device as "cpu"
+        # and move the MLP extractor there, which meta tensors cannot do
+        policy = make()
+        assign = False
+    policy.optimizer = None  # only needed for training
+    policy.load_state_dict(state_dict, assign=assign)
+    policy.set_training_mode(False)
+    return policy.to(device)
+
+
+def load_policy(path: Path, device: str = "auto") -> BasePolicy:
+    """
+    Inference policy from an SB3 zip or a weights-only file; use it like
+    ``model.predict`` (``policy.predict(obs, deterministic=...)``).
+    """
+    path = Path(path)
+    device = get_device(device)
+    if path.suffix == ".zip":
+        data, params, _ = load_from_zip_file(path, custom_objects=CUSTOM_OBJECTS, device="cpu")
+        spec = {key: data[key] for key in POLICY_SPEC_KEYS if key in data}
+        return build_policy(spec, params["policy"], device)
+    payload = th.load(path, map_location="cpu", mmap=True, weights_only=True)
+    if "spec" not in payload:
+        raise ValueError(f"{path} has no policy spec; load it into a model with load_policy_weights")
+    return build_policy(json_to_data(payload["spec"], custom_objects=CUSTOM_OBJECTS), payload["policy"], device)
+
+
+class PolicyCache:
+    """
+    Loaded policies keyed by (path, loader args), reloaded when the file changes.
+
+    Holds at most ``max_entries`` policies, dropping the least recently used.
+    ``loader(path, *args)`` builds an entry (``load_policy`` by default).
+    """
+
+    def __init__(self, max_entries: int = 4, loader: Optional[Callable[..., Any]] = None):
+        self.max_entries = max(max_entries, 1)
+        self.loader = loader or load_policy
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[Tuple[int, int], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, *args: Any) -> Any:
+        path = Path(path).resolve()
+        key = (str(path), *args)
+        stat = path.stat()
+        version = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+        policy = self.loader(path, *args)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (version, policy)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return policy
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_policy_cache = PolicyCache()
+
+
+def get_policy(path: Path, device: str = "auto") -> BasePolicy:
+    """``load_policy`` through this process's ``PolicyCache``."""
+    return _policy_cache.get(path, str(get_device(device)))
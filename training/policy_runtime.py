@@ -0,0 +1,336 @@
+"""
+Exported policy graphs and a CPU inference runtime for them.
+
+``PolicyGraph`` is the inference half of a ``MultiInputPolicy`` as a plain
+module: raw ``RedGymEnv`` observation arrays in (channel-last images, env
+dtypes, a leading batch dimension), action logits out. The transpose to
+channel-first, SB3's observation preprocessing, the feature extractors, the
+actor MLP and the action head are all inside it, so it can be traced to
+TorchScript (``export_torchscript``) or ONNX (``export_onnx``).
+
+``PolicyRuntime`` runs one of those graphs and has the ``predict`` signature
+the eval runners use (``run_episode``, ``run_batched_episodes``). It takes a
+single observation dict or a batch, casts each key to the dtype the graph was
+traced with and returns ``(actions, None)``. Deterministic actions are the
+argmax of the logits. Stochastic actions sample a ``Categorical`` from the
+torch RNG like SB3 does, so seeded episodes match ``model.predict``.
+
+Backends:
+    torch        the graph run eagerly under ``inference_mode``
+    torchscript  traced and frozen (``<checkpoint>.policy.ts`` files)
+    onnx         onnxruntime (``<checkpoint>.policy.onnx`` files); needs
+                 ``pip install onnx onnxruntime``
+
+``num_threads`` pins the intra-op thread count. For the torch backends this
+is process-wide (``torch.set_num_threads``). ``max_batch`` splits larger
+batches into chunks. ``get_runtime`` is the runtime counterpart of
+``policy_io.get_policy``, and ``"sb3"`` returns the plain SB3 policy.
+"""
+
+import copy
+import io
+import json
+import warnings
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from stable_baselines3.common.policies import BaseModel
+from stable_baselines3.common.preprocessing import is_image_space, is_image_space_channels_first
+
+from training.policy_io import PolicyCache, get_policy, load_policy
+
+try:
+    import onnxruntime as ort
+except ImportError:  # only needed for the onnx backend
+    ort = None
+
+RUNTIMES = ("sb3", "torch", "torchscript", "onnx")
+TORCHSCRIPT_SUFFIX = ".policy.ts"
+ONNX_SUFFIX = ".policy.onnx"
+META_FILE = "policy_runtime.json"
+
+ONNX_DTYPES = {
+    "tensor(uint8)": np.uint8,
+    "tensor(int8)": np.int8,
+    "tensor(int64)": np.int64,
+    "tensor(float)": np.float32,
+}
+
+
+class PolicyGraph(th.nn.Module):
+    """Batched raw observation arrays (in ``keys`` order) -> action logits."""
+
+    def __init__(self, policy):
+        super().__init__()
+        self.policy = policy
+        obs_spaces = policy.observation_space.spaces
+        self.keys = tuple(obs_spaces)
+        # images the policy sees channel-first arrive channel-last from the env
+        self.channel_last_keys = tuple(
+            key for key in self.keys
+            if is_image_space(obs_spaces[key], check_channels=False) and is_image_space_channels_first(obs_spaces[key])
+        )
+        self.shapes = tuple(self._env_shape(key, obs_spaces[key]) for key in self.keys)
+        self.dtypes = tuple(np.dtype(obs_spaces[key].dtype).name for key in self.keys)
+        self.n_actions = int(policy.action_space.n)
+
+    def _env_shape(self, key: str, space: spaces.Space) -> Tuple[int, ...]:
+        shape = tuple(int(s) for s in space.shape)
+        if key in self.channel_last_keys:
+            return shape[1:] + shape[:1]
+        return shape
+
+    def forward(self, *inputs: th.Tensor) -> th.Tensor:
+        obs = {}
+        for key, value in zip(self.keys, inputs):
+            obs[key] = value.permute(0, 3, 1, 2) if key in self.channel_last_keys else value
+        features = BaseModel.extract_features(self.policy, obs, self.policy.pi_features_extractor)
+        latent_pi = self.policy.mlp_extractor.forward_actor(features)
+        return self.policy.action_net(latent_pi)
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "keys": list(self.keys),
+            "shapes": [list(shape) for shape in self.shapes],
+            "dtypes": list(self.dtypes),
+            "n_actions": self.n_actions,
+        }
+
+    def example_inputs(self, batch_size: int = 2) -> Tuple[th.Tensor, ...]:
+        return tuple(
+            th.zeros((batch_size, *shape), dtype=getattr(th, dtype))
+            for shape, dtype in zip(self.shapes, self.dtypes)
+        )
+
+
+def _cpu_graph(policy) -> PolicyGraph:
+    return PolicyGraph(copy.deepcopy(policy).to("cpu").eval())
+
+
+@contextmanager
+def _quiet_jit():
+    # torch.jit still works on this torch but warns on every call
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        yield
+
+
+def trace_torchscript(policy) -> Tuple[th.jit.ScriptModule, Dict[str, Any]]:
+    graph = _cpu_graph(policy)
+    with _quiet_jit(), th.no_grad():
+        traced = th.jit.trace(graph, graph.example_inputs(), check_trace=False)
+        return th.jit.freeze(traced.eval()), graph.metadata()
+
+
+def export_torchscript(policy, path: Path) -> Path:
+    """Trace ``policy`` (an SB3 policy) into a TorchScript file with its input spec."""
+    module, meta = trace_torchscript(policy)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _quiet_jit():
+        th.jit.save(module, str(path), _extra_files={META_FILE: json.dumps(meta)})
+    return path
+
+
+def _onnx_bytes(policy) -> bytes:
+    graph = _cpu_graph(policy)
+    buffer = io.BytesIO()
+    with th.no_grad():
+        th.onnx.export(
+            graph,
+            graph.example_inputs(),
+            buffer,
+            input_names=list(graph.keys),
+            output_names=["logits"],
+            dynamic_axes={name: {0: "batch"} for name in [*graph.keys, "logits"]},
+            dynamo=False,
+        )
+    return buffer.getvalue()
+
+
+def export_onnx(policy, path: Path) -> Path:
+    """Export ``policy`` (an SB3 policy) as an ONNX graph; input names are the observation keys."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(_onnx_bytes(policy))
+    return path
+
+
+def _require_onnxruntime():
+    if ort is None:
+        raise ImportError("onnxruntime is required for the 'onnx' runtime (pip install onnx onnxruntime)")
+
+
+class PolicyRuntime:
+    """
+    Runs an exported policy graph on raw observations.
+
+    ``forward`` takes the batched input arrays in ``keys`` order and returns
+    logits as a numpy array.
+    """
+
+    def __init__(
+        self,
+        forward: Callable[[List[np.ndarray]], np.ndarray],
+        keys: Sequence[str],
+        shapes: Sequence[Sequence[int]],
+        dtypes: Sequence[str],
+        n_actions: int,
+        backend: str,
+        max_batch: Optional[int] = None,
+    ):
+        self._forward = forward
+        self.keys = tuple(keys)
+        self.shapes = tuple(tuple(shape) for shape in shapes)
+        self.dtypes = tuple(np.dtype(dtype) for dtype in dtypes)
+        self.n_actions = n_actions
+        self.backend = backend
+        self.max_batch = max_batch
+
+    @classmethod
+    def from_policy(
+        cls, policy, backend: str = "torchscript", num_threads: Optional[int] = None, max_batch: Optional[int] = None
+    ) -> "PolicyRuntime":
+        """Runtime for an in-memory SB3 policy (traced or exported on the spot)."""
+        if backend == "torch":
+            _set_torch_threads(num_threads)
+            graph = _cpu_graph(policy)
+
+            def forward(inputs):
+                with th.inference_mode():
+                    return graph(*(th.from_numpy(x) for x in inputs)).numpy()
+
+            meta = graph.metadata()
+        elif backend == "torchscript":
+            module, meta = trace_torchscript(policy)
+            return cls._torchscript(module, meta, num_threads, max_batch)
+        elif backend == "onnx":
+            return cls._onnx(_onnx_bytes(policy), num_threads, max_batch)
+        else:
+            raise ValueError(f"Unknown policy runtime: {backend}. Available: {list(RUNTIMES[1:])}")
+        return cls(forward, meta["keys"], meta["shapes"], meta["dtypes"], meta["n_actions"], backend, max_batch)
+
+    @classmethod
+    def _torchscript(cls, module, meta: Dict[str, Any], num_threads: Optional[int], max_batch: Optional[int]):
+        _set_torch_threads(num_threads)
+
+        def forward(inputs):
+            with th.inference_mode():
+                return module(*(th.from_numpy(x) for x in inputs)).numpy()
+
+        return cls(forward, meta["keys"], meta["shapes"], meta["dtypes"], meta["n_actions"], "torchscript", max_batch)
+
+    @classmethod
+    def _onnx(cls, model: Any, num_threads: Optional[int], max_batch: Optional[int]):
+        _require_onnxruntime()
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        session = ort.InferenceSession(model, sess_options=options, providers=["CPUExecutionProvider"])
+        inputs = session.get_inputs()
+        keys = [i.name for i in inputs]
+
+        def forward(arrays):
+            return session.run(None, dict(zip(keys, arrays)))[0]
+
+        return cls(
+            forward,
+            keys,
+            [i.shape[1:] for i in inputs],
+            [ONNX_DTYPES[i.type] for i in inputs],
+            int(session.get_outputs()[0].shape[1]),
+            "onnx",
+            max_batch,
+        )
+
+    @classmethod
+    def load(cls, path: Path, num_threads: Optional[int] = None, max_batch: Optional[int] = None) -> "PolicyRuntime":
+        """Runtime for an exported ``.policy.ts`` or ``.policy.onnx`` file."""
+        path = Path(path)
+        if path.suffix == ".onnx":
+            return cls._onnx(str(path), num_threads, max_batch)
+        if path.suffix == ".ts":
+            extra = {META_FILE: ""}
+            with _quiet_jit():
+                module = th.jit.load(str(path), map_location="cpu", _extra_files=extra)
+            return cls._torchscript(module, json.loads(extra[META_FILE]), num_threads, max_batch)
+        raise ValueError(f"Not an exported policy graph: {path}")
+
+    def _batch(self, observation: Dict[str, Any]) -> Tuple[List[np.ndarray], bool]:
+        return batch_observation(observation, self.keys, self.shapes, self.dtypes)
+
+    def logits(self, observation: Dict[str, Any]) -> np.ndarray:
+        """Action logits for a single observation or a batch (always batched)."""
+        arrays, _ = self._batch(observation)
+        return self._logits(arrays)
+
+    def _logits(self, arrays: List[np.ndarray]) -> np.ndarray:
+        n = arrays[0].shape[0]
+        if not self.max_batch or n <= self.max_batch:
+            return self._forward(arrays)
+        return np.concatenate(
+            [self._forward([a[i:i + self.max_batch] for a in arrays]) for i in range(0, n, self.max_batch)]
+        )
+
+    def predict(
+        self,
+        observation: Dict[str, Any],
+        state: Any = None,
+        episode_start: Any = None,
+        deterministic: bool = False,
+    ) -> Tuple[np.ndarray, None]:
+        arrays, single = self._batch(observation)
+        actions = actions_from_logits(self._logits(arrays), deterministic)
+        return (actions[0] if single else actions), None
+
+
+def batch_observation(
+    observation: Dict[str, Any], keys: Sequence[str], shapes: Sequence[Sequence[int]], dtypes: Sequence[np.dtype]
+) -> Tuple[List[np.ndarray], bool]:
+    """Contiguous batched arrays in ``keys`` order, and whether ``observation`` was a single one."""
+    single = np.ndim(observation[keys[0]]) == len(shapes[0])
+    arrays = []
+    for key, dtype in zip(keys, dtypes):
+        value = np.asarray(observation[key], dtype=dtype)
+        arrays.append(np.ascontiguousarray(value[None] if single else value))
+    return arrays, single
+
+
+def actions_from_logits(logits: np.ndarray, deterministic: bool) -> np.ndarray:
+    """Argmax, or a sample drawn from the torch RNG the way SB3's ``Categorical`` draws it."""
+    if deterministic:
+        return logits.argmax(axis=1)
+    return th.distributions.Categorical(logits=th.from_numpy(logits)).sample().numpy()
+
+
+def _set_torch_threads(num_threads: Optional[int]):
+    if num_threads:
+        th.set_num_threads(num_threads)
+
+
+def load_runtime(
+    path: Path, runtime: str = "torchscript", num_threads: Optional[int] = None, max_batch: Optional[int] = None
+) -> PolicyRuntime:
+    """Runtime for an exported graph, or for a checkpoint zip / weights file traced with ``runtime``."""
+    path = Path(path)
+    if path.suffix in (".ts", ".onnx"):
+        return PolicyRuntime.load(path, num_threads=num_threads, max_batch=max_batch)
+    return PolicyRuntime.from_policy(load_policy(path, "cpu"), runtime, num_threads=num_threads, max_batch=max_batch)
+
+
+_runtime_cache = PolicyCache(loader=load_runtime)
+
+
+def get_runtime(path: Path, runtime: str = "sb3", device: str = "auto", num_threads: Optional[int] = None):
+    """
+    Cached policy for the eval runners: the SB3 policy for ``"sb3"`` (on
+    ``device``), otherwise a CPU ``PolicyRuntime``.
+    """
+    if runtime == "sb3" and Path(path).suffix not in (".ts", ".onnx"):
+        return get_policy(path, device)
+    return _runtime_cache.get(path, runtime, num_threads)
@@ -0,0 +1,148 @@
+"""
+Post-training int8 quantization of the policy for CPU inference.
+
+``quantize_policy`` returns a CPU copy of an SB3 policy with:
+
+- static int8 quantization of the ``NatureCNN`` conv stack over ``screens``
+  (conv+ReLU fused, activation ranges calibrated on recorded observations)
+- dynamic int8 quantization of every ``nn.Linear`` (weights int8, activations
+  quantized per batch)
+
+The result runs in ``PolicyRuntime`` with the ``torch`` or ``torchscript``
+backend (quantized ops do not export to ONNX). Calibration observations are
+raw env observations stacked into a batch, the same input ``PolicyRuntime``
+takes; ``collect_observations`` records them by playing the float policy.
+
+``compare_action_distributions`` is the accuracy check: KL divergence, total
+variation and argmax agreement between the float and the quantized policy on
+the same observations. ``measure_inference`` times predicts for the latency
+and throughput report.
+"""
+
+import copy
+import time
+import warnings
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.torch_layers import NatureCNN
+from stable_baselines3.common.utils import set_random_seed
+
+from training.policy_runtime import PolicyGraph
+
+QUANTIZE_RUNTIMES = ("torch", "torchscript")
+
+
+@contextmanager
+def _quiet_ao():
+    # torch.ao.quantization warns that it is moving to torchao on every call
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.simplefilter("ignore", FutureWarning)
+        yield
+
+
+def collect_observations(model, env, n_steps: int, seed: int = 0, deterministic: bool = False) -> Dict[str, np.ndarray]:
+    """Play ``model`` on ``env`` for ``n_steps`` and return the observations as one batch."""
+    set_random_seed(seed)
+    obs, _ = env.reset(seed=seed)
+    observations = []
+    for _ in range(n_steps):
+        observations.append(obs)
+        action, _ = model.predict(obs, deterministic=deterministic)
+        obs, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            obs, _ = env.reset()
+    return {key: np.stack([o[key] for o in observations]) for key in observations[0]}
+
+
+def _batches(observations: Dict[str, np.ndarray], batch_size: int):
+    n = len(next(iter(observations.values())))
+    for start in range(0, n, batch_size):
+        yield {key: value[start:start + batch_size] for key, value in observations.items()}
+
+
+def quantize_policy(
+    policy,
+    observations: Dict[str, np.ndarray],
+    cnn_keys: Sequence[str] = ("screens",),
+    batch_size: int = 64,
+    engine: Optional[str] = None,
+):
+    """
+    Int8 copy of ``policy`` (on CPU), calibrated on the batched raw
+    ``observations``. ``engine`` is the quantized backend
+    (``torch.backends.quantized.engine`` by default).
+    """
+    from torch.ao import quantization as tq
+
+    engine = engine or th.backends.quantized.engine
+    th.backends.quantized.engine = engine
+    policy = copy.deepcopy(policy).to("cpu").eval()
+    extractors = getattr(policy.features_extractor, "extractors", {})
+    with _quiet_ao():
+        prepared = []
+        for key in cnn_keys:
+            extractor = extractors[key] if key in extractors else None
+            if not isinstance(extractor, NatureCNN):
+                raise ValueError(f"No NatureCNN extractor for observation key '{key}'")
+            # Conv2d/ReLU pairs at 0-1, 2-3, 4-5; Flatten stays as is
+            pairs = [[str(i), str(i + 1)] for i in range(0, len(extractor.cnn) - 1, 2)]
+            wrapper = tq.QuantWrapper(tq.fuse_modules(extractor.cnn, pairs))
+            wrapper.qconfig = tq.get_default_qconfig(engine)
+            tq.prepare(wrapper, inplace=True)
+            extractor.cnn = wrapper
+            prepared.append(wrapper)
+
+        graph = PolicyGraph(policy)
+        with th.no_grad():
+            for batch in _batches(observations, batch_size):
+                graph(*(th.as_tensor(np.asarray(batch[key], dtype=dtype)) for key, dtype in zip(graph.keys, graph.dtypes)))
+        for wrapper in prepared:
+            tq.convert(wrapper, inplace=True)
+        return tq.quantize_dynamic(policy, {th.nn.Linear}, dtype=th.qint8)
+
+
+def compare_action_distributions(reference, candidate, observations: Dict[str, np.ndarray], batch_size: int = 256) -> Dict[str, Any]:
+    """
+    How far ``candidate``'s action distribution is from ``reference``'s (both
+    ``PolicyRuntime``) on the same observations.
+    """
+    kl, tv, agree = [], [], []
+    for batch in _batches(observations, batch_size):
+        p_log = th.log_softmax(th.from_numpy(reference.logits(batch)).double(), dim=1)
+        q_log = th.log_softmax(th.from_numpy(candidate.logits(batch)).double(), dim=1)
+        kl.append((p_log.exp() * (p_log - q_log)).sum(dim=1))
+        tv.append(0.5 * (p_log.exp() - q_log.exp()).abs().sum(dim=1))
+        agree.append(p_log.argmax(dim=1) == q_log.argmax(dim=1))
+    kl, tv, agree = th.cat(kl), th.cat(tv), th.cat(agree)
+    return {
+        "observations": int(len(kl)),
+        "mean_kl": float(kl.mean()),
+        "max_kl": float(kl.max()),
+        "mean_tv": float(tv.mean()),
+        "max_tv": float(tv.max()),
+        "argmax_agreement": float(agree.double().mean()),
+    }
+
+
+def measure_inference(predict, observations: Dict[str, np.ndarray], batch_size: int, repeat: int = 3) -> Dict[str, float]:
+    """Best-of-``repeat`` deterministic ``predict`` timing over ``observations`` at ``batch_size``."""
+    n = len(next(iter(observations.values())))
+    calls = -(-n // batch_size)
+
+    def one_pass():
+        for batch in _batches(observations, batch_size):
+            if batch_size == 1:
+                batch = {key: value[0] for key, value in batch.items()}
+            predict(batch, deterministic=True)
+
+    one_pass()  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        one_pass()
+        best = min(best, time.perf_counter() - start)
+    return {"batch_size": batch_size, "ms_per_call": best / calls * 1000, "obs_per_sec": n / best}
@@ -0,0 +1,137 @@
+"""
+Full training state for an exact resume, stored next to a checkpoint zip.
+
+The zip already carries the policy, optimizer and the learner's bookkeeping
+(``num_timesteps``, ``_last_obs``, ``_last_episode_starts``, episode info
+buffer). ``poke_<steps>_steps.resume.pkl`` adds what lives outside the model:
+
+- per env: the emulator savestate, the episode tracking attributes
+  (``RedGymEnv.get_resume_state``) and the env process's RNG state
+- the ``VecMonitor`` episode return/length counters
+- the training process's python, numpy and torch RNG states
+
+The state is only consistent between rollouts (after ``train()``, before the
+next ``env.step``), so ``AsyncCheckpointCallback`` captures it at rollout start.
+``restore_training_state`` puts it back into a freshly built vec env; training
+then continues with ``learn(reset_num_timesteps=False)`` and every episode
+picks up where it stopped instead of restarting from the init state.
+"""
+
+import pickle
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.vec_env import VecEnvWrapper, VecMonitor, VecTransposeImage
+
+from training.checkpoint_manifest import RESUME_SUFFIX
+from training.policy_io import atomic_write
+
+RESUME_STATE_VERSION = 1
+
+
+def resume_state_path(checkpoint: Path) -> Path:
+    """Sidecar path for ``checkpoint`` (``poke_<steps>_steps.zip`` -> ``poke_<steps>_steps.resume.pkl``)."""
+    checkpoint = Path(checkpoint)
+    return checkpoint.with_name(checkpoint.stem + RESUME_SUFFIX)
+
+
+def find_vec_wrapper(venv, wrapper_class):
+    while venv is not None:
+        if isinstance(venv, wrapper_class):
+            return venv
+        venv = venv.venv if isinstance(venv, VecEnvWrapper) else None
+    return None
+
+
+def _match_transposed_layout(model):
+    # _last_obs comes back from the zip C-contiguous, while VecTransposeImage
+    # hands out channel-first views of channel-last buffers; torch picks a
+    # different conv kernel for each layout, which shows up in the last bits
+    transpose = find_vec_wrapper(model.get_env(), VecTransposeImage)
+    if transpose is None or not isinstance(model._last_obs, dict):
+        return
+    for key in transpose.image_space_keys:
+        obs = model._last_obs[key]
+        model._last_obs[key] = obs.transpose(0, 2, 3, 1).copy().transpose(0, 3, 1, 2)
+
+
+def _rng_state() -> Dict[str, Any]:
+    return {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": th.get_rng_state(),
+        "cuda": th.cuda.get_rng_state_all() if th.cuda.is_available() else None,
+    }
+
+
+def _set_rng_state(state: Dict[str, Any]):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    th.set_rng_state(state["torch"])
+    if state.get("cuda") is not None and th.cuda.is_available():
+        th.cuda.set_rng_state_all(state["cuda"])
+
+
+def capture_training_state(model) -> Dict[str, Any]:
+    """Everything besides the model zip needed to continue ``model``'s rollouts exactly."""
+    venv = model.get_env()
+    monitor = find_vec_wrapper(venv, VecMonitor)
+    return {
+        "version": RESUME_STATE_VERSION,
+        "num_timesteps": int(model.num_timesteps),
+        "num_envs": venv.num_envs,
+        "envs": venv.env_method("get_resume_state"),
+        "monitor": None if monitor is None else {
+            "episode_returns": monitor.episode_returns.copy(),
+            "episode_lengths": monitor.episode_lengths.copy(),
+            "episode_count": monitor.episode_count,
+            "elapsed": time.time() - monitor.t_start,
+        },
+        "rng": _rng_state(),
+    }
+
+
+def write_training_state(state: Dict[str, Any], path: Path):
+    def write(tmp: Path):
+        with tmp.open("wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    atomic_write(path, write)
+
+
+def load_training_state(path: Path) -> Dict[str, Any]:
+    with Path(path).open("rb") as f:
+        state = pickle.load(f)
+    if state.get("version") != RESUME_STATE_VERSION:
+        raise ValueError(f"Unsupported resume state version in {path}: {state.get('version')}")
+    return state
+
+
+def restore_training_state(model, state: Dict[str, Any]):
+    """
+    Continue the envs, monitor counters and RNG streams captured in ``state``.
+
+    ``model`` must have been loaded with ``force_reset=False`` so it keeps the
+    matching ``_last_obs``.
+    """
+    venv = model.get_env()
+    if venv.num_envs != state["num_envs"]:
+        raise ValueError(f"Resume state has {state['num_envs']} envs, the training env has {venv.num_envs}")
+    if int(model.num_timesteps) != state["num_timesteps"]:
+        raise ValueError(
+            f"Resume state is for timestep {state['num_timesteps']}, the model is at {model.num_timesteps}"
+        )
+    for index, env_state in enumerate(state["envs"]):
+        venv.env_method("set_resume_state", env_state, indices=[index])
+    _match_transposed_layout(model)
+    monitor = find_vec_wrapper(venv, VecMonitor)
+    if monitor is not None and state.get("monitor") is not None:
+        monitor.episode_returns = state["monitor"]["episode_returns"].copy()
+        monitor.episode_lengths = state["monitor"]["episode_lengths"].copy()
+        monitor.episode_count = state["monitor"]["episode_count"]
+        monitor.t_start = time.time() - state["monitor"]["elapsed"]
+    _set_rng_state(state["rng"])
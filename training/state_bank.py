@@ -0,0 +1,261 @@
+"""
+Short-horizon evaluation from a bank of mid-game savestates.
+
+A state bank is a JSON file listing savestates with a fixed horizon and an
+optional termination condition each (same values as the env's
+``termination_condition``)::
+
+    {
+      "name": "early_game",
+      "states": [
+        {"name": "after_starter", "state": "after_starter.state", "horizon": 512,
+         "termination_condition": "pokecenter_reached"},
+        {"name": "pewter_gym", "state": "pewter_gym.state", "horizon": 1024,
+         "termination_condition": "badge_earned"}
+      ]
+    }
+
+State paths are relative to the bank file. ``run_state_bank`` plays
+``episodes_per_state`` seeded episodes from every state (batched over
+``num_envs`` envs, or on a process pool with ``workers``) and summarizes each
+state with the eval_policy.py schema plus a ``skill_score``: the success rate
+for states with a termination condition, else the mean return.
+tools/capture_states.py cuts savestates for a bank out of recorded trajectories.
+"""
+
+import json
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from env.red_gym_env import RedGymEnv
+from training.evaluation import run_batched_episodes, run_episode, summarize_episodes
+
+TERMINATION_CONDITIONS = ("badge_earned", "pokecenter_reached")
+
+
+@dataclass
+class BankState:
+    name: str
+    state: str
+    horizon: int
+    termination_condition: Optional[str] = None
+    description: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "horizon": self.horizon,
+            "termination_condition": self.termination_condition,
+            "description": self.description,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BankState":
+        return cls(
+            name=data["name"],
+            state=data["state"],
+            horizon=int(data["horizon"]),
+            termination_condition=data.get("termination_condition"),
+            description=data.get("description", ""),
+        )
+
+
+@dataclass
+class StateBank:
+    name: str
+    states: List[BankState] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "states": [s.to_dict() for s in self.states]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StateBank":
+        return cls(name=data.get("name", "state_bank"), states=[BankState.from_dict(s) for s in data.get("states", [])])
+
+
+def load_state_bank(path: Path) -> StateBank:
+    """Load and validate a bank; state paths are resolved against the bank's directory."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"State bank not found: {path}")
+    bank = StateBank.from_dict(json.loads(path.read_text()))
+    if not bank.states:
+        raise ValueError(f"State bank {path} lists no states")
+    names = [s.name for s in bank.states]
+    if len(set(names)) != len(names):
+        raise ValueError(f"State bank {path} has duplicate state names")
+    for entry in bank.states:
+        state_path = Path(entry.state)
+        if not state_path.is_absolute():
+            state_path = path.parent / state_path
+        if not state_path.exists():
+            raise FileNotFoundError(f"Savestate for '{entry.name}' not found: {state_path}")
+        entry.state = str(state_path)
+        if entry.horizon < 1:
+            raise ValueError(f"State '{entry.name}': horizon must be >= 1")
+        if entry.termination_condition not in (None, *TERMINATION_CONDITIONS):
+            raise ValueError(
+                f"State '{entry.name}': unknown termination_condition {entry.termination_condition}. "
+                f"Available: {list(TERMINATION_CONDITIONS)}"
+            )
+    return bank
+
+
+def bank_fingerprint(bank: StateBank) -> List[Dict[str, Any]]:
+    """Bank entries with savestate paths replaced by content hashes (for cache keys)."""
+    from training.eval_cache import file_sha256
+
+    return [{**entry.to_dict(), "state": file_sha256(entry.state), "description": ""} for entry in bank.states]
+
+
+def state_env_config(env_config: Dict[str, Any], entry: BankState) -> Dict[str, Any]:
+    """Env config that starts from ``entry``'s savestate with its horizon and termination."""
+    config = dict(env_config)
+    config.update(
+        {
+            "init_state": entry.state,
+            "max_steps": entry.horizon,
+            "termination_condition": entry.termination_condition,
+        }
+    )
+    return config
+
+
+def summarize_state(entry: BankState, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-state summary: the eval schema, the bank entry and its skill score."""
+    summary = summarize_episodes(records)
+    summary.update(entry.to_dict())
+    summary["skill_score"] = summary["success_rate"] if entry.termination_condition else summary["mean_return"]
+    return summary
+
+
+def run_state_bank(
+    model,
+    env_config: Dict[str, Any],
+    bank: StateBank,
+    episodes_per_state: int,
+    num_envs: int = 1,
+    base_seed: int = 0,
+    deterministic: bool = True,
+    on_result: Optional[Callable[[BankState, Dict[str, Any]], None]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run ``episodes_per_state`` episodes from every bank state in this process.
+
+    Episode ``i`` of each state is seeded with ``base_seed + i``. Returns
+    {state name: summary} in bank order.
+    """
+    results = {}
+    for entry in bank.states:
+        config = state_env_config(env_config, entry)
+        envs = [RedGymEnv(config) for _ in range(max(min(num_envs, episodes_per_state), 1))]
+        try:
+            records = run_batched_episodes(
+                model,
+                envs,
+                episodes_per_state,
+                entry.horizon,
+                base_seed=base_seed,
+                deterministic=deterministic,
+                on_result=(lambda record, entry=entry: on_result(entry, record)) if on_result else None,
+            )
+        finally:
+            for env in envs:
+                env.close()
+        results[entry.name] = summarize_state(entry, records)
+    return results
+
+
+# --- process pool -----------------------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(
+    checkpoint: str,
+    env_config: Dict[str, Any],
+    device: str,
+    runtime: str = "sb3",
+    server: Optional[str] = None,
+    obs_cache: int = 0,
+):
+    import torch
+    from training.inference_server import PolicyClient
+    from training.obs_cache import ObservationCache
+    from training.policy_runtime import get_runtime
+
+    torch.set_num_threads(1)
+    _worker["env_config"] = env_config
+    _worker["envs"] = {}
+    if server is not None:
+        _worker["model"] = PolicyClient(server)
+    else:
+        _worker["model"] = get_runtime(checkpoint, runtime, device, num_threads=1)
+    _worker["obs_cache"] = ObservationCache(_worker["model"], obs_cache) if obs_cache else None
+    if _worker["obs_cache"] is not None:
+        _worker["model"] = _worker["obs_cache"]
+
+
+def _worker_episode(entry: Dict[str, Any], episode: int, seed: int, deterministic: bool) -> Dict[str, Any]:
+    entry = BankState.from_dict(entry)
+    env = _worker["envs"].get(entry.name)
+    if env is None:
+        # one env per bank state, built the first time this worker sees it
+        env = RedGymEnv(state_env_config(_worker["env_config"], entry))
+        _worker["envs"][entry.name] = env
+    record = run_episode(_worker["model"], env, entry.horizon, seed=seed, deterministic=deterministic)
+    record["episode"] = episode
+    record["state_name"] = entry.name
+    if _worker["obs_cache"] is not None:
+        record["obs_cache"] = _worker["obs_cache"].stats(reset=True)
+    return record
+
+
+def run_parallel_state_bank(
+    checkpoint: Path,
+    env_config: Dict[str, Any],
+    bank: StateBank,
+    episodes_per_state: int,
+    workers: int,
+    base_seed: int = 0,
+    deterministic: bool = True,
+    device: str = "cpu",
+    on_result: Optional[Callable[[BankState, Dict[str, Any]], None]] = None,
+    runtime: str = "sb3",
+    server: Optional[str] = None,
+    obs_cache: int = 0,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Like ``run_state_bank`` but spreads all (state, episode) pairs over
+    ``workers`` processes (sharing the ``InferenceServer`` at ``server``, if given).
+    """
+    entries = {entry.name: entry for entry in bank.states}
+    records: Dict[str, List[Optional[Dict[str, Any]]]] = {name: [None] * episodes_per_state for name in entries}
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(str(checkpoint), env_config, device, runtime, server, obs_cache),
+    ) as pool:
+        futures = [
+            pool.submit(_worker_episode, entry.to_dict(), ep, base_seed + ep, deterministic)
+            for entry in bank.states
+            for ep in range(episodes_per_state)
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            name = record.pop("state_name")
+            records[name][record["episode"]] = record
+            if on_result is not None:
+                on_result(entries[name], record)
+    return {name: summarize_state(entries[name], records[name]) for name in entries}
+
+
+def skill_profile(results: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """{state name: skill score} from ``run_state_bank`` results."""
+    return {name: summary["skill_score"] for name, summary in results.items()}
@@ -7,6 +7,10 @@ from typing import Any, Callable, Dict, List, Optional
 import numpy as np
 from stable_baselines3.common.callbacks import BaseCallback
 
+from training.checkpointing import AsyncCheckpointCallback
+from training.eval_stopping import StoppingRule
+from training.evaluation import run_batched_episodes
+
 
 def convert_numpy_types(obj: Any) -> Any:
     """
@@ -43,6 +47,62 @@ def append_jsonl(path: Path, payload: Dict[str, Any]):
         f.write(json.dumps(clean_payload) + os.linesep)
 
 
+def eval_result_from_records(records: List[Dict[str, Any]], timesteps: int, timestamp: float) -> Dict[str, Any]:
+    """Fold eval episode records into the eval.jsonl / status.json result schema."""
+    rewards: List[float] = []
+    lengths: List[int] = []
+
+    # Battle and milestone tracking
+    battles_started_list: List[int] = []
+    battles_won_list: List[int] = []
+    badges_earned_list: List[int] = []
+    levels_gained_list: List[int] = []
+    successes: List[bool] = []
+
+    for record in records:
+        rewards.append(record['return'])
+        lengths.append(record['length'])
+        info = record['final_info']
+
+        # Extract battle/milestone metrics from final info
+        if 'episode' in info:
+            ep = info['episode']
+            battles_started_list.append(ep.get('battles_started', 0))
+            battles_won_list.append(ep.get('battles_won', 0))
+            badges_earned_list.append(ep.get('badges_earned', 0))
+            levels_gained_list.append(ep.get('levels_gained', 0))
+
+        successes.append(info.get('success', False))
+
+    # Compute means
+    mean_battles_started = sum(battles_started_list) / len(battles_started_list) if battles_started_list else 0.0
+    mean_battles_won = sum(battles_won_list) / len(battles_won_list) if battles_won_list else 0.0
+    mean_badges = sum(badges_earned_list) / len(badges_earned_list) if badges_earned_list else 0.0
+    mean_levels = sum(levels_gained_list) / len(levels_gained_list) if levels_gained_list else 0.0
+    success_rate = sum(successes) / len(successes) if successes else 0.0
+
+    return {
+        "timestamp": timestamp,
+        "timesteps_when_ran": int(timesteps),
+        "episodes": len(records),
+        "mean_reward": sum(rewards) / len(rewards),
+        "mean_length": sum(lengths) / len(lengths),
+        "rewards": rewards,
+        "lengths": lengths,
+        # Battle metrics
+        "mean_battles_started": mean_battles_started,
+        "mean_battles_won": mean_battles_won,
+        "mean_badges_earned": mean_badges,
+        "mean_levels_gained": mean_levels,
+        "success_rate": success_rate,
+        # Detail arrays
+        "battles_started": battles_started_list,
+        "battles_won": battles_won_list,
+        "badges_earned": badges_earned_list,
+        "levels_gained": levels_gained_list,
+    }
+
+
 class StatusWriterCallback(BaseCallback):
     """
     Periodically writes a status.json snapshot for the UI/monitoring.
@@ -148,6 +208,12 @@ class StatusWriterCallback(BaseCallback):
 class PeriodicEvalCallback(BaseCallback):
     """
     Runs deterministic evaluations at a fixed step cadence and logs results to JSONL.
+
+    With ``eval_num_envs`` > 1 episodes run on that many envs with one batched
+    predict per step; per-episode results are the same as with a single env.
+    With ``stopping``, ``eval_episodes`` is the cap and each eval ends as soon
+    as the rule is satisfied. With ``checkpoint_callback`` every evaluated
+    policy is also checkpointed and scored for best-by-eval retention.
     """
 
     def __init__(
@@ -159,6 +225,9 @@ class PeriodicEvalCallback(BaseCallback):
         eval_max_steps: Optional[int],
         status_callback: Optional[StatusWriterCallback],
         base_eval_seed: int = 0,
+        eval_num_envs: int = 1,
+        stopping: Optional[StoppingRule] = None,
+        checkpoint_callback: Optional[AsyncCheckpointCallback] = None,
         verbose: int = 0,
     ):
         super().__init__(verbose)
@@ -169,9 +238,12 @@ class PeriodicEvalCallback(BaseCallback):
         self.eval_max_steps = eval_max_steps
         self.status_callback = status_callback
         self.base_eval_seed = base_eval_seed
+        self.eval_num_envs = max(min(eval_num_envs, self.eval_episodes), 1)
+        self.stopping = stopping
+        self.checkpoint_callback = checkpoint_callback
 
         self._last_eval_step: int = 0
-        self._eval_env = None
+        self._eval_envs: List[Any] = []
 
     def _on_training_start(self) -> None:
         # lazily instantiate eval env to avoid issues before model is ready
@@ -183,6 +255,8 @@ class PeriodicEvalCallback(BaseCallback):
         if (self.num_timesteps - self._last_eval_step) < self.eval_every_steps:
             return True
 
+        if self.checkpoint_callback:
+            self.checkpoint_callback.save_now()
         try:
             result = self._run_eval()
         except Exception as exc:
@@ -194,86 +268,34 @@ class PeriodicEvalCallback(BaseCallback):
         append_jsonl(self.eval_log_path, result)
         if self.status_callback:
             self.status_callback.record_eval_result(result)
+        if self.checkpoint_callback:
+            self.checkpoint_callback.record_eval_result(result)
         return True
 
     def _on_training_end(self) -> None:
-        if self._eval_env:
+        for env in self._eval_envs:
             try:
-                self._eval_env.close()
+                env.close()
             except Exception:
                 pass
 
-    def _ensure_env(self):
-        if self._eval_env is None:
-            self._eval_env = self.eval_env_fn()
-        return self._eval_env
+    def _ensure_envs(self):
+        while len(self._eval_envs) < self.eval_num_envs:
+            self._eval_envs.append(self.eval_env_fn())
+        return self._eval_envs
 
     def _run_eval(self) -> Dict[str, Any]:
-        env = self._ensure_env()
-        rewards: List[float] = []
-        lengths: List[int] = []
-        max_steps = self.eval_max_steps
         timestamp = time.time()
-
-        # Battle and milestone tracking
-        battles_started_list: List[int] = []
-        battles_won_list: List[int] = []
-        badges_earned_list: List[int] = []
-        levels_gained_list: List[int] = []
-        successes: List[bool] = []
-
-        for idx in range(self.eval_episodes):
-            seed = self.base_eval_seed + idx
-            obs, info = env.reset(seed=seed)
-            done = False
-            truncated = False
-            total_r = 0.0
-            steps = 0
-            while not done and not truncated:
-                action, _states = self.model.predict(obs, deterministic=True)
-                obs, reward, done, truncated, info = env.step(action)
-                total_r += float(reward)
-                steps += 1
-                if max_steps and steps >= max_steps:
-                    truncated = True
-
-            rewards.append(total_r)
-            lengths.append(steps)
-
-            # Extract battle/milestone metrics from final info
-            if 'episode' in info:
-                ep = info['episode']
-                battles_started_list.append(ep.get('battles_started', 0))
-                battles_won_list.append(ep.get('battles_won', 0))
-                badges_earned_list.append(ep.get('badges_earned', 0))
-                levels_gained_list.append(ep.get('levels_gained', 0))
-
-            successes.append(info.get('success', False))
-
-        # Compute means
-        mean_battles_started = sum(battles_started_list) / len(battles_started_list) if battles_started_list else 0.0
-        mean_battles_won = sum(battles_won_list) / len(battles_won_list) if battles_won_list else 0.0
-        mean_badges = sum(badges_earned_list) / len(badges_earned_list) if badges_earned_list else 0.0
-        mean_levels = sum(levels_gained_list) / len(levels_gained_list) if levels_gained_list else 0.0
-        success_rate = sum(successes) / len(successes) if successes else 0.0
-
-        return {
-            "timestamp": timestamp,
-            "timesteps_when_ran": int(self.num_timesteps),
-            "episodes": self.eval_episodes,
-            "mean_reward": sum(rewards) / len(rewards),
-            "mean_length": sum(lengths) / len(lengths),
-            "rewards": rewards,
-            "lengths": lengths,
-            # Battle metrics
-            "mean_battles_started": mean_battles_started,
-            "mean_battles_won": mean_battles_won,
-            "mean_badges_earned": mean_badges,
-            "mean_levels_gained": mean_levels,
-            "success_rate": success_rate,
-            # Detail arrays
-            "battles_started": battles_started_list,
-            "battles_won": battles_won_list,
-            "badges_earned": badges_earned_list,
-            "levels_gained": levels_gained_list,
-        }
+        records = run_batched_episodes(
+            self.model,
+            self._ensure_envs(),
+            n_episodes=self.eval_episodes,
+            max_steps=self.eval_max_steps,
+            base_seed=self.base_eval_seed,
+            deterministic=True,
+            should_stop=self.stopping.check if self.stopping else None,
+        )
+        result = eval_result_from_records(records, self.num_timesteps, timestamp)
+        if self.stopping:
+            result.update(self.stopping.summary(records, self.eval_episodes))
+        return result
@@ -28,9 +28,11 @@ def merge_dicts(dicts):
 
 class TensorboardCallback(BaseCallback):
 
-    def __init__(self, log_dir, verbose=0):
+    def __init__(self, log_dir, verbose=0, env_stats=True):
         super().__init__(verbose)
         self.log_dir = log_dir
+        # False when training steps are replayed from rollouts played elsewhere (actor/learner, distributed)
+        self.env_stats = env_stats
         self.writer = None
         # Episode-level tracking
         self.episode_returns = []
@@ -136,6 +138,9 @@ class TensorboardCallback(BaseCallback):
             self.episode_deaths.clear()
             self.episode_map_progress.clear()
 
+        if not self.env_stats:
+            return True
+
         # Check if any environment has reached max_steps (episode ended)
         step_counts = self.training_env.get_attr("step_count")
         max_steps = self.training_env.get_attr("max_steps")
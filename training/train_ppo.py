@@ -3,9 +3,8 @@ import json
 import random
 import subprocess
 import sys
-import time
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Optional
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
@@ -16,10 +15,17 @@ from env.stream_agent_wrapper import StreamWrapper
 from stable_baselines3 import PPO
 from stable_baselines3.common.vec_env import SubprocVecEnv, VecMonitor
 from stable_baselines3.common.utils import set_random_seed
-from stable_baselines3.common.callbacks import CheckpointCallback, CallbackList
+from stable_baselines3.common.callbacks import CallbackList
 
 from training.tensorboard_callback import TensorboardCallback
 from training.config_utils import validate_env_config, validate_train_config
+from training.eval_stopping import StoppingRule
+from training.actor_learner import DEFAULT_MAX_IS_WEIGHT, DEFAULT_MAX_STALENESS, ActorLearnerPPO, ActorPool
+from training.distributed import RemoteActorPool
+from training.async_eval import OVERLAP_POLICIES, AsyncEvalCallback
+from training.checkpoint_manifest import find_latest_checkpoint, load_manifest
+from training.checkpointing import AsyncCheckpointCallback, RetentionPolicy
+from training.resume_state import load_training_state, restore_training_state, resume_state_path
 from training.status_tracking import StatusWriterCallback, PeriodicEvalCallback
 
 DEFAULT_CONFIG_PATH = Path("configs") / "train_default.json"
@@ -94,15 +100,6 @@ def get_git_commit(repo_root: Path) -> Optional[str]:
         return None
 
 
-def find_latest_checkpoint(run_dir: Path) -> Optional[Tuple[Path, float]]:
-    zip_files = list(run_dir.glob("**/*.zip"))
-    if not zip_files:
-        return None
-    most_recent = max(zip_files, key=lambda p: p.stat().st_mtime)
-    age_hours = (time.time() - most_recent.stat().st_mtime) / 3600
-    return most_recent, age_hours
-
-
 def load_config(config_path: Path) -> Dict[str, Any]:
     if not config_path.exists():
         return {}
@@ -164,7 +161,30 @@ def parse_args():
     parser.add_argument("--preset", choices=list(GPU_PRESETS.keys()), default=None, help="GPU sizing preset.")
     parser.add_argument("--stream", action="store_true", default=False, help="Enable map streaming.")
     parser.add_argument("--no-stream", dest="stream", action="store_false", help="Disable map streaming.")
+    parser.add_argument(
+        "--record-trajectories",
+        action="store_true",
+        help="Record every training episode as a compact .traj action log under runs/<run>/trajectories.",
+    )
     parser.add_argument("--checkpoint-freq", type=int, default=None, help="Steps between checkpoints (default: max_steps/2).")
+    parser.add_argument("--keep-last", type=int, default=None, help="Keep only the newest N periodic checkpoints.")
+    parser.add_argument("--keep-every", type=int, default=None, help="Also keep every Kth periodic checkpoint.")
+    parser.add_argument(
+        "--keep-best",
+        type=int,
+        default=0,
+        help="Also keep the N checkpoints with the best eval mean reward (checkpoints every evaluated policy).",
+    )
+    parser.add_argument(
+        "--weights-freq", type=int, default=None, help="Steps between weights-only snapshots under <run>/weights."
+    )
+    parser.add_argument("--keep-weights", type=int, default=5, help="Weights-only snapshots to keep.")
+    parser.add_argument(
+        "--no-resume-states",
+        dest="resume_states",
+        action="store_false",
+        help="Checkpoint weights only, without env savestates and RNG state for exact resume.",
+    )
     parser.add_argument("--wandb", action="store_true", help="Enable Weights & Biases logging.")
     parser.add_argument("--wandb-project", type=str, default="pokemon-train", help="wandb project name.")
     parser.add_argument("--wandb-run-name", type=str, default=None, help="Optional wandb run name.")
@@ -179,7 +199,73 @@ def parse_args():
     parser.add_argument(
         "--eval-max-steps", type=int, default=None, help="Max steps per eval episode (default: env max_steps)."
     )
+    parser.add_argument(
+        "--eval-num-envs", type=int, default=1, help="Eval envs stepped together with one batched predict per step."
+    )
     parser.add_argument("--eval-stream", action="store_true", help="Enable streaming overlays during eval.")
+    parser.add_argument(
+        "--eval-async",
+        action="store_true",
+        help="Run periodic eval in a background process on policy snapshots instead of pausing training.",
+    )
+    parser.add_argument(
+        "--eval-overlap",
+        choices=list(OVERLAP_POLICIES),
+        default="skip",
+        help="With --eval-async: skip eval points while the worker is busy, or queue them.",
+    )
+    parser.add_argument(
+        "--eval-stop-return-ci",
+        type=float,
+        default=None,
+        help="End each eval early once the CI on mean return is at most this wide (--eval-episodes is the cap).",
+    )
+    parser.add_argument(
+        "--eval-stop-success-ci",
+        type=float,
+        default=None,
+        help="End each eval early once the Wilson CI on success rate is at most this wide.",
+    )
+    parser.add_argument(
+        "--eval-success-threshold",
+        type=float,
+        default=None,
+        help="End each eval early once the Wilson CI on success rate is entirely above or below this.",
+    )
+    parser.add_argument(
+        "--eval-min-episodes", type=int, default=5, help="Eval episodes before any early-stopping rule applies."
+    )
+    parser.add_argument(
+        "--actors",
+        type=int,
+        default=0,
+        help="Actor/learner mode: step the envs in N actor processes that keep collecting while PPO trains (0 = off).",
+    )
+    parser.add_argument(
+        "--max-staleness",
+        type=int,
+        default=DEFAULT_MAX_STALENESS,
+        help="With --actors/--distributed: weight versions a rollout may lag the update that trains on it (0 = synchronous).",
+    )
+    parser.add_argument(
+        "--max-is-weight",
+        type=float,
+        default=DEFAULT_MAX_IS_WEIGHT,
+        help="With --actors/--distributed: truncate the per-sample importance weight (current / behaviour policy) at this value.",
+    )
+    parser.add_argument(
+        "--distributed",
+        metavar="HOST:PORT",
+        default=None,
+        help="Distributed mode: listen here for tools/rollout_worker.py processes, which step the envs (e.g. 0.0.0.0:5600).",
+    )
+    parser.add_argument(
+        "--local-workers",
+        type=int,
+        default=0,
+        help="With --distributed: also start N rollout workers on this machine, splitting --num-envs between them.",
+    )
+    parser.add_argument("--authkey", default=None, help="With --distributed: shared secret workers must present.")
     parser.add_argument("--no-eval", dest="eval_enabled", action="store_false", help="Disable periodic eval.")
     parser.set_defaults(eval_enabled=True)
     return parser.parse_args()
@@ -253,6 +339,20 @@ if __name__ == "__main__":
         raise ValueError("--batch-size must be >= 1")
     if num_envs < 1:
         raise ValueError("--num-envs must be >= 1")
+    if args.actors < 0 or (args.actors and num_envs % args.actors):
+        raise ValueError(f"--actors must split --num-envs ({num_envs}) evenly")
+    if args.max_staleness < 0:
+        raise ValueError("--max-staleness must be >= 0")
+    if args.actors and use_sde:
+        raise ValueError("--actors does not support use_sde")
+    if args.distributed and args.actors:
+        raise ValueError("--distributed and --actors are mutually exclusive")
+    if args.distributed and use_sde:
+        raise ValueError("--distributed does not support use_sde")
+    if args.local_workers and not args.distributed:
+        raise ValueError("--local-workers needs --distributed")
+    if args.local_workers < 0 or (args.local_workers and num_envs % args.local_workers):
+        raise ValueError(f"--local-workers must split --num-envs ({num_envs}) evenly")
 
     env_config = merge_env_config(env_defaults, args.rom, args.state, args.output_dir / args.run_name)
 
@@ -274,6 +374,8 @@ if __name__ == "__main__":
     run_dir = args.output_dir / args.run_name
     run_dir.mkdir(parents=True, exist_ok=True)
     env_config["session_path"] = run_dir
+    if args.record_trajectories:
+        env_config["record_trajectory"] = str(run_dir / "trajectories")
 
     status_path = args.status_file or (run_dir / "status.json")
     eval_log_path = args.eval_log or (run_dir / "eval.jsonl")
@@ -282,15 +384,64 @@ if __name__ == "__main__":
     eval_max_steps = args.eval_max_steps or env_defaults["max_steps"]
     if eval_max_steps is not None and eval_max_steps < 1:
         raise ValueError("--eval-max-steps must be >= 1 when provided")
+    eval_stopping = None
+    # --eval-min-episodes only matters (and is only validated) once a rule is on
+    if any(v is not None for v in (args.eval_stop_return_ci, args.eval_stop_success_ci, args.eval_success_threshold)):
+        eval_stopping = StoppingRule(
+            min_episodes=args.eval_min_episodes,
+            return_ci_width=args.eval_stop_return_ci,
+            success_ci_width=args.eval_stop_success_ci,
+            success_threshold=args.eval_success_threshold,
+        )
 
     # Build vectorized envs
-    env = SubprocVecEnv([make_env(i, env_config, args.stream, seed=args.seed or 0) for i in range(num_envs)])
-
-    # Wrap with VecMonitor to enable episode-level logging
-    env = VecMonitor(env)
+    env_fns = [make_env(i, env_config, args.stream, seed=args.seed or 0) for i in range(num_envs)]
+    if args.actors:
+        # actor processes step (and VecMonitor-wrap) their own envs while the learner trains
+        env = ActorPool(env_fns, num_actors=args.actors)
+        algorithm = ActorLearnerPPO
+        algorithm_kwargs = {"max_staleness": args.max_staleness, "max_is_weight": args.max_is_weight}
+    elif args.distributed:
+        # rollout workers (tools/rollout_worker.py) fill the num_envs buffer columns over TCP
+        probe = RedGymEnv(env_config)
+        env = RemoteActorPool(
+            num_envs,
+            probe.observation_space,
+            probe.action_space,
+            env_config,
+            address=args.distributed,
+            authkey=args.authkey.encode() if args.authkey else None,
+            stats_path=run_dir / "workers.json",
+        )
+        probe.close()
+        print(f"Listening for rollout workers on {env.connect_address}")
+        if args.local_workers:
+            env.spawn_local_workers(args.local_workers, num_envs // args.local_workers, seed=args.seed or 0)
+        algorithm = ActorLearnerPPO
+        algorithm_kwargs = {"max_staleness": args.max_staleness, "max_is_weight": args.max_is_weight}
+    else:
+        env = SubprocVecEnv(env_fns)
+        # Wrap with VecMonitor to enable episode-level logging
+        env = VecMonitor(env)
+        algorithm = PPO
+        algorithm_kwargs = {}
+    # the learner cannot snapshot env state held by actor processes or workers
+    resume_states = args.resume_states and not args.actors and not args.distributed
 
     ckpt_freq = args.checkpoint_freq or (rollout_horizon * num_envs * 5)
-    checkpoint_callback = CheckpointCallback(save_freq=ckpt_freq, save_path=str(run_dir), name_prefix="poke")
+    retention = RetentionPolicy(keep_last=args.keep_last, keep_every=args.keep_every, keep_best=args.keep_best)
+    checkpoint_callback = AsyncCheckpointCallback(
+        save_freq=ckpt_freq,
+        save_path=run_dir,
+        name_prefix="poke",
+        retention=retention,
+        weights_freq=args.weights_freq,
+        keep_weights=args.keep_weights,
+        resume_states=resume_states,
+    )
+    best_checkpoint_callback = checkpoint_callback if retention.keep_best else None
+    if retention.keep_best and not eval_every_steps:
+        print("Warning: --keep-best needs periodic eval (--eval-every-steps); no checkpoint will be scored.")
 
     status_callback = StatusWriterCallback(
         status_path=status_path,
@@ -300,7 +451,7 @@ if __name__ == "__main__":
         env_config=env_config,
         interval_seconds=args.status_interval,
     )
-    callbacks = [checkpoint_callback, TensorboardCallback(run_dir), status_callback]
+    callbacks = [checkpoint_callback, TensorboardCallback(run_dir, env_stats=not (args.actors or args.distributed)), status_callback]
 
     if eval_every_steps:
         eval_env_conf = env_config.copy()
@@ -316,29 +467,51 @@ if __name__ == "__main__":
             }
         )
 
+        eval_stream_metadata = (
+            {
+                "user": "eval",
+                "env_id": 9999,
+                "color": "#995533",
+                "extra": "eval",
+            }
+            if args.eval_stream
+            else None
+        )
+
         def make_eval_env():
             base_env = RedGymEnv(eval_env_conf)
-            if args.eval_stream:
-                return StreamWrapper(
-                    base_env,
-                    stream_metadata={
-                        "user": "eval",
-                        "env_id": 9999,
-                        "color": "#995533",
-                        "extra": "eval",
-                    },
-                )
+            if eval_stream_metadata is not None:
+                return StreamWrapper(base_env, stream_metadata=eval_stream_metadata)
             return base_env
 
-        eval_callback = PeriodicEvalCallback(
-            eval_env_fn=make_eval_env,
-            eval_log_path=eval_log_path,
-            eval_every_steps=eval_every_steps,
-            eval_episodes=eval_episodes,
-            eval_max_steps=eval_max_steps,
-            status_callback=status_callback,
-            base_eval_seed=(args.seed or 0) + 1234,
-        )
+        if args.eval_async:
+            eval_callback = AsyncEvalCallback(
+                eval_env_config=eval_env_conf,
+                eval_log_path=eval_log_path,
+                eval_every_steps=eval_every_steps,
+                eval_episodes=eval_episodes,
+                eval_max_steps=eval_max_steps,
+                status_callback=status_callback,
+                base_eval_seed=(args.seed or 0) + 1234,
+                eval_num_envs=args.eval_num_envs,
+                overlap=args.eval_overlap,
+                stream_metadata=eval_stream_metadata,
+                stopping=eval_stopping,
+                checkpoint_callback=best_checkpoint_callback,
+            )
+        else:
+            eval_callback = PeriodicEvalCallback(
+                eval_env_fn=make_eval_env,
+                eval_log_path=eval_log_path,
+                eval_every_steps=eval_every_steps,
+                eval_episodes=eval_episodes,
+                eval_max_steps=eval_max_steps,
+                status_callback=status_callback,
+                base_eval_seed=(args.seed or 0) + 1234,
+                eval_num_envs=args.eval_num_envs,
+                stopping=eval_stopping,
+                checkpoint_callback=best_checkpoint_callback,
+            )
         callbacks.append(eval_callback)
 
     resume_checkpoint = args.resume_checkpoint
@@ -354,12 +527,37 @@ if __name__ == "__main__":
     if resume_checkpoint and resume_checkpoint.suffix != ".zip":
         resume_checkpoint = resume_checkpoint.with_suffix(".zip")
 
+    # exact resume: continue every env's episode from the checkpoint's resume state
+    training_state = None
+    if resume_checkpoint and resume_checkpoint.exists():
+        state_path = resume_state_path(resume_checkpoint)
+        if not state_path.exists() and args.resume_latest:
+            resumable = load_manifest(resume_checkpoint.parent).latest(resumable=True)
+            if resumable is not None:
+                print(f"{resume_checkpoint.name} has no resume state; resuming exactly from {resumable.name} instead.")
+                resume_checkpoint = Path(resumable.path)
+                resume_source = f"latest resumable ({resumable.name})"
+                state_path = Path(resumable.resume_state)
+        if state_path.exists() and (args.actors or args.distributed):
+            print("Actor/learner mode cannot restore env state; loading weights only and resetting every env.")
+        elif state_path.exists():
+            training_state = load_training_state(state_path)
+            if training_state["num_envs"] != num_envs:
+                print(
+                    f"Resume state was saved with {training_state['num_envs']} envs, not {num_envs}; "
+                    "loading weights only and resetting every env."
+                )
+                training_state = None
+
     train_steps_batch = rollout_horizon
     if resume_checkpoint and resume_checkpoint.exists():
         if resume_source is None:
             resume_source = str(resume_checkpoint)
         print("\nloading checkpoint")
-        model = PPO.load(str(resume_checkpoint), env=env)
+        model = algorithm.load(str(resume_checkpoint), env=env, force_reset=training_state is None, **algorithm_kwargs)
+        if training_state is not None:
+            restore_training_state(model, training_state)
+            print(f"Restored env, monitor and RNG state at step {model.num_timesteps}")
         model.n_steps = train_steps_batch
         model.n_envs = num_envs
         model.rollout_buffer.buffer_size = train_steps_batch
@@ -368,7 +566,7 @@ if __name__ == "__main__":
     else:
         if resume_checkpoint:
             print(f"Requested resume checkpoint not found: {resume_checkpoint} (starting fresh)")
-        model = PPO(
+        model = algorithm(
             "MultiInputPolicy",
             env,
             verbose=1,
@@ -387,6 +585,7 @@ if __name__ == "__main__":
             normalize_advantage=normalize_advantage,
             target_kl=target_kl,
             tensorboard_log=str(run_dir),
+            **algorithm_kwargs,
         )
 
     # save run metadata for dashboards/comparisons
@@ -414,9 +613,36 @@ if __name__ == "__main__":
             "every_steps": eval_every_steps,
             "episodes": eval_episodes,
             "max_steps": eval_max_steps,
+            "num_envs": args.eval_num_envs,
             "stream": args.eval_stream,
+            "async": args.eval_async,
+            "overlap": args.eval_overlap if args.eval_async else None,
+            "stopping": eval_stopping.to_dict() if eval_stopping else None,
+        },
+        "checkpoints": {
+            "save_freq": ckpt_freq,
+            "retention": retention.to_dict(),
+            "weights_freq": args.weights_freq,
+            "keep_weights": args.keep_weights,
+            "resume_states": resume_states,
         },
+        "actor_learner": (
+            {"actors": args.actors, "max_staleness": args.max_staleness, "max_is_weight": args.max_is_weight}
+            if args.actors
+            else None
+        ),
+        "distributed": (
+            {
+                "address": env.connect_address,
+                "local_workers": args.local_workers,
+                "max_staleness": args.max_staleness,
+                "max_is_weight": args.max_is_weight,
+            }
+            if args.distributed
+            else None
+        ),
         "resume_from": resume_source,
+        "resume_exact": training_state is not None,
     }
     (run_dir / "metadata.json").write_text(json.dumps(metadata, indent=2))
 
@@ -439,15 +665,26 @@ if __name__ == "__main__":
 
     print(model.policy)
 
-    model.learn(
-        total_timesteps=rollout_horizon * num_envs * total_multiplier,
-        callback=CallbackList(callbacks),
-        tb_log_name="poke_ppo",
-    )
+    if training_state is not None:
+        # keep counting from the checkpoint so the envs' last observations are not reset
+        model.learn(
+            total_timesteps=max(total_timesteps_target - model.num_timesteps, 0),
+            callback=CallbackList(callbacks),
+            tb_log_name="poke_ppo",
+            reset_num_timesteps=False,
+        )
+    else:
+        model.learn(
+            total_timesteps=total_timesteps_target,
+            callback=CallbackList(callbacks),
+            tb_log_name="poke_ppo",
+        )
 
     # always save final snapshot
     final_path = run_dir / "final.zip"
     model.save(str(final_path))
+    load_manifest(run_dir).add(final_path, int(model.num_timesteps), periodic=False)
+    env.close()
 
     if wandb_run:
         wandb_run.finish()